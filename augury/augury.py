@@ -1,11 +1,31 @@
 from redbot.core import commands, checks, Config
 from redbot.core.utils.chat_formatting import error, question, success
 import pyhedrals
-from openai import OpenAI
+import random
+from openai import AsyncOpenAI, OpenAIError
 import discord
 from discord import Embed
+import asyncio
+import logging
 import re
 import textwrap
+from collections import deque
+from contextlib import nullcontext
+
+log = logging.getLogger("red.augury")
+
+# Seconds before giving up on a ritual from OpenAI and answering plainly
+OPENAI_TIMEOUT = 15
+# Pre-generated rituals kept ready per guild for each answer
+RITUAL_POOL_SIZE = 3
+
+# Possible answers from the gods
+AUGURY_ANSWERS: list[str] = [
+    "Woe",
+    "Weal",
+    "Woe & Weal",
+    "No Response"
+]
 
 class Augury(commands.Cog):
     """Perform augury ritual."""
@@ -27,6 +47,44 @@ class Augury(commands.Cog):
         }
         self.config.register_guild(**default_guild)
 
+        # One client (and its connection pool) for every augury, rebuilt if the key changes
+        self._client: AsyncOpenAI | None = None
+        self._client_key: str | None = None
+
+        # Rituals for question-less auguries: guild ID -> answer -> narrations
+        self._pools: dict[int, dict[str, deque[str]]] = {}
+        self._refills: dict[int, asyncio.Task] = {}
+
+    def cog_unload(self):
+        for task in self._refills.values():
+            task.cancel()
+        self._refills.clear()
+        if self._client:
+            asyncio.create_task(self._client.close())
+            self._client = None
+
+    def _get_client(self, key: str) -> AsyncOpenAI:
+        """Shared async OpenAI client for the current API key."""
+        if self._client is None or key != self._client_key:
+            if self._client:
+                asyncio.create_task(self._client.close())
+            self._client = AsyncOpenAI(api_key=key, timeout=OPENAI_TIMEOUT, max_retries=1)
+            self._client_key = key
+        return self._client
+
+    def _perf_timer(self, service: str):
+        """Time a request with the Perf cog, if it's loaded."""
+        perf = self.bot.get_cog("Perf")
+        return perf.timer(service) if perf else nullcontext()
+
+    def _dice_rng(self, user_id: int, channel_id: int, formula: str):
+        """Draw from the Dice cog's random stream, if it's loaded - audited rolls land in its history.
+
+        `formula` is the dice notation that replays the draws.
+        """
+        dice = self.bot.get_cog("Dice")
+        return dice.shared_roll(self.qualified_name.lower(), user_id, channel_id, formula) if dice else nullcontext(random)
+
     #
     # Command methods
     #
@@ -36,40 +94,25 @@ class Augury(commands.Cog):
         
         A simple 1d4 roll to get the answer. Add an OpenAI API key and it transforms into an NPC who performs a ritual.
         """
-        augury_answers: list[str] = [ # Possible answers from the gods
-            "Woe",
-            "Weal",
-            "Woe & Weal",
-            "No Response"
-        ]
+        augury_answers = AUGURY_ANSWERS
         dice_roller = pyhedrals.DiceRoller(
                 maxDice=1,
                 maxSides=4,
             )
-        result = dice_roller.parse("1d4").result
+        with self._dice_rng(ctx.author.id, ctx.channel.id, "1d4"):
+            result = dice_roller.parse("1d4").result
         answer = augury_answers[result-1]
         key = (await self.bot.get_shared_api_tokens("openai")).get("api_key")
-        if key:
-            prompt = f"""
-            You will role play as a seer, a conduit to the gods for important questions:
-
-            * You are: {await self.config.guild(ctx.guild).npc() }
-            * Your divination tools: {await self.config.guild(ctx.guild).tools()}
-            * The ritual: {await self.config.guild(ctx.guild).ritual()} 
-            {'* The important question: ' + question if question else ''}
-            * The god's answer: {answer}
-
-            Return 2-3 sentences (present tense, third person) in a {await self.config.guild(ctx.guild).vibe()} style: role playing as this character & describing the ritualistic behavior that delivers the god's answer{' to the question ' + question if question else ""}.
-            """
-            prompt = textwrap.dedent(prompt).strip()
-            client = OpenAI(api_key=key)
-            completion = client.chat.completions.create(
-                messages = [{"role":"user", "content": prompt}],
-                model = "gpt-3.5-turbo",
-                temperature = await self.config.guild(ctx.guild).temp()
-            )
+        ritual = None
+        if key and not question:
+            # Same NPC, same answer - serve a pre-generated ritual if one is ready
+            ritual = self._take_ritual(ctx.guild, answer)
+        if key and not ritual:
+            settings = await self.config.guild(ctx.guild).all()
+            ritual = await self._perform_ritual(key, settings, answer, question)
+        if ritual:
             pattern = re.compile(r'\b(Woe(?: &| and) Weal|' + '|'.join(map(re.escape, sorted(augury_answers, key=len, reverse=True))) + r')\b', re.IGNORECASE)
-            text = pattern.sub(r'`\1`', completion.choices[0].message.content)
+            text = pattern.sub(r'`\1`', ritual)
             text =  "\n".join(f"> {line}" for line in text.strip().splitlines())
             text = f"*{text}*"
             text += f"```The gods answered: {answer}```"
@@ -84,6 +127,81 @@ class Augury(commands.Cog):
             roll_message = f":crystal_ball: {ctx.message.author.mention} appealed to the gods and they answered: `{answer}`"
             await ctx.send(roll_message)
 
+    async def _perform_ritual(self, key: str, settings: dict, answer: str, question: str | None = None) -> str | None:
+        """Have the augur NPC narrate the ritual delivering `answer`. Returns None if OpenAI fails."""
+        prompt = f"""
+        You will role play as a seer, a conduit to the gods for important questions:
+
+        * You are: {settings["npc"]}
+        * Your divination tools: {settings["tools"]}
+        * The ritual: {settings["ritual"]}
+        {'* The important question: ' + question if question else ''}
+        * The god's answer: {answer}
+
+        Return 2-3 sentences (present tense, third person) in a {settings["vibe"]} style: role playing as this character & describing the ritualistic behavior that delivers the god's answer{' to the question ' + question if question else ""}.
+        """
+        prompt = textwrap.dedent(prompt).strip()
+        try:
+            with self._perf_timer("openai"):
+                completion = await self._get_client(key).chat.completions.create(
+                    messages = [{"role":"user", "content": prompt}],
+                    model = "gpt-3.5-turbo",
+                    temperature = settings["temp"]
+                )
+        except OpenAIError as e:
+            log.error(f"OpenAI request failed: {e}")
+            return None
+        return completion.choices[0].message.content
+
+    #
+    # Ritual pool
+    #
+    def _take_ritual(self, guild: discord.Guild, answer: str) -> str | None:
+        """Pop a pre-generated ritual for `answer`, topping the pool back up in the background."""
+        pool = self._pools.get(guild.id, {}).get(answer)
+        ritual = pool.popleft() if pool else None
+        self._start_refill(guild)
+        return ritual
+
+    def _start_refill(self, guild: discord.Guild) -> None:
+        task = self._refills.get(guild.id)
+        if task is None or task.done():
+            self._refills[guild.id] = asyncio.create_task(self._refill(guild))
+
+    async def _refill(self, guild: discord.Guild) -> None:
+        """Generate rituals until every answer has a full pool, one request at a time."""
+        key = (await self.bot.get_shared_api_tokens("openai")).get("api_key")
+        if not key:
+            return
+        settings = await self.config.guild(guild).all()
+        pools = self._pools.setdefault(guild.id, {answer: deque() for answer in AUGURY_ANSWERS})
+        for answer in AUGURY_ANSWERS:
+            while len(pools[answer]) < RITUAL_POOL_SIZE:
+                ritual = await self._perform_ritual(key, settings, answer)
+                if ritual is None:
+                    return  # OpenAI is failing, try again on the next augury
+                if self._pools.get(guild.id) is not pools:
+                    return  # Settings changed mid-refill, these rituals are stale
+                pools[answer].append(ritual)
+
+    def _invalidate_rituals(self, guild: discord.Guild) -> None:
+        """Drop a guild's pre-generated rituals after its augur settings change, and regenerate them if it had any."""
+        pools = self._pools.pop(guild.id, None)
+        task = self._refills.pop(guild.id, None)
+        if task:
+            task.cancel()
+        if pools is not None:
+            self._start_refill(guild)
+
+    @commands.Cog.listener()
+    async def on_red_api_tokens_update(self, service_name: str, api_tokens: dict) -> None:
+        """A new OpenAI key may mean a different account or model access - start the pools over."""
+        if service_name == "openai":
+            for task in self._refills.values():
+                task.cancel()
+            self._refills.clear()
+            self._pools.clear()
+
     #
     # 
     #
@@ -97,13 +215,15 @@ class Augury(commands.Cog):
     async def settings(self, ctx: commands.Context) -> None:
         """Display the augur's current prompts."""
         key = (await self.bot.get_shared_api_tokens("openai")).get("api_key")
+        settings = await self.config.guild(ctx.guild).all()
         setting_list = {
-            "NPC Description": await self.config.guild(ctx.guild).npc(),
-            "Divination Tools": await self.config.guild(ctx.guild).tools(),
-            "The Ritual": await self.config.guild(ctx.guild).ritual(),
-            "Vibe": await self.config.guild(ctx.guild).vibe(),
-            "OpenAI API Key": "Yes" if {key} else "Not Set",
-            "Prompt Temperature": await self.config.guild(ctx.guild).temp()
+            "NPC Description": settings["npc"],
+            "Divination Tools": settings["tools"],
+            "The Ritual": settings["ritual"],
+            "Vibe": settings["vibe"],
+            "OpenAI API Key": "Yes" if key else "Not Set",
+            "Prompt Temperature": settings["temp"],
+            "Ready Rituals": ", ".join(f"{answer} {len(pool)}" for answer, pool in self._pools.get(ctx.guild.id, {}).items()) or "None yet"
         }
         
         embed = discord.Embed(
@@ -119,6 +239,7 @@ class Augury(commands.Cog):
         """Change description of your augur NPC."""
         if prompt is not None:
             await self.config.guild(ctx.guild).npc.set(prompt)
+            self._invalidate_rituals(ctx.guild)
             await ctx.send(success("The augur's NPC prompt was updated."))
         else:
             await ctx.send(question("Describe your augur NPC."))
@@ -128,6 +249,7 @@ class Augury(commands.Cog):
         """Change description of augur's divination tools"""
         if prompt is not None:
             await self.config.guild(ctx.guild).tools.set(prompt)
+            self._invalidate_rituals(ctx.guild)
             await ctx.send(success("The augur's divination tool prompt was updated."))
         else:
             await ctx.send(question("Describe divination tools your augur uses for the ritual."))
@@ -137,6 +259,7 @@ class Augury(commands.Cog):
         """Change description of augur's ritual"""
         if prompt is not None:
             await self.config.guild(ctx.guild).ritual.set(prompt)
+            self._invalidate_rituals(ctx.guild)
             await ctx.send(success("The augur's ritual prompt was updated."))
         else:
             await ctx.send(question("Describe the ritual your augur performs."))
@@ -146,6 +269,7 @@ class Augury(commands.Cog):
         """Change description of augur's vibe"""
         if prompt is not None:
             await self.config.guild(ctx.guild).vibe.set(prompt)
+            self._invalidate_rituals(ctx.guild)
             await ctx.send(success("The augur's vibe was updated."))
         else:
             await ctx.send(question("Describe the vibe of the response you want."))
@@ -156,6 +280,7 @@ class Augury(commands.Cog):
         temperature = round(temperature, 1)
         if isinstance(temperature, float) and temperature >= 0.0 and temperature <= 1.0:
             await self.config.guild(ctx.guild).temp.set(temperature)
+            self._invalidate_rituals(ctx.guild)
             await ctx.send(success(f"The prompt temperature was set to `{temperature}`"))
         else:
             await ctx.send(error("The temperature must be set to a float (decimal) between `0.0` and `1.0`"))
\ No newline at end of file
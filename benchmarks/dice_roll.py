@@ -0,0 +1,168 @@
+"""
+Dice Roll Benchmark
+
+Times the stages of a `[p]roll` - cost estimate, parse and roll, roll log
+formatting - for a matrix of formulas and pool sizes, through the same engine
+calls Dice.roll makes. Reports the median time per stage, the peak memory of
+one roll, whether the cog would roll it inline or in a worker, and finishes
+with a recommended `[p]diceset rolls` limit for this host.
+
+Formulas the NumPy engine can't roll (sorting, dice of dice) fall back to
+pyhedrals exactly as they do in the cog; `--pyhedrals` also times pyhedrals on
+its own for comparison.
+
+    python benchmarks/dice_roll.py --sizes 10 1000 100000 1000000 --pyhedrals
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pyhedrals
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dice import engine  # noqa: E402
+from dice.dice import INLINE_ROLL_COST, MAX_MESSAGE_LENGTH, RESULT_LINE_RESERVE, ROLL_DEADLINE, Dice  # noqa: E402
+from dice.rng import RollRNG  # noqa: E402
+
+# Everyday formulas, rolled as they are
+FIXED = ["1d20", "4d6dl", "2d20kh+5", "4d4!+2", "100d6!", "10000d10r<=2kh6"]
+# Pool formulas, rolled at every --sizes pool size ({n} dice, keeping {k} = 60%)
+SCALED = ["{n}d20", "{n}d6dl", "{n}d6!", "{n}d10r<=2kh{k}", "{n}d6c>4", "{n}d6s"]
+MAX_SIDES = 10000
+# A mention is about this long, and it's part of the message the log has to fit in
+MENTION = "<@123456789012345678>"
+# The stream the cog rolls from
+RNG = RollRNG()
+
+
+def formulas(sizes: list[int]) -> list[tuple[int, str]]:
+    rows = [(engine.dice_count(engine.roll(f, pyhedrals.DiceRoller(), 10**9, MAX_SIDES, RNG)), f) for f in FIXED]
+    for size in sizes:
+        rows += [(size, template.format(n=size, k=max(1, size * 6 // 10))) for template in SCALED]
+    return rows
+
+
+def time_stages(formula: str, max_dice: int, fallback: pyhedrals.DiceRoller, repeat: int) -> dict:
+    """Median seconds for each stage of Dice.roll, over `repeat` rolls."""
+    budget = MAX_MESSAGE_LENGTH - len(f"{MENTION} rolled `{formula}`") - RESULT_LINE_RESERVE
+    stages = {"cost": [], "roll": [], "format": []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cost = engine.estimate_cost(formula)
+        rolled = time.perf_counter()
+        result = engine.roll(formula, fallback, max_dice, MAX_SIDES, RNG)
+        formatted = time.perf_counter()
+        engine.summarize(result, budget)
+        done = time.perf_counter()
+        stages["cost"].append(rolled - start)
+        stages["roll"].append(formatted - rolled)
+        stages["format"].append(done - formatted)
+    return {
+        "estimate": cost,
+        "vectorized": all(isinstance(rolls, engine.RollArray) for rolls in result.rolls),
+        **{stage: statistics.median(times) for stage, times in stages.items()},
+    }
+
+
+def peak_memory(formula: str, max_dice: int, fallback: pyhedrals.DiceRoller) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = engine.roll(formula, fallback, max_dice, MAX_SIDES, RNG)
+    engine.summarize(result, MAX_MESSAGE_LENGTH)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def time_pyhedrals(formula: str, max_dice: int) -> float:
+    roller = pyhedrals.DiceRoller(maxDice=max_dice, maxSides=MAX_SIDES)
+    start = time.perf_counter()
+    roller.parse(formula)
+    return time.perf_counter() - start
+
+
+def run(args: argparse.Namespace) -> list[dict]:
+    max_dice = max(args.sizes + [10000])
+    fallback = pyhedrals.DiceRoller(maxDice=max_dice, maxSides=MAX_SIDES)
+    rows = []
+    for dice, formula in formulas(args.sizes):
+        # pyhedrals is far slower; the biggest pools only make sense once
+        repeat = args.repeat if dice <= 10000 else 1
+        stages = time_stages(formula, max_dice, fallback, repeat)
+        total = stages["cost"] + stages["roll"] + stages["format"]
+        row = {
+            "formula": formula,
+            "dice": dice,
+            "engine": "numpy" if stages["vectorized"] else "pyhedrals",
+            "where": "inline" if stages["estimate"] <= INLINE_ROLL_COST else "worker",
+            "cost_ms": round(stages["cost"] * 1000, 3),
+            "roll_ms": round(stages["roll"] * 1000, 3),
+            "format_ms": round(stages["format"] * 1000, 3),
+            "total_ms": round(total * 1000, 3),
+            "peak_mib": round(peak_memory(formula, max_dice, fallback) / 2**20, 2) if args.memory else None,
+        }
+        if args.pyhedrals:
+            row["pyhedrals_ms"] = (
+                round(time_pyhedrals(formula, max_dice) * 1000, 3) if dice <= args.pyhedrals_max else None
+            )
+        rows.append(row)
+    return rows
+
+
+def recommend(rows: list[dict], sizes: list[int], headroom: float) -> tuple[int | None, dict | None]:
+    """Largest pool size whose slowest formula still finishes well inside the worker deadline."""
+    limit, worst = None, None
+    for size in sorted(sizes):
+        slowest = max((r for r in rows if r["dice"] == size), key=lambda r: r["total_ms"])
+        if slowest["total_ms"] / 1000 > ROLL_DEADLINE * headroom:
+            break
+        limit, worst = size, slowest
+    return limit, worst
+
+
+def print_table(rows: list[dict]) -> None:
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.rjust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).rjust(widths[c]) for c in columns))
+
+
+def main(args: argparse.Namespace) -> None:
+    rows = run(args)
+    limit, worst = recommend(rows, args.sizes, args.headroom)
+    slowest_inline = max((r for r in rows if r["where"] == "inline"), key=lambda r: r["total_ms"], default=None)
+    if args.json:
+        print(json.dumps({"rows": rows, "recommended_max_dice_rolls": limit}, indent=2))
+        return
+    print_table(rows)
+    print()
+    if slowest_inline:
+        print(f"Slowest inline roll: {slowest_inline['formula']} at {slowest_inline['total_ms']}ms on the event loop")
+    if limit is None:
+        print(f"Even {min(args.sizes)} dice can take longer than {ROLL_DEADLINE * args.headroom:.1f}s here - keep the limit below that.")
+    else:
+        print(
+            f"Recommended [p]diceset rolls: {limit} "
+            f"(slowest: {worst['formula']} at {worst['total_ms']}ms, "
+            f"{args.headroom:.0%} of the {ROLL_DEADLINE}s worker deadline allowed)"
+        )
+    print(f"The cog's default is {Dice.default_global_settings['max_dice_rolls']}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=20, help="rolls per formula for pools up to 10000 dice (median is reported)")
+    parser.add_argument("--headroom", type=float, default=0.5, help="fraction of the worker deadline the slowest roll may use")
+    parser.add_argument("--pyhedrals", action="store_true", help="also time pyhedrals alone")
+    parser.add_argument("--pyhedrals-max", type=int, default=10000, help="largest pool to time pyhedrals alone on")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip tracemalloc (it slows runs down)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    main(parser.parse_args())
@@ -0,0 +1,362 @@
+"""
+Fake Ghost Admin API
+
+Local aiohttp stand-in for the Ghost Admin API endpoints GhostSync uses
+(members browse/edit, bulk member label edits, labels browse), backed by a
+synthetic member set. Supports pagination, simple filters, `fields=` and
+`include=`, and configurable latency and error rates.
+
+Run standalone:
+    python benchmarks/fake_ghost.py --members 10000 --port 2368
+"""
+import argparse
+import asyncio
+import copy
+import multiprocessing
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+API_PREFIX = "/ghost/api/admin"
+
+LABELS = [
+    {"name": "Discord", "slug": "discord"},
+    {"name": "Player", "slug": "player"},
+    {"name": "Game Master", "slug": "game-master"},
+    {"name": "Patron", "slug": "patron"},
+]
+TIERS = ["Acolyte", "Cleric", "High Priest"]
+
+
+def _object_id(rng: random.Random) -> str:
+    """24 hex characters, like Ghost's ObjectIDs."""
+    return "%024x" % rng.getrandbits(96)
+
+
+def _label(label: dict, ids: dict) -> dict:
+    return {
+        "id": ids[label["slug"]],
+        "name": label["name"],
+        "slug": label["slug"],
+        "created_at": "2024-01-01T00:00:00.000Z",
+        "updated_at": "2024-01-01T00:00:00.000Z",
+    }
+
+
+def make_members(count: int, linked: float = 0.6, paid: float = 0.3, seed: int = 0) -> tuple[list[dict], list[dict]]:
+    """Generate (members, labels) shaped like Ghost Admin API responses.
+
+    `linked` is the fraction of members whose note carries a Discord ID, `paid`
+    the fraction with a paid (or comped) subscription. Discord IDs are assigned
+    sequentially from 100000000000000000 so a fake guild can be built to match.
+    """
+    rng = random.Random(seed)
+    label_ids = {label["slug"]: _object_id(rng) for label in LABELS}
+    labels = [_label(label, label_ids) for label in LABELS]
+
+    members = []
+    for i in range(count):
+        ghost_id = _object_id(rng)
+        status = "free"
+        subscriptions = []
+        if rng.random() < paid:
+            status = "comped" if rng.random() < 0.1 else "paid"
+            tier = rng.choice(TIERS)
+            subscriptions = [{
+                "id": f"sub_{ghost_id}",
+                "status": "active",
+                "start_date": "2024-01-01T00:00:00.000Z",
+                "default_payment_card_last4": "4242",
+                "cancel_at_period_end": False,
+                "current_period_end": "2030-01-01T00:00:00.000Z",
+                "price": {"id": f"price_{tier}", "amount": 500, "currency": "USD", "interval": "month"},
+                "tier": {"id": f"tier_{tier}", "name": tier},
+            }]
+        note = None
+        if rng.random() < linked:
+            note = f"{100000000000000000 + i} joined via Discord"
+        members.append({
+            "id": ghost_id,
+            "uuid": "%032x" % rng.getrandbits(128),
+            "email": f"member{i}@example.com",
+            "name": f"Member {i}",
+            "note": note,
+            "geolocation": None,
+            "subscribed": True,
+            "created_at": "2024-01-01T00:00:00.000Z",
+            "updated_at": "2024-01-01T00:00:00.000Z",
+            "labels": [copy.copy(l) for l in labels if rng.random() < 0.15],
+            "subscriptions": subscriptions,
+            "avatar_image": f"https://www.gravatar.com/avatar/{ghost_id}?s=250&r=g&d=blank",
+            "comped": status == "comped",
+            "email_count": rng.randint(0, 200),
+            "email_opened_count": rng.randint(0, 100),
+            "email_open_rate": rng.randint(0, 100),
+            "status": status,
+            "last_seen_at": None,
+            "newsletters": [{"id": "newsletter", "name": "Dungeon Church", "status": "active"}],
+            "email_suppression": {"suppressed": False, "info": None},
+        })
+    return members, labels
+
+
+def _parse_filter(expression: str) -> list[tuple[str, set[str]]]:
+    """Parse a Ghost NQL subset: `key:value` and `key:[a,b]` clauses joined by `+`."""
+    clauses = []
+    # '+' may arrive decoded as a space
+    for clause in expression.replace(" ", "+").split("+"):
+        if ":" not in clause:
+            continue
+        key, value = clause.split(":", 1)
+        value = value.strip("'\"")
+        if value.startswith("[") and value.endswith("]"):
+            values = {v.strip().strip("'\"") for v in value[1:-1].split(",") if v.strip()}
+        else:
+            values = {value}
+        clauses.append((key, values))
+    return clauses
+
+
+def _matches(member: dict, clauses: list[tuple[str, set[str]]]) -> bool:
+    for key, values in clauses:
+        if key == "label":
+            if not {l["slug"] for l in member["labels"]} & values:
+                return False
+        elif key == "email":
+            if (member.get("email") or "").lower() not in {v.lower() for v in values}:
+                return False
+        elif str(member.get(key)) not in values:
+            return False
+    return True
+
+
+class FakeGhost:
+    """In-memory Ghost Admin API serving a synthetic member set.
+
+    `latency` is seconds added to every request (plus up to `jitter` more);
+    `error_rate` is the chance any request fails with HTTP 503.
+    `bulk` toggles support for the bulk member edit endpoint.
+    """
+
+    def __init__(
+        self,
+        members: list[dict],
+        labels: list[dict],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        bulk: bool = True,
+        seed: int = 0,
+    ):
+        self.members = {m["id"]: m for m in members}
+        self.labels = {l["id"]: l for l in labels}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bulk = bulk
+        self.requests: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._runner: web.AppRunner | None = None
+        self.url: str | None = None
+
+        self.app = web.Application(middlewares=[self._middleware])
+        self.app.router.add_get(f"{API_PREFIX}/members/", self.browse_members)
+        self.app.router.add_put(f"{API_PREFIX}/members/bulk/", self.bulk_edit_members)
+        self.app.router.add_put(f"{API_PREFIX}/members/{{member_id}}/", self.edit_member)
+        self.app.router.add_get(f"{API_PREFIX}/labels/", self.browse_labels)
+        # Request counts for benchmarks running the server in another process
+        self.app.router.add_get("/_fake/stats", self.stats)
+        self.app.router.add_post("/_fake/reset", self.reset)
+
+    ### SERVER
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving; returns the base URL to configure as the Ghost URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        if request.path.startswith("/_fake/"):
+            return await handler(request)
+        resource = request.match_info.route.resource
+        self.requests[f"{request.method} {resource.canonical if resource else request.path}"] += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rng.uniform(0, self.jitter))
+        if not request.headers.get("Authorization", "").startswith("Ghost "):
+            return web.json_response({"errors": [{"message": "Authorization header format is \"Authorization: Ghost [token]\""}]}, status=401)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return web.json_response({"errors": [{"message": "Injected failure"}]}, status=503)
+        return await handler(request)
+
+    ### ENDPOINTS
+
+    async def browse_members(self, request: web.Request) -> web.Response:
+        members = list(self.members.values())
+        if "filter" in request.query:
+            clauses = _parse_filter(request.query["filter"])
+            members = [m for m in members if _matches(m, clauses)]
+
+        limit_param = request.query.get("limit", "15")
+        limit = (len(members) or 1) if limit_param == "all" else max(1, int(limit_param))
+        page = max(1, int(request.query.get("page", "1")))
+        pages = max(1, -(-len(members) // limit))
+        page_members = members[(page - 1) * limit:page * limit]
+
+        # Relations only come back when included; `fields` limits the plain attributes
+        include = set(request.query.get("include", "").split(","))
+        fields = set(request.query["fields"].split(",")) if "fields" in request.query else None
+        relations = {"labels", "subscriptions"}
+        page_members = [
+            {
+                k: v for k, v in m.items()
+                if (k in include if k in relations else fields is None or k in fields)
+            }
+            for m in page_members
+        ]
+
+        return web.json_response({
+            "members": page_members,
+            "meta": {"pagination": {
+                "page": page,
+                "limit": limit_param if limit_param == "all" else limit,
+                "pages": pages,
+                "total": len(members),
+                "next": page + 1 if page < pages else None,
+                "prev": page - 1 if page > 1 else None,
+            }},
+        })
+
+    async def edit_member(self, request: web.Request) -> web.Response:
+        member = self.members.get(request.match_info["member_id"])
+        if member is None:
+            return web.json_response({"errors": [{"message": "Member not found."}]}, status=404)
+        body = await request.json()
+        changes = body["members"][0]
+        if "note" in changes:
+            member["note"] = changes["note"]
+        if "labels" in changes:
+            member["labels"] = [self._resolve_label(l) for l in changes["labels"]]
+        member["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        return web.json_response({"members": [member]})
+
+    async def bulk_edit_members(self, request: web.Request) -> web.Response:
+        if not self.bulk:
+            return web.json_response({"errors": [{"message": "Resource not found"}]}, status=404)
+        body = await request.json()
+        action = body["bulk"]["action"]
+        label = self.labels.get(body["bulk"]["meta"]["label"]["id"])
+        if action not in ("addLabel", "removeLabel") or label is None:
+            return web.json_response({"errors": [{"message": "Validation error"}]}, status=422)
+
+        clauses = _parse_filter(request.query.get("filter", ""))
+        ids = next((values for key, values in clauses if key == "id"), set())
+        updated = 0
+        for ghost_id in ids:
+            member = self.members.get(ghost_id)
+            if member is None:
+                continue
+            slugs = {l["slug"] for l in member["labels"]}
+            if action == "addLabel" and label["slug"] not in slugs:
+                member["labels"].append(copy.copy(label))
+            elif action == "removeLabel" and label["slug"] in slugs:
+                member["labels"] = [l for l in member["labels"] if l["slug"] != label["slug"]]
+            updated += 1
+        return web.json_response({"bulk": {"meta": {"stats": {"successful": updated, "unsuccessful": 0}}}})
+
+    async def browse_labels(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "labels": list(self.labels.values()),
+            "meta": {"pagination": {"page": 1, "limit": "all", "pages": 1, "total": len(self.labels), "next": None, "prev": None}},
+        })
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": dict(self.requests), "members": len(self.members)})
+
+    async def reset(self, request: web.Request) -> web.Response:
+        self.requests.clear()
+        return web.json_response({})
+
+    def _resolve_label(self, label: dict) -> dict:
+        """Match a label reference by id, slug or name, creating it like Ghost does if unknown."""
+        for existing in self.labels.values():
+            if label.get("id") == existing["id"] or label.get("slug") == existing["slug"] or label.get("name") == existing["name"]:
+                return copy.copy(existing)
+        name = label.get("name") or label.get("slug")
+        created = {"id": _object_id(self._rng), "name": name, "slug": label.get("slug") or name.lower().replace(" ", "-")}
+        self.labels[created["id"]] = created
+        return copy.copy(created)
+
+
+async def _serve(count: int, seed: int, host: str, port: int, ready=None, **options) -> None:
+    members, labels = make_members(count, seed=seed)
+    ghost = FakeGhost(members, labels, seed=seed, **options)
+    url = await ghost.start(host, port)
+    del members, labels
+    if ready is not None:
+        ready.put(url)
+    else:
+        print(f"Fake Ghost serving {count} members at {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await ghost.stop()
+
+
+def _serve_forever(*args, **kwargs) -> None:
+    try:
+        asyncio.run(_serve(*args, **kwargs))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_in_process(count: int, seed: int = 0, **options) -> tuple[multiprocessing.Process, str]:
+    """Serve a fake Ghost from a child process, so its memory stays out of the caller's measurements.
+
+    Returns (process, base_url); terminate the process when done.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve_forever,
+        args=(count, seed, "127.0.0.1", 0, ready),
+        kwargs=options,
+        daemon=True,
+    )
+    process.start()
+    return process, ready.get(timeout=600)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2368)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra milliseconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with HTTP 503")
+    parser.add_argument("--no-bulk", action="store_true", help="reject bulk member edits like older Ghost versions")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    _serve_forever(
+        args.members, args.seed, args.host, args.port,
+        latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate, bulk=not args.no_bulk,
+    )
@@ -0,0 +1,256 @@
+"""
+GhostSync Sync Benchmark
+
+Runs GhostSync's sync pipeline (the same SyncEngine run the scheduled
+`sync_guild_roles` job makes) against a fake Ghost Admin API and a mocked
+Discord guild, and reports wall time, API calls and peak memory per run.
+
+Each size gets a "cold" run (roles and labels out of date) followed by a
+"steady" run (nothing left to change).
+
+    python benchmarks/ghostsync_sync.py --sizes 1000 10000 100000 --latency 20
+"""
+import argparse
+import asyncio
+import gc
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_ghost import make_members, serve_in_process  # noqa: E402
+from ghostsync.engine import SyncEngine  # noqa: E402
+from ghostsync.ghostsync import GhostSync  # noqa: E402
+from ghostsync.scheduler import GuildScheduler  # noqa: E402
+from ghostsync.snapshot import SnapshotStore  # noqa: E402
+
+GUILD_ID = 1
+SUBSCRIBER_ROLE_ID = 10
+BOOSTER_ROLE_ID = 11
+# Discord role ID -> Ghost label slug
+LABEL_ROLES = {20: "player", 21: "game-master"}
+
+
+### MOCK DISCORD
+
+class FakeRole:
+    def __init__(self, guild: "FakeGuild", role_id: int, name: str):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+
+    @property
+    def members(self) -> list:
+        return [m for m in self.guild.members if self in m.roles]
+
+
+class FakeMember:
+    bot = False
+
+    def __init__(self, member_id: int, roles: list):
+        self.id = member_id
+        self.roles = roles
+
+    def __str__(self) -> str:
+        return f"member#{self.id}"
+
+    async def add_roles(self, role, reason=None):
+        self.roles.append(role)
+
+    async def remove_roles(self, role, reason=None):
+        self.roles.remove(role)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str):
+        self.id = guild_id
+        self.name = name
+        self.members: list[FakeMember] = []
+        self._members: dict[int, FakeMember] = {}
+        self._roles: dict[int, FakeRole] = {}
+
+    def add_role(self, role_id: int, name: str) -> FakeRole:
+        role = self._roles[role_id] = FakeRole(self, role_id, name)
+        return role
+
+    def add_member(self, member: FakeMember) -> None:
+        self.members.append(member)
+        self._members[member.id] = member
+
+    def get_role(self, role_id: int):
+        return self._roles.get(role_id)
+
+    def get_member(self, member_id: int):
+        return self._members.get(member_id)
+
+
+def build_guild(discord_ids: list[int], seed: int) -> FakeGuild:
+    """A guild holding every linked Discord ID plus some unlinked members, with roles handed out at random."""
+    rng = random.Random(seed)
+    guild = FakeGuild(GUILD_ID, "Benchmark Guild")
+    subscriber = guild.add_role(SUBSCRIBER_ROLE_ID, "Subscriber")
+    booster = guild.add_role(BOOSTER_ROLE_ID, "Server Booster")
+    label_roles = {role_id: guild.add_role(role_id, slug.title()) for role_id, slug in LABEL_ROLES.items()}
+
+    unlinked = [900000000000000000 + i for i in range(len(discord_ids) // 10)]
+    for member_id in discord_ids + unlinked:
+        roles = []
+        if rng.random() < 0.25:
+            roles.append(subscriber)
+        if rng.random() < 0.02:
+            roles.append(booster)
+        if rng.random() < 0.30:
+            roles.append(label_roles[20])
+        if rng.random() < 0.05:
+            roles.append(label_roles[21])
+        guild.add_member(FakeMember(member_id, roles))
+    return guild
+
+
+class FakeBot:
+    def get_cog(self, name: str):
+        return None
+
+    async def get_shared_api_tokens(self, service: str) -> dict:
+        return {"key_id": "benchmark", "key_secret": "00" * 32}
+
+
+class FakeGuildConfig:
+    def __init__(self, values: dict):
+        self.values = values
+
+    async def all(self) -> dict:
+        return dict(self.values)
+
+
+class FakeConfig:
+    def __init__(self, values: dict):
+        self._guild = FakeGuildConfig(values)
+
+    def guild(self, guild) -> FakeGuildConfig:
+        return self._guild
+
+
+def build_cog(ghost_url: str, data_path: Path) -> GhostSync:
+    """A GhostSync instance wired to fakes instead of Red's bot and Config."""
+    cog = GhostSync.__new__(GhostSync)
+    cog.bot = FakeBot()
+    cog.config = FakeConfig({
+        "ghost_url": ghost_url,
+        "sync_interval": 1800,
+        "interval_min": None,
+        "interval_max": None,
+        "subscriber_role": SUBSCRIBER_ROLE_ID,
+        "log_channel": None,
+        "sync_role": BOOSTER_ROLE_ID,
+        "label_mappings": {str(role_id): slug for role_id, slug in LABEL_ROLES.items()},
+    })
+    cog.scheduler = GuildScheduler("ghostsync.benchmark")
+    cog.member_indexes = {}
+    cog.snapshots = SnapshotStore(data_path / "members.sqlite3")
+    cog._refresh_tasks = {}
+    cog.breakers = {}
+    cog._outage_notified = set()
+    cog._bulk_unsupported = set()
+    cog.pending_plans = {}
+    cog.engine = SyncEngine(cog)
+    return cog
+
+
+### BENCHMARK
+
+async def _server_requests(session: aiohttp.ClientSession, ghost_url: str, reset: bool = False) -> int:
+    if reset:
+        async with session.post(f"{ghost_url}/_fake/reset"):
+            return 0
+    async with session.get(f"{ghost_url}/_fake/stats") as response:
+        data = await response.json()
+        return sum(data["requests"].values())
+
+
+async def run_size(size: int, args: argparse.Namespace) -> list[dict]:
+    members, _ = make_members(size, seed=args.seed)
+    discord_ids = [100000000000000000 + i for i, m in enumerate(members) if m["note"]]
+    del members
+    guild = build_guild(discord_ids, args.seed)
+    gc.collect()
+
+    process, ghost_url = serve_in_process(
+        size, seed=args.seed,
+        latency=args.latency / 1000, jitter=args.jitter / 1000,
+        error_rate=args.error_rate, bulk=not args.no_bulk,
+    )
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            cog = build_cog(ghost_url, Path(data_dir))
+            async with aiohttp.ClientSession() as session:
+                for run in ("cold", "steady"):
+                    await _server_requests(session, ghost_url, reset=True)
+                    gc.collect()
+                    if args.memory:
+                        tracemalloc.start()
+                    start = time.perf_counter()
+                    result = await cog.engine.run(guild, "benchmark")
+                    wall = time.perf_counter() - start
+                    peak = 0
+                    if args.memory:
+                        peak = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                    rows.append({
+                        "members": size,
+                        "run": run,
+                        "ok": result.ok,
+                        "wall_s": round(wall, 3),
+                        "fetch_s": round(result.fetch_seconds, 3),
+                        "plan_s": round(result.plan_seconds, 3),
+                        "apply_s": round(result.apply_seconds, 3),
+                        "roles": f"+{result.roles_added}/-{result.roles_removed}",
+                        "labels": f"+{result.labels_added}/-{result.labels_removed}",
+                        "ghost_calls": result.api_calls.get("ghost", 0),
+                        "discord_calls": result.api_calls.get("discord", 0),
+                        "server_requests": await _server_requests(session, ghost_url),
+                        "peak_mib": round(peak / 2**20, 1) if args.memory else None,
+                    })
+    finally:
+        process.terminate()
+        process.join()
+    return rows
+
+
+def print_table(rows: list[dict]) -> None:
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.rjust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).rjust(widths[c]) for c in columns))
+
+
+async def main(args: argparse.Namespace) -> None:
+    rows = []
+    for size in args.sizes:
+        rows += await run_size(size, args)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every Ghost request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra milliseconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Ghost requests failing with HTTP 503")
+    parser.add_argument("--no-bulk", action="store_true", help="simulate a Ghost without bulk member edits")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip tracemalloc (it slows runs down)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
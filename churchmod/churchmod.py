@@ -1,6 +1,7 @@
 from redbot.core import commands, Config, checks  
 from redbot.core.utils.chat_formatting import error, question, success
 import discord
+from contextlib import nullcontext
 from .dm_lib import church_channels, emojis, church_roles
 from . import mod
 from . import embeds
@@ -187,4 +188,9 @@ class ChurchMod(commands.Cog):
         debug = await self.config.guild(guild).debug_mode() 
         if not debug:
             return church_channels.get(channel_name, church_channels["bot-testing"])
-        return church_channels["bot-testing"]
\ No newline at end of file
+        return church_channels["bot-testing"]
+
+    def _perf_timer(self, service: str):
+        """Time a request with the Perf cog, if it's loaded."""
+        perf = self.bot.get_cog("Perf")
+        return perf.timer(service) if perf else nullcontext()
\ No newline at end of file
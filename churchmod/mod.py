@@ -17,11 +17,12 @@ async def make_offering(ctx, openai) -> None:
         if llm:
             prompt = "Generate a single direct quote no longer than a sentence for a mysterious church Deacon as they pass the offertory basket to a group of adventurers or participants in a shared storytelling game as the congregation. The tone should be mysterious and ominous, with a subtle emphasis on the importance of these contributions in furthering the group's journey or story and how the group is a collective effort. Each sentence should evoke a sense of immersion in the fantasy world."
             client = OpenAI(api_key=llm)
-            completion = client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="gpt-3.5-turbo",
-                temperature=0.8
-            )
+            with ctx.cog._perf_timer("openai"):
+                completion = client.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    model="gpt-3.5-turbo",
+                    temperature=0.8
+                )
             answer = f"*{completion.choices[0].message.content}*"
         embed = embeds.offering
         embed.set_thumbnail(url="https://www.dungeon.church/content/images/2024/09/offering.png")
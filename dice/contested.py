@@ -32,7 +32,11 @@ class ContestedRollModal(Modal):
             modifier = int(mod_input) if mod_input else 0 # default to 0 if left blank in modal
             challenger_modifier = self.total - self.initial_result
             # Parse and roll for the challenged user
-            challenged_result = self.dice_roller.parse("1d20").result
+            cog = self.ctx.cog
+            with cog.rng.roll(f"qr by {interaction.user.id}: 1d20"):
+                challenged_roll = self.dice_roller.parse("1d20")
+                cog._record_user_result(interaction.user.id, interaction.channel_id, "qr", "1d20", challenged_roll, modifier)
+            challenged_result = challenged_roll.result
             challenged_total = challenged_result + modifier
             
             # Update the message with both results
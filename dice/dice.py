@@ -4,22 +4,49 @@ Modified by DM Brad of WWW.DUNGEON.CHURCH for use with RPGs
 """
 
 import asyncio
-import re
-from contextlib import suppress
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager, suppress
 from typing import ClassVar, Union
 
 import pyhedrals
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from redbot.core.utils.chat_formatting import error, question, success
 from redbot.core.utils.predicates import MessagePredicate
 import discord
 
-from .dm_lib import emojis, prepend_emoji, eightball_messages
-from . import contested
+from .dm_lib import emojis, eightball_messages
+from . import contested, engine, odds
+from .history import ALL_USERS, HistoryStore, RollRecord, chi_square
+from .pool import RollLimit, RollPool, RollTimeout, RollUnavailable
+from .rng import RollRNG
+
+log = logging.getLogger("red.dice")
 
 MAX_ROLLS_NOTIFY = 1000000
 MAX_MESSAGE_LENGTH = 2000
+# Characters kept free for the result line under a roll log
+RESULT_LINE_RESERVE = 64
+# Rolls estimated to cost more than this many pyhedrals dice go to a worker process
+INLINE_ROLL_COST = 10000
+# Worker processes, seconds allowed per worker roll, and worker rolls each user may have in flight
+ROLL_WORKERS = 2
+ROLL_DEADLINE = 5
+ROLLS_PER_USER = 1
+# Most rolls, and separate formulas, one batch roll can make
+MAX_BATCH_ROLLS = 50
+MAX_BATCH_GROUPS = 10
+# Seconds between roll history writes, and pending rolls that trigger one early
+HISTORY_FLUSH_INTERVAL = 30
+HISTORY_FLUSH_SIZE = 200
+# Rolls shown by [p]rollhistory recent, and die sizes checked by [p]rollhistory fairness
+RECENT_ROLLS = 10
+FAIRNESS_DICE = (2, 4, 6, 8, 10, 12, 20)
+# Commands counted as dice rolls by the Perf cog
+ROLL_COMMANDS = {"qr", "flipcoin", "eightball", "dis", "adv", "randstats", "roll"}
 
 class Dice(commands.Cog):
     """Perform complex dice rolling."""
@@ -33,11 +60,9 @@ class Dice(commands.Cog):
         "randstats_max": 78,
         "randstats_min": 66,
         "timeout": 86400, # in seconds (24 hours)
-        "message_cleanup": False
+        "message_cleanup": False,
+        "audit": False
     }
-    DROPPED_EXPLODED_RE = re.compile(r"-\*(\d+)\*-")
-    EXPLODED_RE = re.compile(r"\*(\d+)\*")
-    DROPPED_RE = re.compile(r"-(\d+)-")
 
     def __init__(self, bot: Red) -> None:
         """Set up the cog."""
@@ -47,6 +72,46 @@ class Dice(commands.Cog):
             self, identifier=1224364861, force_registration=True
         )
         self.config.register_global(**self.default_global_settings)
+        # Snapshot of the global settings and a roller built from them, so rolls don't touch Config
+        self.settings = dict(self.default_global_settings)
+        self.dice_roller = self._build_roller()
+        # Random stream for every roll, shared with the other cogs through bot.get_cog("Dice")
+        self.rng = RollRNG()
+        self.roll_pool = RollPool(ROLL_WORKERS, ROLL_DEADLINE, ROLLS_PER_USER)
+        # Rolls wait here until the next batched history write
+        self.history = HistoryStore(cog_data_path(self) / "rolls.sqlite3")
+        self._pending_rolls: list[RollRecord] = []
+        self._history_lock = asyncio.Lock()
+        self._history_due = asyncio.Event()
+        self._history_task: asyncio.Task | None = None
+
+    async def cog_load(self) -> None:
+        await self._refresh_settings()
+        self._history_task = asyncio.create_task(self._history_writer())
+
+    def cog_unload(self) -> None:
+        self.roll_pool.shutdown()
+        if self._history_task:
+            self._history_task.cancel()
+        # The writer can't finish its last batch now, so save what's left here
+        if self._pending_rolls:
+            try:
+                self.history.write(self._pending_rolls)
+            except sqlite3.Error as e:
+                log.error(f"Couldn't save {len(self._pending_rolls)} rolls to history: {e}")
+            self._pending_rolls = []
+
+    async def _refresh_settings(self) -> None:
+        """Reload the settings snapshot; called after every diceset change."""
+        self.settings = await self.config.all()
+        self.dice_roller = self._build_roller()
+        self.rng.audit = self.settings["audit"]
+
+    def _build_roller(self) -> pyhedrals.DiceRoller:
+        return pyhedrals.DiceRoller(
+            maxDice=self.settings["max_dice_rolls"],
+            maxSides=self.settings["max_die_sides"],
+        )
 
     #
     # Red methods
@@ -57,9 +122,98 @@ class Dice(commands.Cog):
         pre_processed = super().format_help_for_context(ctx)
         return f"{pre_processed}\n\nCog Version: {self.__version__}"
 
-    async def red_delete_data_for_user(self, *, _requester: str, _user_id: int) -> None:
-        """Nothing to delete."""
-        return
+    async def red_delete_data_for_user(self, *, requester: str, user_id: int) -> None:
+        """Delete a user's roll history."""
+        async with self._history_lock:
+            self._pending_rolls = [record for record in self._pending_rolls if record.user_id != user_id]
+            await asyncio.to_thread(self.history.delete_user, user_id)
+
+    async def cog_after_invoke(self, ctx: commands.Context) -> None:
+        """Count completed rolls with the Perf cog, if it's loaded."""
+        if ctx.command.name in ROLL_COMMANDS and not ctx.command_failed:
+            perf = self.bot.get_cog("Perf")
+            if perf:
+                perf.inc("dice_rolls_total", command=ctx.command.name)
+
+    #
+    # Roll history
+    #
+
+    def _record(self, ctx: commands.Context, formula: str, total: int, dice: str | None, faces: dict[int, list[int]], seed: int | None = None) -> None:
+        """Queue a roll for the next history write."""
+        self._queue_record(
+            RollRecord(ctx.author.id, ctx.channel.id, time.time(), ctx.command.name, formula, total, dice, faces, seed)
+        )
+
+    def _queue_record(self, record: RollRecord) -> None:
+        self._pending_rolls.append(record)
+        if len(self._pending_rolls) >= HISTORY_FLUSH_SIZE:
+            self._history_due.set()
+
+    def _record_result(self, ctx: commands.Context, formula: str, result: pyhedrals.RollResult, modifier: int = 0) -> None:
+        """Queue a roll made inside `_roll_rng`, with the stream's audit seed."""
+        self._record_user_result(ctx.author.id, ctx.channel.id, ctx.command.name, formula, result, modifier)
+
+    def _record_user_result(self, user_id: int, channel_id: int, command: str, formula: str, result: pyhedrals.RollResult, modifier: int = 0) -> None:
+        """Queue a roll `user_id` made on the shared stream, e.g. the challenged side of a contest."""
+        if modifier:
+            formula += f"{modifier:+}"
+        self._queue_record(
+            RollRecord(
+                user_id, channel_id, time.time(), command, formula, result.result + modifier,
+                engine.raw_dice(result), engine.face_counts(result), self.rng.seed,
+            )
+        )
+
+    def _roll_rng(self, ctx: commands.Context, formula: str):
+        """Context for one roll on the shared stream, labelled for the audit log."""
+        return self.rng.roll(self._roll_label(ctx, formula))
+
+    def _roll_label(self, ctx: commands.Context, formula: str) -> str:
+        return f"{ctx.command.name} by {ctx.author.id}: {formula[:100]}"
+
+    @contextmanager
+    def shared_roll(self, command: str, user_id: int, channel_id: int, formula: str):
+        """Draw another cog's roll from the shared stream, yielding it to the cog.
+
+        `formula` is the dice notation that replays the draws (five randint(1, 6) are `5d6`).
+        In audit mode the roll's seed goes into the roll history under `command`, so
+        `[p]diceset replay` can reproduce it; its dice stay out of the fairness counts.
+        """
+        with self.rng.roll(f"{command} by {user_id}: {formula[:100]}") as rng:
+            yield rng
+            seed = rng.seed if rng.drawn else None
+        if seed is None:
+            return
+        # Record what the replay will show, so the history and the replay agree
+        replay = RollRNG(seed)
+        try:
+            with replay.roll():
+                result = engine.roll(formula, self.dice_roller, self.settings["max_dice_rolls"], self.settings["max_die_sides"], replay)
+        except pyhedrals.InvalidOperandsException as e:
+            log.warning(f"Couldn't record {command}'s roll '{formula[:100]}' (seed {seed}) in history: {e}")
+            return
+        self._queue_record(
+            RollRecord(user_id, channel_id, time.time(), command, formula, result.result, engine.raw_dice(result), {}, seed)
+        )
+
+    async def _history_writer(self) -> None:
+        """Write pending rolls every HISTORY_FLUSH_INTERVAL seconds, or sooner once enough pile up."""
+        while True:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._history_due.wait(), HISTORY_FLUSH_INTERVAL)
+            self._history_due.clear()
+            await self._flush_history()
+
+    async def _flush_history(self) -> None:
+        async with self._history_lock:
+            records, self._pending_rolls = self._pending_rolls, []
+            if not records:
+                return
+            try:
+                await asyncio.to_thread(self.history.write, records)
+            except sqlite3.Error as e:
+                log.error(f"Couldn't save {len(records)} rolls to history: {e}")
 
     #
     # Command methods: diceset
@@ -78,6 +232,7 @@ class Dice(commands.Cog):
             "Randstats Max": await self.config.randstats_max(),
             "Randstats Min": await self.config.randstats_min(),
             "Message Cleanup": await self.config.message_cleanup(),
+            "Audit Mode": await self.config.audit(),
             "Challenge Timeout (s)": await self.config.timeout()
         }
         message = "\n".join([f"- **{key}:** `{value}`" for key, value in settings.items()])
@@ -111,6 +266,7 @@ class Dice(commands.Cog):
                 await ctx.bot.wait_for("message", check=pred, timeout=30)
             if pred.result:
                 await self.config.max_dice_rolls.set(maximum)
+                await self._refresh_settings()
                 action = "is now set to"
             else:
                 await ctx.send(
@@ -121,6 +277,7 @@ class Dice(commands.Cog):
                 return
         else:
             await self.config.max_dice_rolls.set(maximum)
+            await self._refresh_settings()
             action = "is now set to"
 
         await ctx.send(
@@ -138,6 +295,7 @@ class Dice(commands.Cog):
         But be honest, do you really need to roll multiple five trillion sided dice at once?
         """
         await self.config.max_die_sides.set(maximum)
+        await self._refresh_settings()
         await ctx.send(
             success(
                 f"Maximum die sides is now set to {await self.config.max_die_sides()}"
@@ -155,8 +313,12 @@ class Dice(commands.Cog):
         if new_value < current_min:
             await ctx.send(f"You have to set the new max to be greater than the current min of `{current_min}`.")
             return
+        elif not odds.randstats_chance(current_min, new_value):
+            await ctx.send(error(f"No set of ability scores can total between `{current_min}` and `{new_value}`, pick a higher max."))
+            return
         else:
             await self.config.randstats_max.set(new_value)
+            await self._refresh_settings()
             await ctx.send(f"The maximum for randstats has been changed from `{current_max}` to `{new_value}`")
 
     @diceset.command(name="randstats_min")
@@ -170,8 +332,12 @@ class Dice(commands.Cog):
         if new_value > current_max:
             await ctx.send(f"You have to set the new min to be greater than the current max of `{current_max}`.")
             return
+        elif not odds.randstats_chance(new_value, current_max):
+            await ctx.send(error(f"No set of ability scores can total between `{new_value}` and `{current_max}`, pick a lower min."))
+            return
         else:
             await self.config.randstats_min.set(new_value)
+            await self._refresh_settings()
             await ctx.send(f"The minimum for randstats has been changed from `{current_min}` to `{new_value}`")
 
     @diceset.command(name="timeout")
@@ -186,6 +352,7 @@ class Dice(commands.Cog):
             return
         else:
             await self.config.timeout.set(new_value)
+            await self._refresh_settings()
             await ctx.send(success(f"The challenge timeout has been changed from `{current_timeout}` to `{new_value}` seconds."))
 
     @diceset.command(name="cleanup")
@@ -197,15 +364,81 @@ class Dice(commands.Cog):
         """
         if set is not None:
             await self.config.message_cleanup.set(set)
+            await self._refresh_settings()
             order_type = "on" if set else "off"
             await ctx.send(f"Message clean up was turned `{order_type}`.")
         else:
             current_setting = await self.config.message_cleanup()
             new_setting = not current_setting
             await self.config.message_cleanup.set(new_setting)
+            await self._refresh_settings()
             order_type = "on" if new_setting else "off"
             await ctx.send(f"Message clean up was toggled `{order_type}`.")
 
+    @diceset.command(name="audit")
+    async def audit(self, ctx, set: bool = None):
+        """Set or toggle audit mode.
+
+        In audit mode every roll is made from its own random seed, which is logged and kept in the roll history.
+        That includes Dragonchess, Augury and RollFood rolls made while Dice is loaded.
+        Any disputed roll can then be replayed exactly with `[p]diceset replay`.
+        """
+        if set is None:
+            set = not await self.config.audit()
+        await self.config.audit.set(set)
+        await self._refresh_settings()
+        order_type = "on" if set else "off"
+        await ctx.send(f"Audit mode was turned `{order_type}`.")
+
+    @diceset.command(name="replay")
+    async def replay(self, ctx: commands.Context, seed: int, *, formula: str):
+        """Replay an audited roll from its seed.
+
+        Give the seed and formula shown by `[p]rollhistory recent` (or the bot's log).
+        Use `randstats` as the formula to replay a randstats roll with the current min and max.
+        """
+        rng = RollRNG(seed)
+        try:
+            if formula == "randstats":
+                scores = odds.roll_ability_scores(self.settings["randstats_min"], self.settings["randstats_max"], rng.generator)
+                lines = [
+                    f"> {emojis['d6']} **4d6**: " + ", ".join(f"~~{die}~~" if i == dropped else str(die) for i, die in enumerate(dice))
+                    for dice, dropped in scores
+                ]
+            else:
+                lines = [
+                    f"> **{group}**: `{summary.result}`" + (f" · {summary.raw}" if summary.raw else "")
+                    for group, summaries in await self._replay(ctx, seed, rng, formula)
+                    for summary in summaries
+                ]
+        except (RollLimit, RollTimeout, RollUnavailable):
+            await ctx.send(error(f"`{formula}` can't be replayed right now - it's too big, another big roll is still going, or the dice workers stopped."))
+            return
+        except (
+            ValueError,
+            pyhedrals.InvalidOperandsException,
+            pyhedrals.SyntaxErrorException,
+            pyhedrals.UnknownCharacterException,
+        ) as exception:
+            await ctx.send(error(f"I couldn't replay `{formula}`:\n`{exception!s}`"))
+            return
+        message = "\n".join([f"### :rewind: Replay of `{formula}` with seed `{seed}`", *lines])
+        await ctx.send(message[:MAX_MESSAGE_LENGTH])
+
+    async def _replay(self, ctx: commands.Context, seed: int, rng: RollRNG, formula: str) -> list[tuple[str, list[engine.RollSummary]]]:
+        """Roll a formula from a seed the way [p]roll rolled it - inline or in a worker, single or batch."""
+        max_dice, max_sides = self.settings["max_dice_rolls"], self.settings["max_die_sides"]
+        groups = engine.split_batch(formula)
+        if len(groups) == 1 and groups[0][1] == 1:
+            if engine.estimate_cost(formula) <= INLINE_ROLL_COST:
+                with rng.roll():
+                    return [(formula, [engine.summarize(engine.roll(formula, self.dice_roller, max_dice, max_sides, rng), 0)])]
+            return [(formula, [await self.roll_pool.roll(ctx.author.id, formula, max_dice, max_sides, 0, seed)])]
+        if sum(engine.estimate_cost(group) * times for group, times in groups) <= INLINE_ROLL_COST:
+            with rng.roll():
+                return engine.roll_batch(groups, self.dice_roller, max_dice, max_sides, rng)
+        return await self.roll_pool.roll_batch(ctx.author.id, formula, groups, max_dice, max_sides, seed)
+
     #
     # Command methods
     #
@@ -216,11 +449,11 @@ class Dice(commands.Cog):
 
             You can specify a target, who can then roll and enter a modifier to determine the winner.
         """
-        dice_roller = pyhedrals.DiceRoller(
-                maxDice=await self.config.max_dice_rolls(),
-                maxSides=await self.config.max_die_sides(),
-            )
-        result = dice_roller.parse("1d20").result
+        dice_roller = self.dice_roller
+        with self._roll_rng(ctx, "1d20"):
+            roll = dice_roller.parse("1d20")
+            self._record_result(ctx, "1d20", roll, modifier)
+        result = roll.result
         total = result + modifier
         # Handle single roll
         if not challenge:
@@ -230,11 +463,11 @@ class Dice(commands.Cog):
             roll_message += f"** and got `{total}`"
             await ctx.send(roll_message)
             # Clean up prefix messages according to setting
-            if not ctx.interaction and await self.config.message_cleanup():
+            if not ctx.interaction and self.settings["message_cleanup"]:
                 await ctx.message.delete() 
             return
         # Handle contested roll
-        timeout = await self.config.timeout()
+        timeout = self.settings["timeout"]
         if challenge.bot:
             await ctx.send("`You can't challenge a bot!`",ephemeral=True)
             return
@@ -256,11 +489,11 @@ class Dice(commands.Cog):
 
         Optionally challenge someone to call it!
         """
-        dice_roller = pyhedrals.DiceRoller(
-                maxDice=await self.config.max_dice_rolls(),
-                maxSides=await self.config.max_die_sides(),
-            )
-        result = dice_roller.parse("1d2").result
+        dice_roller = self.dice_roller
+        with self._roll_rng(ctx, "1d2"):
+            roll = dice_roller.parse("1d2")
+            self._record_result(ctx, "1d2", roll)
+        result = roll.result
         coin = "heads" if result == 1 else "tails"
 
         # Handle single flip (no challenge)
@@ -268,12 +501,12 @@ class Dice(commands.Cog):
             roll_message = f"{emojis['d2']} {ctx.message.author.mention} flipped a coin and got `{coin}`"
             await ctx.send(roll_message)
             # Clean up prefix messages according to setting
-            if not ctx.interaction and await self.config.message_cleanup():
+            if not ctx.interaction and self.settings["message_cleanup"]:
                 await ctx.message.delete()
             return
 
         # Handle challenge
-        timeout = await self.config.timeout()
+        timeout = self.settings["timeout"]
         if challenge.bot:
             await ctx.send("`You can't challenge a bot!`", ephemeral=True)
             return
@@ -290,32 +523,31 @@ class Dice(commands.Cog):
         view.set_message(sent_message)
 
         # Clean up prefix messages according to setting
-        if not ctx.interaction and await self.config.message_cleanup():
+        if not ctx.interaction and self.settings["message_cleanup"]:
             await ctx.message.delete() 
 
     @commands.hybrid_command()
     async def eightball(self, ctx: commands.Context) -> None:
         """Get an answer from the Magic 8 Ball"""
-        dice_roller = pyhedrals.DiceRoller(
-                maxDice=await self.config.max_dice_rolls(),
-                maxSides=await self.config.max_die_sides(),
-            )
-        result = dice_roller.parse("1d20").result
+        dice_roller = self.dice_roller
+        with self._roll_rng(ctx, "1d20"):
+            roll = dice_roller.parse("1d20")
+            self._record_result(ctx, "1d20", roll)
+        result = roll.result
         answer = eightball_messages[result-1]
         roll_message = f"{emojis['eightball']} {ctx.message.author.mention} asked the **Magic 8 Ball** and got: `{answer}`"
         await ctx.send(roll_message)
        # Clean up prefix messages according to setting
-        if not ctx.interaction and await self.config.message_cleanup():
+        if not ctx.interaction and self.settings["message_cleanup"]:
             await ctx.message.delete() 
 
     @commands.hybrid_command()
     async def dis(self, ctx: commands.Context, modifier: int = 0) -> None:
         """ Roll 2d20 with disadvantage """
-        dice_roller = pyhedrals.DiceRoller(
-            maxDice=await self.config.max_dice_rolls(),
-            maxSides=await self.config.max_die_sides(),
-        )  
-        roll = dice_roller.parse("2d20dh")
+        dice_roller = self.dice_roller  
+        with self._roll_rng(ctx, "2d20dh"):
+            roll = dice_roller.parse("2d20dh")
+            self._record_result(ctx, "2d20dh", roll, modifier)
         first_roll, second_roll = [die.value for die in roll.rolls[0].rolls]
         result = roll.result + modifier
         if first_roll == roll.result:
@@ -333,17 +565,16 @@ class Dice(commands.Cog):
         roll_message += f" = `{result}`"
         await ctx.send(roll_message)
        # Clean up prefix messages according to setting
-        if not ctx.interaction and await self.config.message_cleanup():
+        if not ctx.interaction and self.settings["message_cleanup"]:
             await ctx.message.delete() 
 
     @commands.hybrid_command()
     async def adv(self, ctx: commands.Context, modifier: int = 0) -> None:
         """ Roll 2d20 with advantage """
-        dice_roller = pyhedrals.DiceRoller(
-            maxDice=await self.config.max_dice_rolls(),
-            maxSides=await self.config.max_die_sides(),
-        )  
-        roll = dice_roller.parse("2d20dl")
+        dice_roller = self.dice_roller  
+        with self._roll_rng(ctx, "2d20dl"):
+            roll = dice_roller.parse("2d20dl")
+            self._record_result(ctx, "2d20dl", roll, modifier)
         first_roll, second_roll = [die.value for die in roll.rolls[0].rolls]
         result = roll.result + modifier
         if first_roll == roll.result:
@@ -361,7 +592,7 @@ class Dice(commands.Cog):
         roll_message += f" = `{result}`"
         await ctx.send(roll_message)
        # Clean up prefix messages according to setting
-        if not ctx.interaction and await self.config.message_cleanup():
+        if not ctx.interaction and self.settings["message_cleanup"]:
             await ctx.message.delete() 
 
     @commands.hybrid_command()
@@ -370,41 +601,28 @@ class Dice(commands.Cog):
         Roll 4d6 six times, drop the lowest, and sum each.
         """
         try:
-            dice_roller = pyhedrals.DiceRoller(
-                maxDice=await self.config.max_dice_rolls(),
-                maxSides=await self.config.max_die_sides(),
-            )
-            min_total = await self.config.randstats_min()
-            max_total = await self.config.randstats_max()
-            total = 0
+            with self._roll_rng(ctx, "randstats") as rng:
+                scores = odds.roll_ability_scores(self.settings["randstats_min"], self.settings["randstats_max"], rng.generator)
             roll_message = ""
-            # Roll until the total is within the min and max range
-            while total <= min_total or total >= max_total:
-                total = 0
-                roll_message = ""
-                for _ in range(6):
-                    result = dice_roller.parse("4d6dl")
-                    roll_message += f"> {emojis['d6']} {list(result.rolls)[0]}\n"
-                    total += result.result
-                # Format the roll message for readability
-                roll_message = roll_message.replace(",", ", ")  # fix commas
-                roll_message = re.sub(r'(\b\d+d(20|12|10|8|6|4)):', r'**\1**:', roll_message)  # bold dice notation
-                roll_message = self.DROPPED_RE.sub(r"~~\1~~", roll_message)  # strike dropped
-                roll_message = re.sub(r'\((\d+)\)', r'= `\1`', roll_message)  # = result
+            total = 0
+            faces = [0] * 6
+            for dice, dropped in scores:
+                score = sum(dice) - dice[dropped]
+                total += score
+                shown = ", ".join(f"~~{die}~~" if i == dropped else str(die) for i, die in enumerate(dice))
+                roll_message += f"> {emojis['d6']} **4d6**: {shown} = `{score}`\n"
+                for die in dice:
+                    faces[die - 1] += 1
+            raw = " ".join("d6:" + ",".join(map(str, dice)) for dice, _ in scores)
+            self._record(ctx, f"{odds.ABILITY_SCORES}#4d6dl", total, raw, {6: faces}, rng.seed)
             # Clean up [p] messages according to setting, prepend author
-            if not ctx.interaction and await self.config.message_cleanup():
+            if not ctx.interaction and self.settings["message_cleanup"]:
                 await ctx.message.delete() 
                 roll_message = f":crossed_swords: {ctx.message.author.mention} rolled Ability Scores:\n" + roll_message
             roll_message += f"**=** `{total}`"  # append total
             
             await ctx.send(roll_message)
-        except (
-            ValueError,
-            NotImplementedError,
-            pyhedrals.InvalidOperandsException,
-            pyhedrals.SyntaxErrorException,
-            pyhedrals.UnknownCharacterException,
-        ) as exception:
+        except ValueError as exception:
             error_message = (
                 f"{ctx.author.mention}, something went wrong:\n`{exception!s}`"
             )
@@ -425,19 +643,43 @@ class Dice(commands.Cog):
         `4d6rdl` - Roll 4d6, reroll all 1s, then drop the lowest die
         `6d6c>4` - Roll 6d6, count all dice greater than 4 as successes
         `10d10r<=2kh6` - Roll 10d10, reroll all dice less than or equal to 2, then keep the highest 6 dice
+        `6#4d6dl` - Roll 4d6dl six times
+        `1d20+5; 2d6+3` - Roll an attack and its damage together
 
         Modifier order does matter, and usually they allow for specifying a specific number or number ranges after them.
         """
         try:
-            dice_roller = pyhedrals.DiceRoller(
-                maxDice=await self.config.max_dice_rolls(),
-                maxSides=await self.config.max_die_sides(),
-            )
-            result = dice_roller.parse(roll)
+            groups = engine.split_batch(roll)
+            if len(groups) > 1 or groups[0][1] > 1:
+                await self._roll_batch(ctx, roll, groups)
+                return
             # Roll Message
             roll_message = f"{ctx.message.author.mention} rolled `{roll}`" # prepend provenance
+            # Room left for the roll log beside the message and its result line
+            log_budget = MAX_MESSAGE_LENGTH - len(roll_message) - RESULT_LINE_RESERVE
+            max_dice, max_sides = self.settings["max_dice_rolls"], self.settings["max_die_sides"]
+            if engine.estimate_cost(roll) <= INLINE_ROLL_COST:
+                with self._roll_rng(ctx, roll) as rng:
+                    result = engine.summarize(engine.roll(roll, self.dice_roller, max_dice, max_sides, rng), log_budget)
+                    seed = rng.seed
+            else:
+                # The worker gets the audit seed; its own stream replays exactly like this one would
+                seed = self.rng.start_roll(self._roll_label(ctx, roll))
+                try:
+                    async with ctx.typing():
+                        result = await self.roll_pool.roll(ctx.author.id, roll, max_dice, max_sides, log_budget, seed)
+                except RollLimit:
+                    await ctx.send(error(f"{ctx.author.mention}, your last big roll is still going - wait for it to land first."), ephemeral=True)
+                    return
+                except RollTimeout:
+                    await ctx.send(error(f"{ctx.author.mention}, that roll took longer than {ROLL_DEADLINE} seconds, so I stopped it. Try fewer dice."), ephemeral=True)
+                    return
+                except RollUnavailable:
+                    await ctx.send(error(f"{ctx.author.mention}, the dice workers stopped before that roll landed - try again."), ephemeral=True)
+                    return
+            self._record(ctx, roll, result.result, result.raw, result.faces, seed)
             # Clean up prefix messages according to setting
-            if not ctx.interaction and await self.config.message_cleanup():
+            if not ctx.interaction and self.settings["message_cleanup"]:
                 await ctx.message.delete() 
             if len(roll_message) > MAX_MESSAGE_LENGTH:
                 roll_message = f"{ctx.message.author.mention} roll = `{result.result}`"
@@ -448,23 +690,9 @@ class Dice(commands.Cog):
                     )
                 )
                 return
-            # Format roll log
-            roll_log = "\n ".join(list(result.strings()))
-            roll_log = self.DROPPED_EXPLODED_RE.sub(r"~~**\1!**~~", roll_log)
-            roll_log = self.EXPLODED_RE.sub(r"**\1!**", roll_log)
-            roll_log = self.DROPPED_RE.sub(r"~~\1~~", roll_log)
-            roll_log = roll_log.replace(",", "+")
-            roll_log = re.sub(r'(\b\d+d(20|12|10|8|6|4|2)):', r'**\1**:', roll_log) # bold dice notation
-            roll_log = re.sub(r'\((\d+)\)', r'= \1', roll_log) # = result
-            # emojis at beginning of line
-            roll_log = re.sub(r'\*\*(\d+(d(20|12|10|8|6|4|2)))\*\*:', prepend_emoji, roll_log)
-            # format into quotes
-            roll_log = roll_log.replace("\n","\n>")
-            roll_log = "\n> " + roll_log # add quote to beginning
+            roll_log = result.log if result.log is not None else "> *(Roll log too long to display)*"
             # result line
             result_string = f"\n** = `{result.result}`**"
-            if len(roll_message) + len(roll_log) > MAX_MESSAGE_LENGTH:
-                roll_log = "> *(Roll log too long to display)*"
             await ctx.send(f"{roll_message} {roll_log} {result_string}")
         except (
             ValueError,
@@ -486,4 +714,173 @@ class Dice(commands.Cog):
                     error(
                         f"{ctx.author.mention}, I couldn't parse your [dice formula](<https://pypi.org/project/pyhedrals/>):\n`{exception!s}`"
                     )
-                )
\ No newline at end of file
+                )
+
+    async def _roll_batch(self, ctx: commands.Context, roll: str, groups: list[tuple[str, int]]) -> None:
+        """Roll several formulas (or one several times) and send every total in one message."""
+        if len(groups) > MAX_BATCH_GROUPS or sum(times for _, times in groups) > MAX_BATCH_ROLLS:
+            await ctx.send(error(f"{ctx.author.mention}, one batch can roll up to {MAX_BATCH_ROLLS} times across {MAX_BATCH_GROUPS} formulas."), ephemeral=True)
+            return
+        max_dice, max_sides = self.settings["max_dice_rolls"], self.settings["max_die_sides"]
+        if sum(engine.estimate_cost(formula) * times for formula, times in groups) <= INLINE_ROLL_COST:
+            with self._roll_rng(ctx, roll) as rng:
+                batch = engine.roll_batch(groups, self.dice_roller, max_dice, max_sides, rng)
+                seed = rng.seed
+        else:
+            seed = self.rng.start_roll(self._roll_label(ctx, roll))
+            try:
+                async with ctx.typing():
+                    batch = await self.roll_pool.roll_batch(ctx.author.id, roll, groups, max_dice, max_sides, seed)
+            except RollLimit:
+                await ctx.send(error(f"{ctx.author.mention}, your last big roll is still going - wait for it to land first."), ephemeral=True)
+                return
+            except RollTimeout:
+                await ctx.send(error(f"{ctx.author.mention}, that roll took longer than {ROLL_DEADLINE} seconds, so I stopped it. Try fewer dice."), ephemeral=True)
+                return
+            except RollUnavailable:
+                await ctx.send(error(f"{ctx.author.mention}, the dice workers stopped before that roll landed - try again."), ephemeral=True)
+                return
+        for formula, summaries in batch:
+            for summary in summaries:
+                self._record(ctx, formula, summary.result, summary.raw, summary.faces, seed)
+        # Clean up prefix messages according to setting
+        if not ctx.interaction and self.settings["message_cleanup"]:
+            await ctx.message.delete()
+        lines = [f"{ctx.message.author.mention} rolled `{roll}`"]
+        for formula, summaries in batch:
+            results = [summary.result for summary in summaries]
+            sides = engine.DICE_TERM_RE.search(formula)
+            emoji = emojis.get(f"d{sides.group(2)}", emojis["d20"]) if sides else emojis["d20"]
+            totals = " · ".join(f"`{result}`" for result in results)
+            if len(results) > 1:
+                lines.append(f"> {emoji} **{len(results)}#{formula}**: {totals} **=** `{sum(results)}`")
+            else:
+                lines.append(f"> {emoji} **{formula}**: {totals}")
+        message = "\n".join(lines)
+        if len(message) > MAX_MESSAGE_LENGTH:
+            message = "\n".join([lines[0], *(f"> **{formula}** = `{sum(s.result for s in summaries)}`" for formula, summaries in batch)])
+        if len(message) > MAX_MESSAGE_LENGTH:
+            await ctx.send(error(f"{ctx.author.mention}, I can't give you the result of that roll as it doesn't fit in a Discord message"))
+            return
+        await ctx.send(message)
+
+    @commands.hybrid_command(name="odds")
+    async def odds_command(self, ctx: commands.Context, formula: str, target: int = None) -> None:
+        """Show the exact odds of a dice formula.
+
+        Works out every total the formula can roll and how likely each one is.
+        Add a target to see the chance of rolling it or higher. Below are a few examples:
+
+        `4d6dl` - Odds for one ability score
+        `2d20kh+5 15` - Chance of beating 15 with advantage and a +5
+        `8d6 28` - Chance a fireball does 28 or more
+        """
+        try:
+            # Off the event loop, with the same deadline as a worker roll; the cost budget keeps it well inside
+            dist = await asyncio.wait_for(
+                asyncio.to_thread(odds.distribution, formula, self.settings["max_dice_rolls"], self.settings["max_die_sides"]),
+                ROLL_DEADLINE,
+            )
+        except engine.Unsupported:
+            await ctx.send(error(f"{ctx.author.mention}, I can't work out exact odds for `{formula}` - sorting, dice of dice and dice counts made of dice aren't supported."), ephemeral=True)
+            return
+        except odds.TooComplex:
+            await ctx.send(error(f"{ctx.author.mention}, `{formula}` has too many possible outcomes to work out exactly."), ephemeral=True)
+            return
+        except asyncio.TimeoutError:
+            await ctx.send(error(f"{ctx.author.mention}, working out the odds of `{formula}` took longer than {ROLL_DEADLINE} seconds."), ephemeral=True)
+            return
+        except (
+            ValueError,
+            pyhedrals.InvalidOperandsException,
+        ) as exception:
+            await ctx.send(
+                error(
+                    f"{ctx.author.mention}, I couldn't parse your [dice formula](<https://pypi.org/project/pyhedrals/>):\n`{exception!s}`"
+                ),
+                ephemeral=True
+            )
+            return
+        percentiles = " · ".join(f"{q}%: `{dist.percentile(q)}`" for q in odds.PERCENTILES)
+        message = (
+            f"{emojis['d20']} {ctx.author.mention} asked the odds of `{formula}`\n"
+            f"> **Average** `{dist.mean():.2f}` ± `{dist.stdev():.2f}` · **Range** `{dist.low}` to `{dist.high}`\n"
+            f"> **Percentiles** {percentiles}\n"
+        )
+        if target is not None:
+            message += f"> **Chance of {target} or more** `{dist.at_least(target) * 100:.2f}%`\n"
+        message += f"```\n{odds.histogram(dist)}\n```"
+        await ctx.send(message[:MAX_MESSAGE_LENGTH])
+        # Clean up prefix messages according to setting
+        if not ctx.interaction and self.settings["message_cleanup"]:
+            await ctx.message.delete()
+
+    @commands.hybrid_group()
+    async def rollhistory(self, ctx: commands.Context) -> None:
+        """Look back over past rolls, and check whether the dice are cursed."""
+
+    @rollhistory.command(name="recent")
+    async def rollhistory_recent(self, ctx: commands.Context, member: discord.Member = None) -> None:
+        """Show your (or someone else's) last few rolls."""
+        member = member or ctx.author
+        await self._flush_history()
+        rows = await asyncio.to_thread(self.history.recent, member.id, RECENT_ROLLS)
+        if not rows:
+            await ctx.send(question(f"`{member.display_name}` hasn't rolled anything yet."), ephemeral=True)
+            return
+        lines = [f"### :scroll: Last rolls for {member.display_name}"]
+        for rolled_at, formula, total, dice, seed in rows:
+            line = f"> <t:{int(rolled_at)}:R> `{formula[:50]}` = `{total[:20]}`"
+            if dice:
+                line += f" · {dice[:60]}{'...' if len(dice) > 60 else ''}"
+            if seed:
+                line += f" · seed `{seed}`"
+            lines.append(line)
+        await ctx.send("\n".join(lines)[:MAX_MESSAGE_LENGTH])
+
+    @rollhistory.command(name="d20")
+    async def rollhistory_d20(self, ctx: commands.Context, member: discord.Member = None) -> None:
+        """Show how your (or someone else's) d20s have landed."""
+        member = member or ctx.author
+        await self._flush_history()
+        counts = await asyncio.to_thread(self.history.faces, member.id, 20)
+        total = sum(counts)
+        if not total:
+            await ctx.send(question(f"`{member.display_name}` hasn't rolled a d20 yet."), ephemeral=True)
+            return
+        peak = max(counts)
+        chart = "\n".join(
+            f"{face:>2} {count:>6} {'█' * round(24 * count / peak)}" for face, count in enumerate(counts, 1)
+        )
+        average = sum(face * count for face, count in enumerate(counts, 1)) / total
+        message = (
+            f"### {emojis['d20']} d20 rolls for {member.display_name}\n"
+            f"> **Rolls** `{total}` · **Average** `{average:.2f}` (a fair d20 averages `10.50`)\n"
+            f"> {self._fairness_verdict(counts)}\n"
+            f"```\n{chart}\n```"
+        )
+        await ctx.send(message)
+
+    @rollhistory.command(name="fairness")
+    async def rollhistory_fairness(self, ctx: commands.Context) -> None:
+        """Check every die size against a fair die, across everyone's rolls."""
+        await self._flush_history()
+        lines = ["### :scales: Are the dice fair?"]
+        for sides in FAIRNESS_DICE:
+            counts = await asyncio.to_thread(self.history.faces, ALL_USERS, sides)
+            if sum(counts):
+                emoji = emojis.get(f"d{sides}", "")
+                lines.append(f"> {emoji} **d{sides}** `{sum(counts)}` rolls - {self._fairness_verdict(counts)}")
+        if len(lines) == 1:
+            await ctx.send(question("Nobody has rolled anything yet."), ephemeral=True)
+            return
+        await ctx.send("\n".join(lines))
+
+    def _fairness_verdict(self, counts: list[int]) -> str:
+        """One line summing up a chi-square test of face counts against a fair die."""
+        test = chi_square(counts)
+        if test is None:
+            return f"*not enough rolls to judge yet ({5 * len(counts)} needed)*"
+        statistic, p_value = test
+        verdict = "looks **suspicious**" if p_value < 0.01 else "looks fair"
+        return f"χ² `{statistic:.1f}` ({len(counts) - 1} df), p = `{p_value:.3f}` - {verdict}"
@@ -0,0 +1,582 @@
+"""
+Vectorized dice engine for the Dice cog.
+
+Rolls the common subset of pyhedrals notation - NdS, kh/kl/dh/dl, r/ro,
+!, c (with comparisons) and + - * / % ^ arithmetic - as NumPy arrays, so a
+pool of a million dice costs milliseconds rather than a million Die objects.
+Results are pyhedrals RollResults whose roll lists print exactly like
+pyhedrals' own, so the roll log format doesn't change.
+
+Anything outside the subset (sorting, dice inside modifiers or dice counts,
+dice of dice, ...) raises Unsupported and `roll()` hands the formula to
+pyhedrals instead.
+"""
+
+import operator
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pyhedrals
+
+from .dm_lib import emojis
+from .rng import RollRNG
+
+# Same operand limits as pyhedrals.DiceRoller's defaults
+MAX_EXPONENT = 10000
+MAX_MULT = 1000000
+# Larger dice overflow int64 sums, leave them to pyhedrals' Python ints
+MAX_VECTOR_SIDES = 2**31
+# Explosion/reroll chains longer than this are left to pyhedrals
+MAX_CHAIN_ROUNDS = 1000
+# Roughly how many times faster a die is here than in pyhedrals
+VECTOR_SPEEDUP = 100
+# Dice kept verbatim in roll history per roll, and the biggest dice whose faces are counted
+MAX_RECORDED_DICE = 100
+MAX_COUNTED_SIDES = 100
+
+TOKEN_RE = re.compile(
+    r"(?P<space>[ \t\n]+)"
+    r"|(?P<number>\d+)"
+    r"|(?P<op>[-+*/%^()])"
+    r"|(?P<keepdrop>kh|kl|dh|dl)"
+    r"|(?P<explode>!(?:[<>]=?)?)"
+    r"|(?P<reroll>ro?(?:[<>]=?)?)"
+    r"|(?P<count>c(?:[<>]=?)?)"
+    r"|(?P<sort>s[ad]?)"
+    r"|(?P<dice>d)"
+    r"|(?P<comment>\#.*)"
+)
+MODIFIERS = {"keepdrop", "explode", "reroll", "count"}
+# A literal dice term and its modifiers, for cost estimates
+DICE_TERM_RE = re.compile(r"(\d*)\s*d\s*(\d+)((?:\s*(?:kh|kl|dh|dl|ro?|!|c|s[ad]?|[<>]=?|\d+))*)")
+# `6#4d6dl` - roll a formula six times
+REPEAT_RE = re.compile(r"\s*(\d+)#(?=\S)")
+# Batch separators, and pyhedrals comments (to the end of the line) that may contain them
+SEPARATOR_RE = re.compile(r"\#[^\n]*|;")
+# Dice counts that come from an expression rather than a literal: (..)dN, dice of dice
+COMPUTED_COUNT_RE = re.compile(r"\)\s*d|d\s*\d+\s*d\s*\d|d\s*\(")
+BINARY_OPS = {
+    "+": (1, operator.add),
+    "-": (1, operator.sub),
+    "*": (2, operator.mul),
+    "/": (2, operator.floordiv),
+    "%": (2, operator.mod),
+    "^": (3, operator.pow),
+}
+
+
+class Unsupported(Exception):
+    """The formula uses notation this engine doesn't handle; use pyhedrals."""
+
+
+class RollArray:
+    """A pyhedrals RollList held as arrays: one entry per die, in pyhedrals' order."""
+
+    def __init__(self, num_dice: int, num_sides: int, values: np.ndarray):
+        self.numDice = num_dice
+        self.numSides = num_sides
+        self.values = values
+        self.dropped = np.zeros(num_dice, dtype=bool)
+        self.exploded = np.zeros(num_dice, dtype=bool)
+        self.count = False
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def sum(self) -> int:
+        if self.count:
+            return int(np.count_nonzero(~self.dropped))
+        return int(self.values[~self.dropped].sum())
+
+    def extend(self, values: np.ndarray, dropped: np.ndarray, exploded: np.ndarray) -> None:
+        self.values = np.concatenate((self.values, values))
+        self.dropped = np.concatenate((self.dropped, dropped))
+        self.exploded = np.concatenate((self.exploded, exploded))
+
+    def __str__(self) -> str:
+        dice = self.values.astype(str)
+        if self.exploded.any():
+            dice = np.where(self.exploded, np.char.add(np.char.add("*", dice), "*"), dice)
+        if self.dropped.any():
+            dice = np.where(self.dropped, np.char.add(np.char.add("-", dice), "-"), dice)
+        return "{}d{}: {} ({})".format(self.numDice, self.numSides, ",".join(dice.tolist()), self.sum())
+
+
+def _tokenize(formula: str) -> tuple[list[tuple[str, str | int]], str | None]:
+    tokens = []
+    description = None
+    pos = 0
+    while pos < len(formula):
+        match = TOKEN_RE.match(formula, pos)
+        if match is None:
+            raise Unsupported  # pyhedrals reports the unknown character
+        kind = match.lastgroup
+        text = match.group()
+        pos = match.end()
+        if kind == "space":
+            continue
+        if kind == "comment":
+            description = text[1:].strip()
+            break
+        if kind == "sort":
+            raise Unsupported
+        if kind == "number":
+            if len(text) >= 100:
+                raise Unsupported
+            tokens.append((kind, int(text)))
+        elif kind == "op":
+            tokens.append((text, text))
+        else:
+            tokens.append((kind, text))
+    return tokens, description
+
+
+class NumpyDiceRoller:
+    """Parses and rolls one formula. Mirrors pyhedrals' semantics and error messages."""
+
+    def __init__(self, max_dice: int, max_sides: int, rng: RollRNG):
+        self.max_dice = max_dice
+        self.max_sides = max_sides
+        self.rng = rng
+        # Starting dice for every repeat of each dice term, while rolling repeats
+        self._blocks: dict[int, np.ndarray] | None = None
+
+    def parse(self, formula: str) -> pyhedrals.RollResult:
+        self.tokens, description = _tokenize(formula)
+        return self._evaluate(description)
+
+    def parse_many(self, formula: str, times: int) -> list[pyhedrals.RollResult]:
+        """Roll a formula `times` times, drawing each dice term's dice for every repeat in one block."""
+        self.tokens, description = _tokenize(formula)
+        self._blocks, self._times = {}, times
+        try:
+            results = []
+            for self._repeat in range(times):
+                results.append(self._evaluate(description))
+            return results
+        finally:
+            self._blocks = None
+
+    def _evaluate(self, description: str | None) -> pyhedrals.RollResult:
+        self.pos = 0
+        self._term = 0
+        self.rolls: list[RollArray] = []
+        if not self.tokens:
+            raise Unsupported
+        value = self._expr(0)
+        if self.pos != len(self.tokens):
+            raise Unsupported  # pyhedrals reports the syntax error
+        result = self._sum(value)
+        return pyhedrals.RollResult(result, self.rolls, description)
+
+    ### PARSING
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> tuple[str, str | int]:
+        if self.pos >= len(self.tokens):
+            raise Unsupported
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _expr(self, min_precedence: int):
+        """Precedence climbing over the binary operators (all left associative, like pyhedrals)."""
+        left = self._unary()
+        while (op := self._peek()) in BINARY_OPS and BINARY_OPS[op][0] > min_precedence:
+            self.pos += 1
+            precedence, func = BINARY_OPS[op]
+            right = self._expr(precedence)
+            # pyhedrals sums (and logs) both sides only once the operator is reduced
+            left = self._apply(op, func, self._sum(left), self._sum(right))
+        return left
+
+    def _unary(self):
+        if self._peek() == "-":
+            self.pos += 1
+            if self._peek() == "number" and self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1][0] == "dice":
+                raise Unsupported  # -NdS rolls a negative number of dice in pyhedrals
+            return -self._sum(self._unary())
+        return self._dice()
+
+    def _dice(self):
+        kind, value = self._next()
+        if kind == "dice":
+            count = 1
+            kind, value = self._next()
+            if kind != "number":
+                raise Unsupported
+            return self._modifiers(self._roll(count, value))
+        if kind == "number":
+            if self._peek() != "dice":
+                return value
+            self.pos += 1
+            sides_kind, sides = self._next()
+            if sides_kind != "number":
+                raise Unsupported
+            return self._modifiers(self._roll(value, sides))
+        if kind == "(":
+            inner = self._expr(0)
+            if self._next()[0] != ")":
+                raise Unsupported
+            if self._peek() in MODIFIERS or self._peek() == "dice":
+                raise Unsupported
+            return inner
+        raise Unsupported
+
+    def _modifiers(self, rolls: RollArray) -> RollArray:
+        while (kind := self._peek()) in MODIFIERS:
+            op = self._next()[1]
+            arg = None
+            nxt = self._peek()
+            if nxt == "number":
+                arg = self._next()[1]
+                if self._peek() in ("dice", "("):
+                    raise Unsupported
+            elif nxt in ("-", "dice", "("):
+                raise Unsupported  # an expression argument
+            if kind == "keepdrop":
+                self._keep_drop(rolls, op, arg or 1)
+            elif kind == "explode":
+                self._explode(rolls, op, arg or rolls.numSides, arg is not None)
+            elif kind == "reroll":
+                self._reroll(rolls, op, arg or 1, arg is not None)
+            else:
+                self._count(rolls, op, arg or rolls.numSides, arg is not None)
+        if self._peek() == "dice":
+            raise Unsupported  # dice of dice
+        return rolls
+
+    ### ROLLING
+
+    def _roll(self, num_dice: int, num_sides: int) -> RollArray:
+        if num_dice > self.max_dice:
+            raise pyhedrals.InvalidOperandsException(
+                f"attempted to roll more than {self.max_dice} dice in a single d expression"
+            )
+        if num_sides > self.max_sides:
+            raise pyhedrals.InvalidOperandsException(
+                f"attempted to roll a die with more than {self.max_sides} sides"
+            )
+        if num_sides < 1:
+            raise pyhedrals.InvalidOperandsException("attempted to roll a die with zero sides")
+        if num_sides > MAX_VECTOR_SIDES:
+            raise Unsupported
+        if self._blocks is None:
+            return RollArray(num_dice, num_sides, self.rng.integers(1, num_sides + 1, num_dice))
+        # Terms come in the same order every repeat - no dice counts are computed
+        block = self._blocks.get(self._term)
+        if block is None:
+            block = self._blocks[self._term] = self.rng.integers(1, num_sides + 1, (self._times, num_dice))
+        self._term += 1
+        return RollArray(num_dice, num_sides, block[self._repeat])
+
+    def _keep_drop(self, rolls: RollArray, op: str, n: int) -> None:
+        valid = np.flatnonzero(~rolls.dropped)
+        if op.startswith("d"):
+            op_type = "drop"
+            keep = len(valid) - n
+        else:
+            op_type = "keep"
+            keep = n
+        if len(valid) < keep:
+            raise pyhedrals.InvalidOperandsException(
+                f"attempted to {op_type} {keep} dice when only {len(valid)} were rolled"
+            )
+        values = rolls.values[valid]
+        # Stable sorts keep the earliest of tied dice. pyhedrals' heapq over Die objects (ordered by
+        # value alone) can strike a different one of the tied dice - the total is the same either way
+        order = np.argsort(-values if op in ("kh", "dl") else values, kind="stable")
+        rolls.dropped[valid] = True
+        if keep > 0:
+            rolls.dropped[valid[order[:keep]]] = False
+
+    def _explode(self, rolls: RollArray, op: str, threshold: int, given: bool) -> None:
+        match = _comparison("explode", op, threshold, rolls.numSides, given)
+        hits = match(rolls.values)
+        rolls.exploded |= hits
+        values, exploded = self._chains(np.count_nonzero(hits), rolls.numSides, match)
+        rolls.extend(values, np.zeros(len(values), dtype=bool), exploded)
+
+    def _reroll(self, rolls: RollArray, op: str, threshold: int, given: bool) -> None:
+        match = _comparison("reroll", op, threshold, rolls.numSides, given)
+        hits = match(rolls.values)
+        rolls.dropped |= hits
+        if len(op) > 1 and op[1] == "o":
+            values = self.rng.integers(1, rolls.numSides + 1, np.count_nonzero(hits))
+            dropped = np.zeros(len(values), dtype=bool)
+        else:
+            values, dropped = self._chains(np.count_nonzero(hits), rolls.numSides, match)
+        rolls.extend(values, dropped, np.zeros(len(values), dtype=bool))
+
+    def _count(self, rolls: RollArray, op: str, threshold: int, given: bool) -> None:
+        match = _comparison("count", op, threshold, rolls.numSides, given)
+        rolls.dropped |= ~rolls.dropped & ~match(rolls.values)
+        rolls.count = True
+
+    def _chains(self, starts: int, sides: int, match) -> tuple[np.ndarray, np.ndarray]:
+        """Roll `starts` chains of new dice, each continuing while its last die matches.
+
+        Returns the dice chain by chain (depth first, as pyhedrals' recursion appends
+        them) and which of them matched.
+        """
+        if starts and match(np.arange(1, sides + 1)).all():
+            raise Unsupported  # every face matches - pyhedrals recurses until it errors
+        chain_ids, rounds, values, matched = [], [], [], []
+        alive = np.arange(starts)
+        round_no = 0
+        while len(alive):
+            if round_no >= MAX_CHAIN_ROUNDS:
+                raise Unsupported
+            new = self.rng.integers(1, sides + 1, len(alive))
+            hit = match(new)
+            chain_ids.append(alive)
+            rounds.append(np.full(len(alive), round_no))
+            values.append(new)
+            matched.append(hit)
+            alive = alive[hit]
+            round_no += 1
+        if not values:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+        order = np.lexsort((np.concatenate(rounds), np.concatenate(chain_ids)))
+        return np.concatenate(values)[order], np.concatenate(matched)[order]
+
+    ### ARITHMETIC
+
+    def _sum(self, value) -> int:
+        if isinstance(value, RollArray):
+            self.rolls.append(value)
+            return value.sum()
+        return value
+
+    def _apply(self, op: str, func, left: int, right: int) -> int:
+        if op == "*" and not (-MAX_MULT <= left <= MAX_MULT and -MAX_MULT <= right <= MAX_MULT):
+            raise pyhedrals.InvalidOperandsException(
+                f"multiplication operands are larger than the maximum {MAX_MULT}"
+            )
+        if op == "^" and not (-MAX_EXPONENT <= left <= MAX_EXPONENT and -MAX_EXPONENT <= right <= MAX_EXPONENT):
+            raise pyhedrals.InvalidOperandsException(
+                f"operand or exponent is larger than the maximum {MAX_EXPONENT}"
+            )
+        return func(left, right)
+
+
+def _comparison(name: str, op: str, threshold: int, sides: int, given: bool):
+    """Vectorized version of pyhedrals' comparison for a modifier, with the same validation."""
+    if op.endswith("<="):
+        if threshold >= sides:
+            raise pyhedrals.InvalidOperandsException(f"{name} threshold '<={threshold}' is invalid with {sides} sided dice")
+        compare = np.less_equal
+    elif op.endswith(">="):
+        if threshold <= 1:
+            raise pyhedrals.InvalidOperandsException(f"{name} threshold '>={threshold}' is invalid")
+        compare = np.greater_equal
+    elif op.endswith("<"):
+        if threshold > sides:
+            raise pyhedrals.InvalidOperandsException(f"{name} threshold '<{threshold}' is invalid with {sides} sided dice")
+        compare = np.less
+    elif op.endswith(">"):
+        if threshold < 1:
+            raise pyhedrals.InvalidOperandsException(f"{name} threshold '>{threshold}' is invalid")
+        compare = np.greater
+    else:
+        if not 1 <= threshold <= sides:
+            raise pyhedrals.InvalidOperandsException(f"{name} threshold '{threshold}' is invalid with {sides} sided dice")
+        return lambda values: values == threshold
+    if not given:
+        raise pyhedrals.InvalidOperandsException(f"no parameter given to {name} comparison")
+    return lambda values: compare(values, threshold)
+
+
+def dice_count(result: pyhedrals.RollResult) -> int:
+    """Dice in a result's roll log, from either engine."""
+    return sum(len(rolls) if isinstance(rolls, RollArray) else len(rolls.rolls) for rolls in result.rolls)
+
+
+def estimate_cost(formula: str) -> float:
+    """Rough cost of a formula, in dice pyhedrals would roll one at a time.
+
+    Counts the literal dice terms, allowing for explosions/rerolls and pyhedrals'
+    quadratic keep/drop. Dice counts computed from other dice can't be sized
+    without rolling, so those formulas are priced as unbounded.
+    """
+    if COMPUTED_COUNT_RE.search(formula):
+        return float("inf")
+    try:
+        _tokenize(formula)
+        vectorized = True
+    except Unsupported:
+        vectorized = False
+    cost = 0.0
+    for match in DICE_TERM_RE.finditer(formula):
+        dice = int(match.group(1) or 1)
+        modifiers = match.group(3)
+        if "!" in modifiers or "r" in modifiers:
+            dice *= 2
+        if any(op in modifiers for op in ("kh", "kl", "dh", "dl")):
+            # pyhedrals marks each dropped die with a list scan; here it's a sort
+            dice *= max(1, dice // 2) if not vectorized else 10
+        cost += dice
+    return cost / VECTOR_SPEEDUP if vectorized else cost
+
+
+@dataclass
+class RollSummary:
+    """What [p]roll needs from a roll - small enough to send back from a worker process."""
+    result: int
+    description: str | None
+    dice: int
+    log: str | None                 # quoted Discord markdown, None if over the message budget
+    raw: str | None                 # raw_dice() for roll history
+    faces: dict[int, list[int]]     # face_counts() for roll history
+
+
+def _values(rolls) -> np.ndarray:
+    if isinstance(rolls, RollArray):
+        return rolls.values
+    return np.fromiter((die.value for die in rolls.rolls), dtype=np.int64, count=len(rolls.rolls))
+
+
+def raw_dice(result: pyhedrals.RollResult, limit: int = MAX_RECORDED_DICE) -> str | None:
+    """Every die a roll threw, as `d6:5,3,6,2 d20:14`, or None if there are more than `limit`."""
+    if dice_count(result) > limit:
+        return None
+    return " ".join(f"d{rolls.numSides}:" + ",".join(map(str, _values(rolls).tolist())) for rolls in result.rolls)
+
+
+def face_counts(result: pyhedrals.RollResult, max_sides: int = MAX_COUNTED_SIDES) -> dict[int, list[int]]:
+    """How many times each face came up, per die size, counting dropped and rerolled dice too."""
+    faces = {}
+    for rolls in result.rolls:
+        if rolls.numSides > max_sides:
+            continue
+        counts = np.bincount(_values(rolls), minlength=rolls.numSides + 1)[1:]
+        faces[rolls.numSides] = (faces[rolls.numSides] + counts) if rolls.numSides in faces else counts
+    return {sides: counts.tolist() for sides, counts in faces.items()}
+
+
+def _die(value: int, dropped: bool, exploded: bool) -> str:
+    if exploded:
+        return f"~~**{value}!**~~" if dropped else f"**{value}!**"
+    return f"~~{value}~~" if dropped else str(value)
+
+
+def format_log(result: pyhedrals.RollResult, budget: int) -> str | None:
+    """Roll log as quoted Discord markdown, one line per dice expression.
+
+    Built in a single pass over the roll lists, giving up (None) as soon as it
+    runs past `budget` characters.
+    """
+    parts = []
+    length = 0
+    for rolls in result.rolls:
+        notation = f"{rolls.numDice}d{rolls.numSides}"
+        emoji = emojis.get(f"d{rolls.numSides}")
+        head = f"\n> {emoji} **{notation}**: " if emoji else f"\n> {notation}: "
+        size = len(rolls) if isinstance(rolls, RollArray) else len(rolls.rolls)
+        # Every die takes at least a digit and a "+"
+        length += len(head) + max(0, 2 * size - 1)
+        if length > budget:
+            return None
+        parts.append(head)
+        if isinstance(rolls, RollArray):
+            dice = zip(rolls.values.tolist(), rolls.dropped.tolist(), rolls.exploded.tolist())
+        else:
+            dice = ((die.value, die.dropped, die.exploded) for die in rolls.rolls)
+        for value, dropped, exploded in dice:
+            text = _die(value, dropped, exploded)
+            length += len(text) - 1
+            if length > budget:
+                return None
+            parts.append(text)
+            parts.append("+")
+        if size:
+            parts.pop()
+        total = f" = {rolls.sum()}"
+        length += len(total)
+        if length > budget:
+            return None
+        parts.append(total)
+    # A formula without dice still gets the empty quote line it always had
+    return "".join(parts) or "\n> "
+
+
+def summarize(result: pyhedrals.RollResult, log_budget: int) -> RollSummary:
+    """Summarise a roll, with its log if that fits in `log_budget` characters."""
+    return RollSummary(
+        result.result,
+        result.description,
+        dice_count(result),
+        format_log(result, log_budget),
+        raw_dice(result),
+        face_counts(result),
+    )
+
+
+def roll_summary(formula: str, max_dice: int, max_sides: int, log_budget: int, seed: int | None = None) -> RollSummary:
+    """Roll and summarise a formula in a worker process, on a stream seeded with `seed` if given."""
+    fallback = pyhedrals.DiceRoller(maxDice=max_dice, maxSides=max_sides)
+    with RollRNG(seed).roll() as rng:
+        return summarize(roll(formula, fallback, max_dice, max_sides, rng), log_budget)
+
+
+def roll(formula: str, fallback: pyhedrals.DiceRoller, max_dice: int, max_sides: int, rng: RollRNG) -> pyhedrals.RollResult:
+    """Roll a formula with the vectorized engine, or with pyhedrals if it can't handle it.
+
+    pyhedrals only draws from `rng` inside `rng.roll()`.
+    """
+    try:
+        return NumpyDiceRoller(max_dice, max_sides, rng).parse(formula)
+    except Unsupported:
+        return fallback.parse(formula)
+
+
+def roll_many(formula: str, times: int, fallback: pyhedrals.DiceRoller, max_dice: int, max_sides: int, rng: RollRNG) -> list[pyhedrals.RollResult]:
+    """Roll a formula several times, vectorized across the repeats where the engine can."""
+    try:
+        return NumpyDiceRoller(max_dice, max_sides, rng).parse_many(formula, times)
+    except Unsupported:
+        return [fallback.parse(formula) for _ in range(times)]
+
+
+def split_batch(formula: str) -> list[tuple[str, int]]:
+    """Split batch notation - `1d20+5; 2d6+3`, `6#4d6dl` - into (formula, times) groups.
+
+    A `#` after a group's repeat count starts a comment, and `;` inside a comment
+    doesn't split.
+    """
+    groups = []
+    pos = 0
+    while pos <= len(formula):
+        times = 1
+        if match := REPEAT_RE.match(formula, pos):
+            times = int(match.group(1))
+            pos = match.end()
+        end = next((m.start() for m in SEPARATOR_RE.finditer(formula, pos) if m.group() == ";"), len(formula))
+        part = formula[pos:end].strip()
+        pos = end + 1
+        if not part:
+            continue
+        if times < 1:
+            raise ValueError(f"can't roll '{part}' {times} times")
+        groups.append((part, times))
+    if not groups:
+        raise ValueError("there's nothing to roll")
+    return groups
+
+
+def roll_batch(groups: list[tuple[str, int]], fallback: pyhedrals.DiceRoller, max_dice: int, max_sides: int, rng: RollRNG) -> list[tuple[str, list[RollSummary]]]:
+    """Roll every group of a batch, returning each group's formula and a summary (without log) per roll."""
+    return [
+        (formula, [summarize(result, 0) for result in roll_many(formula, times, fallback, max_dice, max_sides, rng)])
+        for formula, times in groups
+    ]
+
+
+def roll_batch_summary(groups: list[tuple[str, int]], max_dice: int, max_sides: int, seed: int | None = None) -> list[tuple[str, list[RollSummary]]]:
+    """Roll a batch in a worker process, on a stream seeded with `seed` if given."""
+    fallback = pyhedrals.DiceRoller(maxDice=max_dice, maxSides=max_sides)
+    with RollRNG(seed).roll() as rng:
+        return roll_batch(groups, fallback, max_dice, max_sides, rng)
@@ -0,0 +1,151 @@
+"""
+Dice - Roll History
+
+Keeps every roll in sqlite under the cog's data folder. Face counts per user
+(and for everyone, under ALL_USERS) are updated as rolls are written, so the
+history commands read small aggregate rows instead of scanning the roll log.
+"""
+import math
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rolls (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    rolled_at REAL NOT NULL,
+    command TEXT NOT NULL,
+    formula TEXT NOT NULL,
+    total TEXT NOT NULL,
+    dice TEXT,
+    seed TEXT
+);
+CREATE INDEX IF NOT EXISTS rolls_by_user ON rolls (user_id, id);
+CREATE TABLE IF NOT EXISTS faces (
+    user_id INTEGER NOT NULL,
+    sides INTEGER NOT NULL,
+    face INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, sides, face)
+) WITHOUT ROWID;
+"""
+
+# faces.user_id for the totals across every user
+ALL_USERS = 0
+
+
+@dataclass(slots=True)
+class RollRecord:
+    """One roll, waiting to be written."""
+    user_id: int
+    channel_id: int
+    rolled_at: float
+    command: str
+    formula: str
+    total: int
+    dice: str | None                # engine.raw_dice(), None for huge rolls
+    faces: dict[int, list[int]]     # engine.face_counts()
+    seed: int | None = None         # audit seed, if audit mode was on
+
+
+class HistoryStore:
+    """sqlite roll log with running face counts.
+
+    Methods are blocking; call them through `asyncio.to_thread`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        # Histories from before audit mode have no seed column
+        if "seed" not in {row[1] for row in conn.execute("PRAGMA table_info(rolls)")}:
+            conn.execute("ALTER TABLE rolls ADD COLUMN seed TEXT")
+        return conn
+
+    def write(self, records: list[RollRecord]) -> None:
+        """Append a batch of rolls and fold their dice into the face counts, in one transaction."""
+        counts: dict[tuple[int, int, int], int] = {}
+        for record in records:
+            for sides, faces in record.faces.items():
+                for face, count in enumerate(faces, 1):
+                    if count:
+                        for user_id in (record.user_id, ALL_USERS):
+                            key = (user_id, sides, face)
+                            counts[key] = counts.get(key, 0) + count
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO rolls (user_id, channel_id, rolled_at, command, formula, total, dice, seed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (r.user_id, r.channel_id, r.rolled_at, r.command, r.formula, str(r.total), r.dice, None if r.seed is None else str(r.seed))
+                        for r in records
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO faces VALUES (?, ?, ?, ?) ON CONFLICT (user_id, sides, face) DO UPDATE SET count = count + excluded.count",
+                    ((*key, count) for key, count in counts.items()),
+                )
+        finally:
+            conn.close()
+
+    def recent(self, user_id: int, limit: int = 10) -> list[tuple[float, str, str, str | None, str | None]]:
+        """A user's last rolls, newest first, as (rolled_at, formula, total, dice, seed)."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT rolled_at, formula, total, dice, seed FROM rolls WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def faces(self, user_id: int, sides: int) -> list[int]:
+        """How often each face of a die size has come up for a user (or ALL_USERS)."""
+        conn = self._connect()
+        try:
+            counts = [0] * sides
+            for face, count in conn.execute(
+                "SELECT face, count FROM faces WHERE user_id = ? AND sides = ?", (user_id, sides)
+            ):
+                counts[face - 1] = count
+            return counts
+        finally:
+            conn.close()
+
+    def delete_user(self, user_id: int) -> None:
+        """Forget a user's rolls, taking their dice out of the totals too."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE faces SET count = count - coalesce((SELECT mine.count FROM faces AS mine"
+                    " WHERE mine.user_id = ? AND mine.sides = faces.sides AND mine.face = faces.face), 0)"
+                    " WHERE user_id = ?",
+                    (user_id, ALL_USERS),
+                )
+                conn.execute("DELETE FROM faces WHERE user_id = ?", (user_id,))
+                conn.execute("DELETE FROM rolls WHERE user_id = ?", (user_id,))
+        finally:
+            conn.close()
+
+
+def chi_square(counts: list[int]) -> tuple[float, float] | None:
+    """Pearson's chi-square statistic against a fair die, and its approximate p-value.
+
+    The p-value uses the Wilson-Hilferty normal approximation, which is plenty
+    for 20-sided dice. None until there are at least five rolls per face.
+    """
+    total = sum(counts)
+    if total < 5 * len(counts):
+        return None
+    expected = total / len(counts)
+    statistic = sum((count - expected) ** 2 for count in counts) / expected
+    df = len(counts) - 1
+    z = ((statistic / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return statistic, 0.5 * math.erfc(z / math.sqrt(2))
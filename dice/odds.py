@@ -0,0 +1,510 @@
+"""
+Exact outcome distributions for dice formulas.
+
+Works out the probability of every total a formula can roll, for the same
+notation engine.py rolls: dice pools are convolutions of single dice (FFT for
+big pools), keep/drop is dynamic programming over how many dice land on each
+face, and rerolls, explosions and success counting reshape the single die
+first. Dice terms and whole formulas are memoized, so repeated questions like
+`4d6dl` or `2d20kh` are answered straight from the cache.
+"""
+
+import itertools
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pyhedrals
+
+from .engine import BINARY_OPS, MAX_EXPONENT, MAX_MULT, MODIFIERS, Unsupported, _comparison, _tokenize
+
+# Widest range of totals a distribution may cover
+MAX_SUPPORT = 1000000
+# Face/dice-count steps allowed in one keep/drop calculation
+MAX_KEEP_DROP_STEPS = 50000
+# Explosion chains are followed until this little probability is left
+EXPLODE_TAIL = 1e-12
+# Convolutions bigger than this (len * len) use FFT
+FFT_THRESHOLD = 100000
+# Array element operations one whole formula may take - about a second of work
+MAX_FORMULA_COST = 500000000
+PERCENTILES = (5, 25, 50, 75, 95)
+# [p]randstats rolls this many 4d6dl ability scores
+ABILITY_SCORES = 6
+
+
+class TooComplex(Exception):
+    """The exact distribution would be too big or too slow to work out."""
+
+
+@dataclass(frozen=True)
+class Distribution:
+    """Probability of each total from `offset` to `offset + len(probs) - 1`."""
+    offset: int
+    probs: np.ndarray
+
+    @property
+    def low(self) -> int:
+        return self.offset + int(np.flatnonzero(self.probs)[0])
+
+    @property
+    def high(self) -> int:
+        return self.offset + int(np.flatnonzero(self.probs)[-1])
+
+    @property
+    def values(self) -> np.ndarray:
+        return np.arange(self.offset, self.offset + len(self.probs))
+
+    def mean(self) -> float:
+        return float(np.dot(self.values, self.probs))
+
+    def stdev(self) -> float:
+        return math.sqrt(max(0.0, float(np.dot((self.values - self.mean()) ** 2, self.probs))))
+
+    def percentile(self, q: float) -> int:
+        """Smallest total rolled at least q percent of the time or less."""
+        index = int(np.searchsorted(np.cumsum(self.probs), q / 100 - 1e-12))
+        return self.offset + min(index, len(self.probs) - 1)
+
+    def at_least(self, target: int) -> float:
+        return float(self.probs[max(0, target - self.offset):].sum())
+
+
+def _dist(offset: int, probs: np.ndarray) -> Distribution:
+    """Trim zero tails and freeze the array - distributions are shared through the caches."""
+    nonzero = np.flatnonzero(probs > 0)
+    if not len(nonzero):
+        probs, nonzero = np.ones(1), np.zeros(1, dtype=int)
+    probs = np.array(probs[nonzero[0]:nonzero[-1] + 1], dtype=np.float64)
+    probs.flags.writeable = False
+    return Distribution(offset + int(nonzero[0]), probs)
+
+
+def _constant(value: int) -> Distribution:
+    return _dist(value, np.ones(1))
+
+
+def _check_width(width: int) -> None:
+    if width > MAX_SUPPORT:
+        raise TooComplex
+
+
+### COMBINING
+
+def _convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    _check_width(len(a) + len(b) - 1)
+    if len(a) * len(b) <= FFT_THRESHOLD:
+        return np.convolve(a, b)
+    size = len(a) + len(b) - 1
+    result = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)
+    # FFT rounding leaves tiny (even negative) probabilities where there should be none
+    result[result < 1e-16] = 0
+    return result
+
+
+def _add(a: Distribution, b: Distribution) -> Distribution:
+    return _dist(a.offset + b.offset, _convolve(a.probs, b.probs))
+
+
+def _negate(a: Distribution) -> Distribution:
+    return _dist(-(a.offset + len(a.probs) - 1), a.probs[::-1])
+
+
+def _power(a: Distribution, n: int) -> Distribution:
+    """Sum of n independent copies of a, by repeated squaring."""
+    _check_width((len(a.probs) - 1) * n + 1)
+    result = _constant(0)
+    while n:
+        if n & 1:
+            result = _add(result, a)
+        n >>= 1
+        if n:
+            a = _add(a, a)
+    return result
+
+
+def _mix(parts: list[Distribution]) -> Distribution:
+    """Add up partial (unnormalized) distributions over a common range."""
+    low = min(part.offset for part in parts)
+    high = max(part.offset + len(part.probs) for part in parts)
+    _check_width(high - low)
+    probs = np.zeros(high - low)
+    for part in parts:
+        probs[part.offset - low:part.offset - low + len(part.probs)] += part.probs
+    return _dist(low, probs)
+
+
+def _combine(op: str, func, a: Distribution, b: Distribution) -> Distribution:
+    """Any other operator: apply it to every pair of totals."""
+    if op == "*" and (max(abs(a.low), abs(a.high)) > MAX_MULT or max(abs(b.low), abs(b.high)) > MAX_MULT):
+        raise pyhedrals.InvalidOperandsException(f"multiplication operands are larger than the maximum {MAX_MULT}")
+    if op == "^":
+        if max(abs(a.low), abs(a.high)) > MAX_EXPONENT or max(abs(b.low), abs(b.high)) > MAX_EXPONENT:
+            raise pyhedrals.InvalidOperandsException(f"operand or exponent is larger than the maximum {MAX_EXPONENT}")
+        if b.low < 0:
+            raise TooComplex  # fractional totals
+        if max(abs(a.low), abs(a.high), 2) ** b.high > MAX_SUPPORT:
+            raise TooComplex
+    if op in ("/", "%") and b.low <= 0 <= b.high and b.probs[-b.offset] > 0:
+        raise ValueError("that formula can divide by zero")
+    if len(a.probs) * len(b.probs) > MAX_SUPPORT:
+        raise TooComplex
+    a_values, b_values = np.meshgrid(a.values, b.values, indexing="ij")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        totals = func(a_values, b_values).ravel()
+    weights = np.outer(a.probs, b.probs).ravel()
+    keep = weights > 0
+    totals, weights = totals[keep], weights[keep]
+    low = int(totals.min())
+    _check_width(int(totals.max()) - low + 1)
+    return _dist(low, np.bincount(totals - low, weights=weights))
+
+
+### DICE TERMS
+
+def _face_probs(sides: int, reroll: tuple[str, int | None] | None) -> np.ndarray:
+    """Chance of each face 1..sides for one die, after any reroll."""
+    probs = np.full(sides, 1 / sides)
+    if reroll is None:
+        return probs
+    op, arg = reroll
+    hits = _comparison("reroll", op, arg or 1, sides, arg is not None)(np.arange(1, sides + 1))
+    if hits.all():
+        raise Unsupported  # pyhedrals rerolls forever
+    if len(op) > 1 and op[1] == "o":
+        # One reroll: a hit becomes a fresh die, whatever it shows
+        return np.where(hits, 0, probs) + hits.mean() / sides
+    # Reroll until it misses: uniform over the misses
+    return np.where(hits, 0, 1 / np.count_nonzero(~hits))
+
+
+def _keep(num_dice: int, faces: np.ndarray, keep: int, highest: bool) -> Distribution:
+    """Sum of the `keep` highest (or lowest) of num_dice dice with face chances `faces`.
+
+    Walks the faces from the kept end, tracking how many dice have been placed
+    so far and the kept total; j dice landing on a face can be chosen
+    C(remaining, j) ways.
+    """
+    if keep <= 0:
+        return _constant(0)
+    keep = min(keep, num_dice)
+    order = [face for face in (range(len(faces), 0, -1) if highest else range(1, len(faces) + 1)) if faces[face - 1] > 0]
+    if len(order) * num_dice * (num_dice + 1) // 2 > MAX_KEEP_DROP_STEPS:
+        raise TooComplex
+    width = keep * len(faces) + 1
+    _check_width(width)
+    log_comb = [math.lgamma(n + 1) for n in range(num_dice + 1)]
+    state = np.zeros((num_dice + 1, width))
+    state[0, 0] = 1.0
+    for face in order:
+        log_p = math.log(faces[face - 1])
+        new = np.zeros_like(state)
+        for placed in range(num_dice + 1):
+            row = state[placed]
+            if not row.any():
+                continue
+            remaining = num_dice - placed
+            for j in range(remaining + 1):
+                weight = math.exp(log_comb[remaining] - log_comb[j] - log_comb[remaining - j] + j * log_p)
+                shift = min(j, max(keep - placed, 0)) * face
+                new[placed + j, shift:] += weight * row[:width - shift]
+        state = new
+    return _dist(0, state[num_dice])
+
+
+def _explode(faces: np.ndarray, hits: np.ndarray) -> Distribution:
+    """Total of one exploding die: it and every die it chains into."""
+    stop = _dist(1, np.where(hits, 0, faces))
+    chain = _dist(1, np.where(hits, faces, 0))
+    if not hits.any():
+        return stop
+    mass = float(faces[hits].sum())
+    links = math.ceil(math.log(EXPLODE_TAIL) / math.log(mass))
+    # Each link convolves a longer chain with the die
+    if links * links * len(faces) * len(faces) > MAX_SUPPORT * 100:
+        raise TooComplex
+    parts, link, left = [stop], chain, mass
+    while left > EXPLODE_TAIL:
+        parts.append(_add(link, stop))
+        link = _add(link, chain)
+        left *= mass
+    total = _mix(parts)
+    return _dist(total.offset, total.probs / total.probs.sum())
+
+
+@lru_cache(maxsize=1024)
+def dice_term(num_dice: int, sides: int, modifiers: tuple[tuple[str, str, int | None], ...] = ()) -> Distribution:
+    """Distribution of NdS with modifiers, as (kind, op, argument) tuples in formula order."""
+    reroll = None
+    rest = list(modifiers)
+    if rest and rest[0][0] == "reroll":
+        reroll = rest.pop(0)[1:]
+    if len(rest) > 1 or (rest and rest[0][0] == "reroll"):
+        raise Unsupported  # modifiers acting on each other's extra dice
+    faces = _face_probs(sides, reroll)
+    if not rest:
+        return _power(_dist(1, faces), num_dice)
+    kind, op, arg = rest[0]
+    if kind == "keepdrop":
+        n = arg or 1
+        keep = n if op.startswith("k") else num_dice - n
+        if op.startswith("k") and num_dice < keep:
+            raise pyhedrals.InvalidOperandsException(f"attempted to keep {keep} dice when only {num_dice} were rolled")
+        return _keep(num_dice, faces, keep, highest=op in ("kh", "dl"))
+    hits = _comparison(kind, op, arg or sides, sides, arg is not None)(np.arange(1, sides + 1))
+    if kind == "count":
+        chance = float(faces[hits].sum())
+        return _power(_dist(0, np.array([1 - chance, chance])), num_dice)
+    if reroll is not None:
+        raise Unsupported  # exploded dice aren't rerolled
+    if hits.all():
+        raise Unsupported  # pyhedrals explodes forever
+    return _power(_explode(faces, hits), num_dice)
+
+
+def _convolve_cost(a: int, b: int) -> int:
+    if a * b <= FFT_THRESHOLD:
+        return a * b
+    size = a + b
+    return size * size.bit_length()
+
+
+def _power_cost(width: int, n: int) -> int:
+    """Repeated squaring: about log2(n) convolutions at up to the final width."""
+    if n < 2:
+        return 0
+    return _convolve_cost((width - 1) * n + 1, 1) * n.bit_length()
+
+
+def _term_cost(num_dice: int, sides: int, modifiers: tuple[tuple[str, str, int | None], ...]) -> int:
+    """Rough element operations dice_term() needs, worked out before doing any of them.
+
+    Follows dice_term's cases; what it would reject anyway is costed loosely.
+    """
+    reroll = modifiers[0][1:] if modifiers and modifiers[0][0] == "reroll" else None
+    rest = modifiers[1:] if reroll else modifiers
+    if len(rest) != 1:
+        return _power_cost(sides, num_dice)
+    kind, op, arg = rest[0]
+    if kind == "keepdrop":
+        n = arg or 1
+        keep = min(n if op.startswith("k") else num_dice - n, num_dice)
+        if keep <= 0:
+            return 0
+        return sides * num_dice * (num_dice + 1) // 2 * (keep * sides + 1)
+    if kind == "count":
+        return _power_cost(2, num_dice)
+    faces = _face_probs(sides, reroll)
+    mass = float(faces[_comparison(kind, op, arg or sides, sides, arg is not None)(np.arange(1, sides + 1))].sum())
+    if not 0 < mass < 1:
+        return _power_cost(sides, num_dice)
+    # One exploding die, as _explode works it out, then the pool
+    links = math.ceil(math.log(EXPLODE_TAIL) / math.log(mass))
+    return links * links * sides * sides + _power_cost(links * sides, num_dice)
+
+
+### PARSING
+
+class _Parser:
+    """Mirrors engine.NumpyDiceRoller's grammar, building distributions instead of rolls."""
+
+    def __init__(self, formula: str, max_dice: int, max_sides: int, dry_run: bool = False):
+        self.tokens, _description = _tokenize(formula)
+        self.pos = 0
+        self.max_dice = max_dice
+        self.max_sides = max_sides
+        # A dry run only costs the dice terms, standing a 1 in for each and skipping the operators
+        self.dry_run = dry_run
+        self.cost = 0
+
+    def _charge(self, cost: int) -> None:
+        """Count work against the formula's budget before doing it."""
+        self.cost += cost
+        if self.cost > MAX_FORMULA_COST:
+            raise TooComplex
+
+    def parse(self) -> Distribution:
+        if not self.tokens:
+            raise Unsupported
+        value = self._expr(0)
+        if self.pos != len(self.tokens):
+            raise Unsupported
+        return value
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> tuple[str, str | int]:
+        if self.pos >= len(self.tokens):
+            raise Unsupported
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _expr(self, min_precedence: int) -> Distribution:
+        left = self._unary()
+        while (op := self._peek()) in BINARY_OPS and BINARY_OPS[op][0] > min_precedence:
+            self.pos += 1
+            precedence, func = BINARY_OPS[op]
+            right = self._expr(precedence)
+            if self.dry_run:
+                continue
+            if op in ("+", "-"):
+                self._charge(_convolve_cost(len(left.probs), len(right.probs)))
+            else:
+                self._charge(len(left.probs) * len(right.probs))
+            if op == "+":
+                left = _add(left, right)
+            elif op == "-":
+                left = _add(left, _negate(right))
+            else:
+                left = _combine(op, func, left, right)
+        return left
+
+    def _unary(self) -> Distribution:
+        if self._peek() == "-":
+            self.pos += 1
+            if self._peek() == "number" and self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1][0] == "dice":
+                raise Unsupported
+            return _negate(self._unary())
+        return self._dice()
+
+    def _dice(self) -> Distribution:
+        kind, value = self._next()
+        count = 1
+        if kind == "number":
+            if self._peek() != "dice":
+                return _constant(value)
+            count = value
+            kind, value = self._next()
+        if kind == "dice":
+            sides_kind, sides = self._next()
+            if sides_kind != "number":
+                raise Unsupported
+            return self._term(count, sides)
+        if kind == "(":
+            inner = self._expr(0)
+            if self._next()[0] != ")":
+                raise Unsupported
+            if self._peek() in MODIFIERS or self._peek() == "dice":
+                raise Unsupported
+            return inner
+        raise Unsupported
+
+    def _term(self, num_dice: int, sides: int) -> Distribution:
+        if num_dice > self.max_dice:
+            raise pyhedrals.InvalidOperandsException(f"attempted to roll more than {self.max_dice} dice in a single d expression")
+        if sides > self.max_sides:
+            raise pyhedrals.InvalidOperandsException(f"attempted to roll a die with more than {self.max_sides} sides")
+        if sides < 1:
+            raise pyhedrals.InvalidOperandsException("attempted to roll a die with zero sides")
+        modifiers = []
+        while (kind := self._peek()) in MODIFIERS:
+            op = self._next()[1]
+            arg = None
+            nxt = self._peek()
+            if nxt == "number":
+                arg = self._next()[1]
+                if self._peek() in ("dice", "("):
+                    raise Unsupported
+            elif nxt in ("-", "dice", "("):
+                raise Unsupported
+            modifiers.append((kind, op, arg))
+        if self._peek() == "dice":
+            raise Unsupported
+        modifiers = tuple(modifiers)
+        self._charge(_term_cost(num_dice, sides, modifiers))
+        if self.dry_run:
+            return _constant(1)
+        return dice_term(num_dice, sides, modifiers)
+
+
+@lru_cache(maxsize=256)
+def distribution(formula: str, max_dice: int, max_sides: int) -> Distribution:
+    """Exact distribution of a formula's total.
+
+    Raises Unsupported for notation it can't follow, TooComplex when the answer
+    is too big or too slow, and pyhedrals' own errors for invalid rolls.
+    """
+    # Cost every dice term first, so an expensive formula is turned down before any work
+    _Parser(formula, max_dice, max_sides, dry_run=True).parse()
+    result = _Parser(formula, max_dice, max_sides).parse()
+    # Cut-off explosion tails leave a little probability unaccounted for
+    return _dist(result.offset, result.probs / result.probs.sum())
+
+
+def histogram(dist: Distribution, rows: int = 20, width: int = 24) -> str:
+    """ASCII bar chart of a distribution, grouping totals when there are too many to list."""
+    cumulative = np.cumsum(dist.probs)
+    # Skip long, vanishingly unlikely tails (explosions, big pools)
+    start = int(np.searchsorted(cumulative, 0.0005))
+    stop = int(np.searchsorted(cumulative, 0.9995)) + 1
+    probs = dist.probs[start:stop]
+    step = max(1, math.ceil(len(probs) / rows))
+    groups = [probs[i:i + step].sum() for i in range(0, len(probs), step)]
+    peak = max(groups)
+    lines = []
+    for index, chance in enumerate(groups):
+        low = dist.offset + start + index * step
+        high = min(low + step, dist.offset + stop) - 1
+        label = str(low) if low == high else f"{low}-{high}"
+        bar = "█" * round(width * chance / peak) if peak else ""
+        lines.append(f"{label:>11} {chance * 100:6.2f}% {bar}")
+    return "\n".join(lines)
+
+
+### ABILITY SCORES
+
+@lru_cache(maxsize=1)
+def _ability_rolls() -> dict[int, list[tuple[tuple[int, ...], int]]]:
+    """Every 4d6 roll by its drop-lowest score, with the position of the dropped die.
+
+    Ties drop the last of the lowest dice, as the engine's `4d6dl` does (pyhedrals may
+    strike a different one of them).
+    """
+    rolls = {}
+    for dice in itertools.product(range(1, 7), repeat=4):
+        dropped = 3 - dice[::-1].index(min(dice))
+        rolls.setdefault(sum(dice) - min(dice), []).append((dice, dropped))
+    return rolls
+
+
+@lru_cache(maxsize=1)
+def _ability_sums() -> list[Distribution]:
+    """Distribution of the total of 0 to ABILITY_SCORES ability scores."""
+    score = dice_term(4, 6, (("keepdrop", "dl", None),))
+    return [_power(score, n) for n in range(ABILITY_SCORES + 1)]
+
+
+def randstats_chance(min_total: int, max_total: int) -> float:
+    """Chance that a set of ability scores totals strictly between min_total and max_total."""
+    total = _ability_sums()[ABILITY_SCORES]
+    return max(0.0, total.at_least(min_total + 1) - total.at_least(max_total))
+
+
+def roll_ability_scores(min_total: int, max_total: int, rng: np.random.Generator) -> list[tuple[tuple[int, ...], int]]:
+    """Roll ability scores totalling strictly between min_total and max_total, as (dice, dropped position) per score.
+
+    Samples straight from the exact distribution conditioned on the window:
+    first the total, then each score given what the rest have to add up to,
+    then one of the equally likely 4d6 rolls behind that score.
+    """
+    sums = _ability_sums()
+    totals = sums[ABILITY_SCORES]
+    weights = np.where((totals.values > min_total) & (totals.values < max_total), totals.probs, 0)
+    if not weights.any():
+        raise ValueError(f"no ability scores can total between {min_total} and {max_total}")
+    total = int(rng.choice(totals.values, p=weights / weights.sum()))
+    score = sums[1]
+    scores = []
+    for left in range(ABILITY_SCORES - 1, -1, -1):
+        rest = sums[left]
+        index = total - score.values - rest.offset
+        fits = (index >= 0) & (index < len(rest.probs))
+        weights = np.where(fits, score.probs * rest.probs[np.clip(index, 0, len(rest.probs) - 1)], 0)
+        value = int(rng.choice(score.values, p=weights / weights.sum()))
+        total -= value
+        rolls = _ability_rolls()[value]
+        scores.append(rolls[rng.integers(len(rolls))])
+    return scores
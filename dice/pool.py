@@ -0,0 +1,117 @@
+"""
+Worker processes for expensive dice rolls.
+
+Rolls that would hold the event loop for more than a few milliseconds run in a
+small process pool instead, with a hard deadline per roll and a cap on how
+many each user can have in flight.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import site
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from . import engine
+
+log = logging.getLogger("red.dice")
+
+# Red imports cogs from its cog folders without putting them on sys.path, and spawned
+# workers import the roll functions by module name - so they need the folder added
+COG_PATH = str(Path(__file__).resolve().parent.parent)
+
+
+class RollTimeout(Exception):
+    """A roll ran past its deadline and its worker was stopped."""
+
+
+class RollLimit(Exception):
+    """The user already has as many expensive rolls in flight as allowed."""
+
+
+class RollUnavailable(Exception):
+    """The workers died or couldn't start; they'll be started fresh for the next roll."""
+
+
+class RollPool:
+    """Bounded process pool that rolls formulas with a deadline."""
+
+    def __init__(self, workers: int = 2, deadline: float = 5.0, per_user: int = 1):
+        self.workers = workers
+        self.deadline = deadline
+        self.per_user = per_user
+        self._executor: ProcessPoolExecutor | None = None
+        self._semaphore = asyncio.Semaphore(workers)
+        self._in_flight: Counter[int] = Counter()
+
+    async def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned rather than forked - the bot process has threads running.
+            # site.addsitedir is stdlib, so the workers can unpickle it before the cog is importable
+            executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=site.addsitedir,
+                initargs=(COG_PATH,),
+            )
+            try:
+                # Start a worker outside any roll's deadline - spawning and importing takes a moment
+                await asyncio.get_running_loop().run_in_executor(executor, engine.estimate_cost, "")
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            self._executor = executor
+        return self._executor
+
+    async def roll(self, user_id: int, formula: str, max_dice: int, max_sides: int, log_budget: int, seed: int | None = None) -> engine.RollSummary:
+        """Roll a formula in a worker, seeded with an audit seed if given."""
+        return await self._run(user_id, formula, engine.roll_summary, formula, max_dice, max_sides, log_budget, seed)
+
+    async def roll_batch(self, user_id: int, formula: str, groups: list[tuple[str, int]], max_dice: int, max_sides: int, seed: int | None = None) -> list[tuple[str, list[engine.RollSummary]]]:
+        """Roll a batch of formulas in a worker, seeded with an audit seed if given."""
+        return await self._run(user_id, formula, engine.roll_batch_summary, groups, max_dice, max_sides, seed)
+
+    async def _run(self, user_id: int, formula: str, func, *args):
+        """Run a roll function in a worker.
+
+        Raises RollLimit, RollTimeout, RollUnavailable, or whatever the roll raised.
+        """
+        if self._in_flight[user_id] >= self.per_user:
+            raise RollLimit
+        self._in_flight[user_id] += 1
+        try:
+            # Wait for a free worker before the deadline starts, so queueing isn't counted
+            async with self._semaphore:
+                try:
+                    executor = await self._get_executor()
+                    future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+                    return await asyncio.wait_for(future, self.deadline)
+                except asyncio.TimeoutError:
+                    log.warning(f"Roll '{formula[:100]}' ran past {self.deadline}s, restarting dice workers.")
+                    self._restart()
+                    raise RollTimeout
+                except BrokenProcessPool:
+                    # Another roll's timeout took this worker down with it, or the workers couldn't start
+                    log.warning(f"Dice workers stopped during roll '{formula[:100]}', restarting them.")
+                    self._restart()
+                    raise RollUnavailable
+        finally:
+            self._in_flight[user_id] -= 1
+            if not self._in_flight[user_id]:
+                del self._in_flight[user_id]
+
+    def _restart(self) -> None:
+        """Kill the workers (a running job can't be cancelled any other way); the next roll starts fresh ones."""
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # ProcessPoolExecutor has no public way to stop a busy worker before 3.14
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        self._restart()
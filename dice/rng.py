@@ -0,0 +1,104 @@
+"""
+Dice - Random Number Backend
+
+One random stream for the rolls the Dungeon Church cogs make. It's NumPy's
+PCG64, seeded from the OS's cryptographic entropy: dice pools draw whole
+arrays from it, and single draws (pyhedrals dice, Dragonchess, Augury,
+RollFood) come out of a pre-generated block instead of one call each.
+
+In audit mode every roll reseeds the stream with a fresh logged seed, so a
+disputed roll can be replayed exactly by rolling the same thing on
+`RollRNG(seed)`. Single draws from the block line up with the engine's small
+pools, so other cogs' draws replay as dice formulas too - five randint(1, 6)
+are `5d6`, a choice from twelve is `1d12`.
+"""
+import importlib
+import logging
+import secrets
+from contextlib import contextmanager
+
+import numpy as np
+
+log = logging.getLogger("red.dice")
+
+# Single draws generated at a time
+BLOCK_SIZE = 4096
+# Ranges up to this size are drawn from the block's 53-bit floats; bigger ones ask the generator
+MAX_BLOCK_RANGE = 2**32
+# Arrays of up to this many dice come from the block too, so a 1d20 rolls the same through pyhedrals or NumPy
+MAX_BLOCK_DRAW = 64
+
+# pyhedrals draws every die from its module's `random`
+_pyhedrals = importlib.import_module("pyhedrals.pyhedrals")
+
+
+class RollRNG:
+    """Block-generated PCG64 stream with an optional per-roll audit seed.
+
+    Has the `randint`/`choice`/`random` methods of Python's random module, so
+    it can stand in for it.
+    """
+
+    def __init__(self, seed: int | None = None, audit: bool = False):
+        self.audit = audit
+        self.seed = seed                # seed of the current audited roll, None otherwise
+        self._reseed(seed if seed is not None else secrets.randbits(128))
+
+    def _reseed(self, seed: int) -> None:
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self._block: list[float] = []
+        self._pos = 0
+
+    @property
+    def drawn(self) -> bool:
+        """Whether any single draws came out of the block since it was last reseeded."""
+        return bool(self._block)
+
+    def integers(self, low: int, high: int, size) -> np.ndarray:
+        """Array of ints from low to high - 1."""
+        if isinstance(size, (int, np.integer)) and size <= MAX_BLOCK_DRAW and high - low <= MAX_BLOCK_RANGE:
+            return np.array([self.randint(low, high - 1) for _ in range(size)], dtype=np.int64)
+        return self.generator.integers(low, high, size=size, dtype=np.int64)
+
+    def random(self) -> float:
+        if self._pos >= len(self._block):
+            self._block = self.generator.random(BLOCK_SIZE).tolist()
+            self._pos = 0
+        value = self._block[self._pos]
+        self._pos += 1
+        return value
+
+    def randint(self, a: int, b: int) -> int:
+        """Int from a to b inclusive."""
+        if b - a >= MAX_BLOCK_RANGE:
+            return int(self.generator.integers(a, b, endpoint=True))
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[self.randint(0, len(seq) - 1)]
+
+    def start_roll(self, label: str | None) -> int | None:
+        """Begin a roll: in audit mode, reseed with a new logged seed and return it."""
+        if not self.audit:
+            self.seed = None
+            return None
+        self.seed = secrets.randbits(64)
+        self._reseed(self.seed)
+        log.info(f"Roll audit: {label} seed={self.seed}")
+        return self.seed
+
+    @contextmanager
+    def roll(self, label: str | None = None):
+        """Draw one roll's numbers - pyhedrals' dice included - from this stream.
+
+        Don't await inside: pyhedrals is pointed at this stream until the block exits.
+        """
+        self.start_roll(label)
+        previous = _pyhedrals.random
+        _pyhedrals.random = self
+        try:
+            yield self
+        finally:
+            _pyhedrals.random = previous
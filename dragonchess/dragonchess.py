@@ -3,6 +3,9 @@ Dragonchess (Threes) - A dice game cog for Red-DiscordBot
 
 Play the dice game Threes against other players.
 """
+import random
+from contextlib import nullcontext
+
 import discord
 from discord import app_commands
 from redbot.core import commands, Config, checks
@@ -40,6 +43,18 @@ class Dragonchess(commands.Cog):
         pre_processed = super().format_help_for_context(ctx)
         return f"{pre_processed}\n\nCog Version: {self.__version__}"
 
+    def _dice_rng(self, user_id: int, channel_id: int, formula: str):
+        """Draw from the Dice cog's random stream, if it's loaded - audited rolls land in its history.
+
+        `formula` is the dice notation that replays the draws.
+        """
+        dice = self.bot.get_cog("Dice")
+        return dice.shared_roll(self.qualified_name.lower(), user_id, channel_id, formula) if dice else nullcontext(random)
+
+    def perf_gauges(self) -> dict[str, int]:
+        """Point-in-time values for the Perf cog."""
+        return {"dragonchess_active_games": len(self.active_games)}
+
     async def red_delete_data_for_user(self, *, requester: str, user_id: int) -> None:
         """Delete user data on request."""
         all_guilds = await self.config.all_guilds()
@@ -55,8 +55,8 @@ class DragonchessGame:
         """Get the current player's state."""
         return self.player_states[self.current_player]
 
-    def roll_dice(self) -> list[int]:
-        """Roll dice for the current player. Returns the rolled values."""
+    def roll_dice(self, rng=random) -> list[int]:
+        """Roll dice for the current player with `rng` (anything with a randint). Returns the rolled values."""
         state = self.current_state
         if state.finished or state.rolls_remaining() <= 0:
             return []
@@ -65,7 +65,7 @@ class DragonchessGame:
         if num_dice <= 0:
             return []
 
-        state.current_roll = [random.randint(1, 6) for _ in range(num_dice)]
+        state.current_roll = [rng.randint(1, 6) for _ in range(num_dice)]
         state.rolls_used += 1
 
         # Check for moon shot (6-6-6-6-6 on first roll with all 5 dice)
@@ -143,7 +143,9 @@ class GameView(ui.View):
             self.turn_notification = None
 
         # Roll the dice
-        dice = self.game.roll_dice()
+        formula = f"{self.game.current_state.dice_remaining()}d6"
+        with self.cog._dice_rng(interaction.user.id, interaction.channel_id, formula) as rng:
+            dice = self.game.roll_dice(rng)
 
         if not dice:
             await interaction.response.send_message(
@@ -555,7 +557,9 @@ class BotGameView(ui.View):
             await asyncio.sleep(random.uniform(self.BOT_DELAY_MIN, self.BOT_DELAY_MAX))
 
             # Roll the dice
-            dice = self.game.roll_dice()
+            formula = f"{self.game.current_state.dice_remaining()}d6"
+            with self.cog._dice_rng(self.bot_id, self.message.channel.id, formula) as rng:
+                dice = self.game.roll_dice(rng)
             if not dice:
                 break
 
@@ -668,7 +672,9 @@ class BotGameView(ui.View):
             self.turn_notification = None
 
         # Roll the dice
-        dice = self.game.roll_dice()
+        formula = f"{self.game.current_state.dice_remaining()}d6"
+        with self.cog._dice_rng(interaction.user.id, interaction.channel_id, formula) as rng:
+            dice = self.game.roll_dice(rng)
         if not dice:
             await interaction.response.send_message(
                 "You can't roll right now.",
@@ -0,0 +1,94 @@
+"""
+GhostSync - Circuit Breaker
+
+Stops calling a Ghost instance once it has used up its failure budget, then
+lets a single probe request through after an exponentially growing cooldown.
+"""
+import logging
+import time
+
+log = logging.getLogger("red.ghostsync")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Failure budget + circuit breaker for one Ghost instance.
+
+    `budget` failed attempts in a row (retries included) open the circuit for
+    `cooldown` seconds, doubling on each consecutive trip up to `max_cooldown`.
+    They count however far apart they are, so an outage trips it even when
+    syncs run half an hour apart. Once the cooldown passes, one probe request is allowed: success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, budget: int = 5, cooldown: float = 60, max_cooldown: float = 3600):
+        self.name = name
+        self.budget = budget
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = CLOSED
+        self.opened_at: float | None = None   # time.time() the current outage began
+        self._failures = 0                     # failed requests since the last success
+        self._trips = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    @property
+    def available(self) -> bool:
+        """Whether a request could go out now (without claiming the half-open probe)."""
+        if self.state == OPEN:
+            return time.monotonic() >= self._open_until
+        return not (self.state == HALF_OPEN and self._probing)
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        """Claim permission for a request."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() < self._open_until:
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            log.info(f"Ghost API circuit for {self.name} closed - requests resumed.")
+        self.state = CLOSED
+        self.opened_at = None
+        self._failures = 0
+        self._trips = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._open(now)
+            return
+        self._failures += 1
+        if self._failures >= self.budget:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        cooldown = min(self.cooldown * 2 ** self._trips, self.max_cooldown)
+        self._trips += 1
+        if self.state == CLOSED:
+            self.opened_at = time.time()
+        self.state = OPEN
+        self._open_until = now + cooldown
+        self._failures = 0
+        self._probing = False
+        log.warning(f"Ghost API circuit for {self.name} opened - pausing requests for {cooldown:.0f}s.")
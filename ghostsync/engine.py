@@ -0,0 +1,360 @@
+"""
+GhostSync - Sync Engine
+
+Single fetch -> plan -> apply pipeline shared by the background loop and the
+manual sync commands, serialized per guild.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import discord
+
+from .index import MemberIndex
+from .member import GhostMember
+from .plan import GHOST_BULK_CHUNK, LabelChange, SyncPlan, build_plan
+
+log = logging.getLogger("red.ghostsync")
+
+# Max concurrent member writes to the Ghost Admin API
+GHOST_WRITE_CONCURRENCY = 5
+
+# API calls made by the sync run in the current task (None outside a run)
+_api_calls: ContextVar[Counter | None] = ContextVar("ghostsync_api_calls", default=None)
+
+
+def count_api_call(api: str, n: int = 1) -> None:
+    """Record an API request against the sync run in progress, if any."""
+    calls = _api_calls.get()
+    if calls is not None:
+        calls[api] += n
+
+
+@dataclass
+class SyncResult:
+    """Outcome of one sync run for a guild."""
+    guild_id: int
+    trigger: str
+    ok: bool = True
+    skipped: bool = False
+    error: str | None = None
+    roles_added: int = 0
+    roles_removed: int = 0
+    labels_added: int = 0
+    labels_removed: int = 0
+    fetch_seconds: float = 0.0
+    plan_seconds: float = 0.0
+    apply_seconds: float = 0.0
+    total_seconds: float = 0.0
+    api_calls: dict[str, int] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def changes(self) -> int:
+        return self.roles_added + self.roles_removed + self.labels_added + self.labels_removed
+
+    def summary(self) -> str:
+        """One-line summary of what the run did."""
+        if self.skipped:
+            return "Skipped - not configured."
+        if not self.ok:
+            return f"Failed - {self.error}"
+        calls = ", ".join(f"{api} {n}" for api, n in sorted(self.api_calls.items())) or "none"
+        return (
+            f"+{self.roles_added} -{self.roles_removed} roles, "
+            f"+{self.labels_added} -{self.labels_removed} labels in {self.total_seconds:.1f}s "
+            f"(fetch {self.fetch_seconds:.1f}s, plan {self.plan_seconds:.2f}s, apply {self.apply_seconds:.1f}s; "
+            f"API calls: {calls})"
+        )
+
+
+def _resolve(future: asyncio.Future, task: asyncio.Task) -> None:
+    """Copy a finished run's outcome onto a trigger() future."""
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+class SyncEngine:
+    """Runs GhostSync's role + label sync for a guild, one run at a time.
+
+    A run requested while another is in flight for the same guild joins that
+    run instead of starting a second one, so manual syncs coalesce with the
+    background loop.
+    """
+
+    def __init__(self, cog):
+        self.cog = cog
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._running: dict[int, asyncio.Task] = {}
+        # Resolved with the result of the next run that starts after a trigger()
+        self._pending: dict[int, asyncio.Future] = {}
+        self.last_results: dict[int, SyncResult] = {}
+
+    def _lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        return lock
+
+    def is_running(self, guild_id: int) -> bool:
+        """Whether a sync run is in flight for a guild."""
+        task = self._running.get(guild_id)
+        return task is not None and not task.done()
+
+    def cancel_all(self) -> None:
+        """Cancel in-flight runs and pending triggers (on cog unload)."""
+        for task in self._running.values():
+            task.cancel()
+        for future in self._pending.values():
+            future.cancel()
+        self._running.clear()
+        self._pending.clear()
+
+    async def run(self, guild: discord.Guild, trigger: str = "scheduled") -> SyncResult:
+        """Sync a guild now, or wait for the run already in flight and return its result."""
+        task = self._running.get(guild.id)
+        if task is None or task.done():
+            # This run covers any trigger made before it started
+            pending = self._pending.pop(guild.id, None)
+            if pending is not None:
+                trigger = "manual"
+            task = asyncio.create_task(self._run(guild, trigger))
+            self._running[guild.id] = task
+            if pending is not None:
+                task.add_done_callback(lambda t: _resolve(pending, t))
+        # Shield so a cancelled caller doesn't abort a run others are waiting on
+        return await asyncio.shield(task)
+
+    async def trigger(self, guild: discord.Guild) -> SyncResult:
+        """Manual sync: join the run in flight, or pull the scheduled next run forward.
+
+        Guilds without a scheduled job are synced directly.
+        """
+        if self.is_running(guild.id) or guild.id not in self.cog.scheduler:
+            return await self.run(guild, "manual")
+        pending = self._pending.get(guild.id)
+        if pending is None or pending.done():
+            pending = self._pending[guild.id] = asyncio.get_running_loop().create_future()
+        self.cog.scheduler.trigger(guild.id)
+        return await asyncio.shield(pending)
+
+    async def _run(self, guild: discord.Guild, trigger: str) -> SyncResult:
+        result = SyncResult(guild.id, trigger)
+        calls = Counter()
+        token = _api_calls.set(calls)
+        start = time.perf_counter()
+        try:
+            async with self._lock(guild.id):
+                guild_config = await self.cog.config.guild(guild).all()
+                ghost_url = guild_config["ghost_url"]
+
+                # Skip if not configured (need ghost_url and at least one sync target)
+                if not ghost_url or (not guild_config["subscriber_role"] and not guild_config["label_mappings"]):
+                    result.skipped = True
+                    return result
+
+                # Fetch Ghost members and rebuild the index
+                index = await self.cog._refresh_index(guild, ghost_url)
+                result.fetch_seconds = time.perf_counter() - start
+                if index is None:
+                    # API error - keep existing roles
+                    result.ok = False
+                    if not self.cog._breaker(ghost_url).available:
+                        result.error = "Ghost API unavailable, requests paused."
+                    else:
+                        result.error = "Failed to fetch Ghost members."
+                    return result
+
+                plan_start = time.perf_counter()
+                plan = self.build_plan(guild, index, guild_config)
+                result.plan_seconds = time.perf_counter() - plan_start
+
+                apply_start = time.perf_counter()
+                await self._apply(guild, plan, index, result)
+                result.apply_seconds = time.perf_counter() - apply_start
+        finally:
+            _api_calls.reset(token)
+            result.total_seconds = time.perf_counter() - start
+            result.api_calls = dict(calls)
+            self.last_results[guild.id] = result
+            self._report(result)
+        return result
+
+    async def apply(self, guild: discord.Guild, plan: SyncPlan) -> SyncResult:
+        """Apply a previously built plan under the guild's sync lock."""
+        result = SyncResult(guild.id, "plan")
+        calls = Counter()
+        token = _api_calls.set(calls)
+        start = time.perf_counter()
+        try:
+            async with self._lock(guild.id):
+                await self._apply(guild, plan, self.cog._get_index(guild), result)
+        finally:
+            _api_calls.reset(token)
+            result.apply_seconds = result.total_seconds = time.perf_counter() - start
+            result.api_calls = dict(calls)
+            self._report(result)
+        return result
+
+    def _report(self, result: SyncResult) -> None:
+        """Send a finished run's duration and changes to the Perf cog, if loaded."""
+        perf = self.cog.bot.get_cog("Perf")
+        if perf is None or result.skipped:
+            return
+        perf.observe("ghostsync_sync_seconds", result.total_seconds, trigger=result.trigger)
+        perf.inc("ghostsync_role_changes_total", result.roles_added, action="add")
+        perf.inc("ghostsync_role_changes_total", result.roles_removed, action="remove")
+        perf.inc("ghostsync_label_changes_total", result.labels_added, action="add")
+        perf.inc("ghostsync_label_changes_total", result.labels_removed, action="remove")
+
+    async def _apply(self, guild: discord.Guild, plan: SyncPlan, index: MemberIndex, result: SyncResult) -> None:
+        result.roles_added, result.roles_removed = await self._apply_role_changes(guild, plan)
+        if plan.subscriber_role_id:
+            log.info(f"Role sync complete for '{guild.name}': +{result.roles_added} -{result.roles_removed} roles")
+        result.labels_added, result.labels_removed = await self._apply_label_changes(plan.ghost_url, index, plan.label_changes)
+        if plan.label_changes:
+            log.info(f"Label sync complete for '{guild.name}': +{result.labels_added} -{result.labels_removed} labels")
+        if result.labels_added or result.labels_removed:
+            # Keep the snapshot in line with the labels just written
+            await self.cog._save_snapshot(guild)
+
+    ### PLAN
+
+    def build_plan(self, guild: discord.Guild, index: MemberIndex, guild_config: dict) -> SyncPlan:
+        """Build a sync plan for a guild from its member index and config."""
+        subscriber_role_id = guild_config["subscriber_role"]
+        sync_role_id = guild_config["sync_role"]
+        ghost_url = guild_config["ghost_url"]
+        return build_plan(
+            guild,
+            ghost_url,
+            index,
+            guild.get_role(subscriber_role_id) if subscriber_role_id else None,
+            guild.get_role(sync_role_id) if sync_role_id else None,
+            guild_config["label_mappings"],
+            bulk_labels=ghost_url not in self.cog._bulk_unsupported,
+        )
+
+    ### APPLY
+
+    async def _apply_role_changes(self, guild: discord.Guild, plan: SyncPlan) -> tuple[int, int]:
+        """Apply a plan's subscriber role changes. Returns (roles_added, roles_removed)."""
+        subscriber_role = guild.get_role(plan.subscriber_role_id) if plan.subscriber_role_id else None
+        if not subscriber_role:
+            return 0, 0
+
+        roles_added = 0
+        roles_removed = 0
+        for change in plan.role_changes:
+            discord_member = guild.get_member(change.member_id)
+            # Skip members who left or already match since the plan was built
+            if not discord_member or (subscriber_role in discord_member.roles) == change.add:
+                continue
+            count_api_call("discord")
+            if change.add:
+                try:
+                    await discord_member.add_roles(subscriber_role, reason=change.reason)
+                    roles_added += 1
+                    log.debug(f"Added subscriber role to {discord_member} in {guild.name}")
+                except discord.Forbidden:
+                    log.error(f"Missing permissions to add role to {discord_member}")
+            else:
+                try:
+                    await discord_member.remove_roles(subscriber_role, reason=change.reason)
+                    roles_removed += 1
+                    log.debug(f"Removed subscriber role from {discord_member} in {guild.name}")
+                except discord.Forbidden:
+                    log.error(f"Missing permissions to remove role from {discord_member}")
+        return roles_added, roles_removed
+
+    def _apply_labels_to_index(self, ghost_member: GhostMember, adds: set, removes: set, ghost_labels: dict) -> None:
+        """Mirror a successful label write onto the cached member."""
+        labels = tuple(l for l in ghost_member.labels if l.get("slug") not in removes)
+        ghost_member.labels = labels + tuple(ghost_labels.get(slug, {"name": slug, "slug": slug}) for slug in adds)
+
+    async def _apply_label_changes(self, ghost_url: str, index: MemberIndex, label_changes: dict[str, LabelChange]) -> tuple[int, int]:
+        """Apply a plan's label changes, writing each changed member at most once.
+
+        Uses Ghost's bulk label edit (one request per label per chunk of members) when available,
+        and falls back to one merged label update per member with bounded concurrency.
+        Returns (labels_added, labels_removed).
+        """
+        cog = self.cog
+        # Work on copies so the plan itself stays intact for display
+        changes = {
+            ghost_id: (set(change.adds), set(change.removes))
+            for ghost_id, change in label_changes.items()
+            if index.get(ghost_id) is not None
+        }
+        if not changes:
+            return 0, 0
+
+        labels_added = 0
+        labels_removed = 0
+
+        # Full Ghost label objects by slug, so writes reference existing labels instead of creating by name
+        ghost_labels = {}
+        labels = await cog._get_ghost_labels(ghost_url)
+        if labels:
+            ghost_labels = {l["slug"]: l for l in labels if l.get("slug")}
+
+        # Bulk path: group members by (action, label) and edit each group in chunks
+        if ghost_labels and ghost_url not in cog._bulk_unsupported:
+            groups = defaultdict(list)
+            for ghost_id, (adds, removes) in changes.items():
+                for slug in adds:
+                    if slug in ghost_labels:
+                        groups[("addLabel", slug)].append(ghost_id)
+                for slug in removes:
+                    if slug in ghost_labels:
+                        groups[("removeLabel", slug)].append(ghost_id)
+
+            for (action, slug), ghost_ids in groups.items():
+                for i in range(0, len(ghost_ids), GHOST_BULK_CHUNK):
+                    if ghost_url in cog._bulk_unsupported:
+                        break
+                    chunk = ghost_ids[i:i + GHOST_BULK_CHUNK]
+                    if not await cog._bulk_update_member_labels(ghost_url, action, ghost_labels[slug]["id"], chunk):
+                        continue
+                    for ghost_id in chunk:
+                        adds, removes = changes[ghost_id]
+                        if action == "addLabel":
+                            adds.discard(slug)
+                            self._apply_labels_to_index(index.get(ghost_id), {slug}, set(), ghost_labels)
+                            labels_added += 1
+                        else:
+                            removes.discard(slug)
+                            self._apply_labels_to_index(index.get(ghost_id), set(), {slug}, ghost_labels)
+                            labels_removed += 1
+
+        # Per-member path: one merged label write for each member with changes left over
+        remaining = {ghost_id: change for ghost_id, change in changes.items() if change[0] or change[1]}
+        semaphore = asyncio.Semaphore(GHOST_WRITE_CONCURRENCY)
+
+        async def update_member(ghost_id: str, adds: set, removes: set) -> tuple[int, int]:
+            ghost_member = index.get(ghost_id)
+            new_labels = [l for l in ghost_member.labels if l.get("slug") not in removes]
+            # Ghost API expects label objects with at least 'name' or 'slug'
+            new_labels += [ghost_labels.get(slug, {"name": slug}) for slug in adds]
+            async with semaphore:
+                if not await cog._update_ghost_member_labels(ghost_url, ghost_id, new_labels):
+                    return 0, 0
+            self._apply_labels_to_index(ghost_member, adds, removes, ghost_labels)
+            log.debug(f"Updated labels for Ghost member {ghost_member.email}: +{sorted(adds)} -{sorted(removes)}")
+            return len(adds), len(removes)
+
+        results = await asyncio.gather(*(update_member(gid, adds, removes) for gid, (adds, removes) in remaining.items()))
+        for added, removed in results:
+            labels_added += added
+            labels_removed += removed
+
+        return labels_added, labels_removed
@@ -1,5 +1,6 @@
 from redbot.core import commands, Config, checks
 from redbot.core.utils.chat_formatting import error, question, success
+from redbot.core.data_manager import cog_data_path
 import discord
 import aiohttp
 import asyncio
@@ -7,18 +8,48 @@ import logging
 import jwt as pyjwt
 import time
 import re
+import random
+import csv
+import io
+from contextlib import nullcontext
+from functools import partial
+from typing import Literal
 from binascii import unhexlify
 from discord.ui import Button, View
+from .index import MemberIndex
+from .member import GHOST_MEMBER_FIELDS, GhostMember, LabelCache, extract_discord_id
+from .plan import SyncPlan
+from .engine import SyncEngine, SyncResult, count_api_call
+from .snapshot import SnapshotStore
+from .scheduler import GuildScheduler
+from .breaker import CircuitBreaker
 
 # Set up logging
 log = logging.getLogger("red.ghostsync")
 log.setLevel(logging.DEBUG)
 
+# Bulk endpoint status codes meaning "not supported by this Ghost instance"
+GHOST_BULK_UNSUPPORTED = (404, 405, 501)
+# Transient Ghost API statuses worth retrying
+GHOST_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Retries per Ghost API request, and the base/max backoff between them in seconds
+GHOST_RETRIES = 3
+GHOST_RETRY_BASE = 0.5
+GHOST_RETRY_MAX_WAIT = 30
+# Seconds a previewed sync plan stays valid for [p]ghostsync apply
+PLAN_TTL = 600
+# Max guilds syncing at the same time
+SYNC_CONCURRENCY = 2
+# Adaptive interval multiplier after a sync that changed nothing
+ADAPTIVE_BACKOFF = 2
+# Min seconds between message edits while a list is still loading
+STREAM_EDIT_INTERVAL = 1.0
+
 
 class ConfirmLinkView(View):
     """Confirmation view for overwriting an existing link."""
 
-    def __init__(self, cog, ctx, ghost_url: str, ghost_member: dict, new_member: discord.Member, existing_member: discord.Member):
+    def __init__(self, cog, ctx, ghost_url: str, ghost_member: GhostMember, new_member: discord.Member, existing_member: discord.Member):
         super().__init__(timeout=60)
         self.cog = cog
         self.ctx = ctx
@@ -35,14 +66,16 @@ class ConfirmLinkView(View):
             return
 
         # Perform the link update
-        current_note = self.ghost_member.get("note") or ""
+        current_note = self.ghost_member.note or ""
         current_note = re.sub(r"\b\d{17,20}\b", "", current_note).strip()
         new_note = f"{self.new_member.id} {current_note}".strip() if current_note else str(self.new_member.id)
 
-        if await self.cog._update_ghost_member_note(self.ghost_url, self.ghost_member["id"], new_note):
-            link_view = GhostMemberLinkView(self.ghost_url, self.ghost_member["id"])
+        if await self.cog._update_ghost_member_note(self.ghost_url, self.ghost_member.id, new_note):
+            self.ghost_member.set_note(new_note)
+            await self.cog._index_upsert(self.ctx.guild, self.ghost_member)
+            link_view = GhostMemberLinkView(self.ghost_url, self.ghost_member.id)
             await interaction.response.edit_message(
-                content=success(f"`Linked {self.ghost_member.get('email')} to {self.new_member.display_name} (ID: {self.new_member.id})`"),
+                content=success(f"`Linked {self.ghost_member.email} to {self.new_member.display_name} (ID: {self.new_member.id})`"),
                 view=link_view
             )
         else:
@@ -79,24 +112,33 @@ class GhostMemberLinkView(View):
 
 
 class PaginatedListView(View):
-    """Paginated view for displaying lists of items."""
+    """Paginated view for displaying lists of items.
+
+    With `loading=True` the list can keep growing through `extend()` while the
+    first pages are already on screen; call `finish()` once every item is in.
+    """
 
-    def __init__(self, ctx, items: list, title: str, per_page: int = 15):
+    def __init__(self, ctx, items: list, title: str, per_page: int = 15, loading: bool = False):
         super().__init__(timeout=120)
         self.ctx = ctx
         self.items = items
         self.title = title
         self.per_page = per_page
         self.page = 0
-        self.max_page = (len(items) - 1) // per_page
+        self.loading = loading
         self.message = None
+        self._last_edit = 0.0
 
         # Remove buttons if only one page
-        if self.max_page == 0:
+        if self.max_page == 0 and not loading:
             self.clear_items()
         else:
             self._update_buttons()
 
+    @property
+    def max_page(self) -> int:
+        return max(0, (len(self.items) - 1) // self.per_page)
+
     def _update_buttons(self):
         self.prev_button.disabled = self.page == 0
         self.next_button.disabled = self.page >= self.max_page
@@ -111,9 +153,36 @@ class PaginatedListView(View):
             description="\n".join(page_items),
             color=0xff2600
         )
-        embed.set_footer(text=f"Page {self.page + 1}/{self.max_page + 1} • {len(self.items)} total")
+        if self.loading:
+            embed.set_footer(text=f"Page {self.page + 1}/{self.max_page + 1} • {len(self.items)} so far, loading more...")
+        else:
+            embed.set_footer(text=f"Page {self.page + 1}/{self.max_page + 1} • {len(self.items)} total")
         return embed
 
+    async def extend(self, items: list):
+        """Add items to a loading list, editing the message at most once per STREAM_EDIT_INTERVAL."""
+        self.items.extend(items)
+        self._update_buttons()
+        if self.message and time.monotonic() - self._last_edit >= STREAM_EDIT_INTERVAL:
+            await self._edit()
+
+    async def finish(self):
+        """Mark a loading list complete and show the final page count."""
+        self.loading = False
+        if self.max_page == 0:
+            self.clear_items()
+        else:
+            self._update_buttons()
+        if self.message:
+            await self._edit()
+
+    async def _edit(self):
+        self._last_edit = time.monotonic()
+        try:
+            await self.message.edit(embed=self.get_embed(), view=self)
+        except discord.HTTPException:
+            pass
+
     @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
     async def prev_button(self, interaction: discord.Interaction, button: Button):
         if interaction.user.id != self.ctx.author.id:
@@ -154,6 +223,8 @@ class GhostSync(commands.Cog):
         default_guild = {
             "ghost_url": None,           # Base URL of Ghost instance
             "sync_interval": 1800,       # Seconds between sync polls (30 minutes)
+            "interval_min": None,        # Adaptive interval floor in seconds (None = fixed interval)
+            "interval_max": None,        # Adaptive interval ceiling in seconds
             "subscriber_role": None,     # Discord Role ID for subscribers
             "log_channel": None,         # Optional channel for notifications
             "sync_role": None,           # Secondary role to sync to subscriber role
@@ -161,16 +232,51 @@ class GhostSync(commands.Cog):
         }
         self.config.register_guild(**default_guild)
 
-        # Dict of tasks for each guild the bot is in
-        self.guild_tasks = {}
+        # Background sync job for each guild the bot is in, staggered across the interval
+        self.scheduler = GuildScheduler("ghostsync", max_concurrent=SYNC_CONCURRENCY)
+        # Dict of Discord ID <-> Ghost member indexes for each guild
+        self.member_indexes: dict[int, MemberIndex] = {}
+        # Last member fetch per guild, persisted to warm the indexes after a restart
+        self.snapshots = SnapshotStore(cog_data_path(self) / "members.sqlite3")
+        # Background index refreshes started by commands reading a stale index
+        self._refresh_tasks: dict[int, asyncio.Task] = {}
+        # Circuit breaker per Ghost URL, so outages stop costing requests
+        self.breakers: dict[str, CircuitBreaker] = {}
+        # Guilds whose log channel was told about a Ghost outage that hasn't recovered yet
+        self._outage_notified: set[int] = set()
+        # Ghost URLs whose Admin API rejected bulk member edits
+        self._bulk_unsupported: set[str] = set()
+        # Last previewed sync plan for each guild, waiting for [p]ghostsync apply
+        self.pending_plans: dict[int, SyncPlan] = {}
+        # Shared sync pipeline for the background loop and manual syncs
+        self.engine = SyncEngine(self)
         # Start tasks for existing guilds
         self.bot.loop.create_task(self.initialize_tasks())
 
+    async def cog_load(self):
+        """Warm member indexes from the last saved snapshots."""
+        try:
+            guild_ids = await asyncio.to_thread(self.snapshots.guild_ids)
+            for guild_id in guild_ids:
+                snapshot = await asyncio.to_thread(self.snapshots.load, guild_id)
+                ghost_url = await self.config.guild_from_id(guild_id).ghost_url()
+                if snapshot is None or snapshot[0] != ghost_url:
+                    # Ghost URL changed (or was cleared) since the snapshot was taken
+                    await asyncio.to_thread(self.snapshots.delete, guild_id)
+                    continue
+                index = self.member_indexes.setdefault(guild_id, MemberIndex())
+                index.rebuild(snapshot[2], ghost_url=snapshot[0], updated_at=snapshot[1])
+                log.info(f"Warmed GhostSync index for guild {guild_id} with {len(index)} members from snapshot.")
+        except Exception as e:
+            log.error(f"Failed to load GhostSync member snapshots: {e}")
+
     def cog_unload(self):
         """Cancel all background tasks when the cog is unloaded."""
-        for task in self.guild_tasks.values():
+        self.scheduler.stop()
+        for task in self._refresh_tasks.values():
             task.cancel()
-        self.guild_tasks.clear()
+        self._refresh_tasks.clear()
+        self.engine.cancel_all()
 
     async def initialize_tasks(self):
         """Initialize background tasks for all guilds the bot is part of."""
@@ -181,24 +287,17 @@ class GhostSync(commands.Cog):
     ### TASK MANAGEMENT METHODS
 
     async def start_guild_task(self, guild: discord.Guild):
-        """Start the background task for a specific guild."""
-        if guild.id in self.guild_tasks:
+        """Schedule the background sync for a specific guild."""
+        if guild.id in self.scheduler:
             log.info(f"Task already running for guild '{guild.name}'.")
             return
-        task = asyncio.create_task(self.sync_guild_roles(guild))
-        self.guild_tasks[guild.id] = task
+        self.scheduler.add(guild.id, partial(self.sync_guild_roles, guild), await self._base_interval(guild))
         log.info(f"Started sync task for guild '{guild.name}'.")
 
     async def stop_guild_task(self, guild: discord.Guild):
-        """Stop the background task for a specific guild."""
-        task = self.guild_tasks.get(guild.id)
-        if task:
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
-            del self.guild_tasks[guild.id]
+        """Stop the background sync for a specific guild."""
+        if guild.id in self.scheduler:
+            await self.scheduler.remove(guild.id)
             log.info(f"Stopped sync task for guild '{guild.name}'.")
 
     ### GHOST API HELPERS
@@ -237,70 +336,146 @@ class GhostSync(commands.Cog):
             log.error(f"Failed to generate JWT: {e}")
             return None
 
-    def _has_paid_access(self, ghost_member: dict) -> bool:
+    def _has_paid_access(self, ghost_member: GhostMember) -> bool:
         """Check if a Ghost member has paid access (paid or comped)."""
-        status = ghost_member.get("status", "")
-        if status in ("paid", "comped"):
-            return True
-        # Fallback: check subscriptions array for backwards compatibility
-        return len(ghost_member.get("subscriptions", [])) > 0
-
-    async def _get_ghost_members(self, ghost_url: str) -> list | None:
-        """Fetch all Ghost members with pagination."""
+        return ghost_member.has_paid_access
+
+    def _breaker(self, ghost_url: str) -> CircuitBreaker:
+        """Get (or create) the circuit breaker for a Ghost instance."""
+        breaker = self.breakers.get(ghost_url)
+        if breaker is None:
+            breaker = self.breakers[ghost_url] = CircuitBreaker(ghost_url)
+        return breaker
+
+    def _perf_timer(self, service: str):
+        """Time a request with the Perf cog, if it's loaded."""
+        perf = self.bot.get_cog("Perf")
+        return perf.timer(service) if perf else nullcontext()
+
+    async def _ghost_request(self, session: aiohttp.ClientSession, ghost_url: str, method: str, url: str, **kwargs) -> tuple[int, dict | str] | None:
+        """Make a Ghost Admin API request through the instance's circuit breaker.
+
+        Rate limits, 5xx responses and connection errors are retried with exponential backoff.
+        Returns (status, body) - parsed JSON for HTTP 200, text otherwise - or None if the
+        circuit is open or every attempt failed.
+
+        Any other response, 401/403 included, counts as healthy: Ghost answered, and a bad
+        key should show up as the auth error it is rather than as an open circuit.
+        """
+        breaker = self._breaker(ghost_url)
+        if not breaker.allow():
+            return None
+
+        for attempt in range(GHOST_RETRIES + 1):
+            count_api_call("ghost")
+            retry_after = None
+            try:
+                with self._perf_timer("ghost"):
+                    async with session.request(method, url, **kwargs) as response:
+                        if response.status not in GHOST_RETRY_STATUSES:
+                            body = await response.json() if response.status == 200 else await response.text()
+                            breaker.record_success()
+                            return response.status, body
+                        problem = f"HTTP {response.status}"
+                        if "Retry-After" in response.headers:
+                            try:
+                                retry_after = min(float(response.headers["Retry-After"]), GHOST_RETRY_MAX_WAIT)
+                            except ValueError:
+                                pass
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                problem = str(e) or type(e).__name__
+            except ValueError as e:
+                # A 200 whose body isn't JSON - fail like an outage rather than crash the caller
+                log.error(f"Ghost API {method} returned a body that isn't JSON: {e}")
+                breaker.record_failure()
+                return None
+            except asyncio.CancelledError:
+                # Settle the request, so a half-open breaker's probe isn't left claimed for good
+                breaker.record_failure()
+                raise
+
+            # Every failed attempt spends the budget, and once the circuit opens the retries stop
+            breaker.record_failure()
+            if not breaker.available:
+                break
+            if attempt < GHOST_RETRIES:
+                delay = retry_after if retry_after is not None else GHOST_RETRY_BASE * 2 ** attempt * random.uniform(1, 1.5)
+                log.debug(f"Ghost API {method} failed ({problem}), retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+
+        log.error(f"Ghost API {method} failed after {attempt + 1} attempts: {problem}")
+        return None
+
+    async def _iter_ghost_member_pages(self, ghost_url: str):
+        """Fetch Ghost members page by page, yielding each page as compact member records.
+
+        Raw pages are dropped as soon as they're parsed. Yields None and stops if a request fails.
+        """
         token = await self._generate_jwt()
         if not token:
-            return None
+            yield None
+            return
 
         headers = {"Authorization": f"Ghost {token}"}
-        all_members = []
+        labels = LabelCache()
         page = 1
         limit = 100
 
         async with aiohttp.ClientSession() as session:
             while True:
-                url = f"{ghost_url}/ghost/api/admin/members/?limit={limit}&page={page}&include=subscriptions,labels"
-                try:
-                    async with session.get(url, headers=headers) as response:
-                        if response.status != 200:
-                            log.error(f"Ghost API error: HTTP {response.status}")
-                            return None
-                        data = await response.json()
-                        members = data.get("members", [])
-                        if not members:
-                            break
-                        all_members.extend(members)
-                        # Check pagination
-                        meta = data.get("meta", {}).get("pagination", {})
-                        if page >= meta.get("pages", 1):
-                            break
-                        page += 1
-                except Exception as e:
-                    log.error(f"Error fetching Ghost members: {e}")
-                    return None
+                url = (
+                    f"{ghost_url}/ghost/api/admin/members/?limit={limit}&page={page}"
+                    f"&fields={GHOST_MEMBER_FIELDS}&include=subscriptions,labels"
+                )
+                response = await self._ghost_request(session, ghost_url, "GET", url, headers=headers)
+                if response is None:
+                    yield None
+                    return
+                status, data = response
+                if status != 200:
+                    log.error(f"Ghost API error: HTTP {status}")
+                    yield None
+                    return
+                members = [GhostMember.from_api(m, labels) for m in data.get("members", [])]
+                pages = data.get("meta", {}).get("pagination", {}).get("pages", 1)
+                del data, response
+
+                if not members:
+                    break
+                yield members
+                # Check pagination
+                if page >= pages:
+                    break
+                page += 1
 
+    async def _get_ghost_members(self, ghost_url: str) -> list[GhostMember] | None:
+        """Fetch all Ghost members with pagination, keeping only the fields sync uses."""
+        all_members = []
+        async for members in self._iter_ghost_member_pages(ghost_url):
+            if members is None:
+                return None
+            all_members.extend(members)
         return all_members
 
-    async def _get_ghost_member_by_email(self, ghost_url: str, email: str) -> dict | None:
+    async def _get_ghost_member_by_email(self, ghost_url: str, email: str) -> GhostMember | None:
         """Fetch a single Ghost member by email."""
         token = await self._generate_jwt()
         if not token:
             return None
 
         headers = {"Authorization": f"Ghost {token}"}
-        url = f"{ghost_url}/ghost/api/admin/members/?filter=email:{email}"
+        url = f"{ghost_url}/ghost/api/admin/members/?filter=email:{email}&fields={GHOST_MEMBER_FIELDS}&include=subscriptions,labels"
 
         async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        log.error(f"Ghost API error: HTTP {response.status}")
-                        return None
-                    data = await response.json()
-                    members = data.get("members", [])
-                    return members[0] if members else None
-            except Exception as e:
-                log.error(f"Error fetching Ghost member by email: {e}")
-                return None
+            response = await self._ghost_request(session, ghost_url, "GET", url, headers=headers)
+        if response is None:
+            return None
+        status, data = response
+        if status != 200:
+            log.error(f"Ghost API error: HTTP {status}")
+            return None
+        members = data.get("members", [])
+        return GhostMember.from_api(members[0]) if members else None
 
     async def _update_ghost_member_note(self, ghost_url: str, member_id: str, note: str) -> bool:
         """Update a Ghost member's note field."""
@@ -320,15 +495,13 @@ class GhostSync(commands.Cog):
         }
 
         async with aiohttp.ClientSession() as session:
-            try:
-                async with session.put(url, headers=headers, json=payload) as response:
-                    if response.status != 200:
-                        log.error(f"Ghost API error updating member: HTTP {response.status}")
-                        return False
-                    return True
-            except Exception as e:
-                log.error(f"Error updating Ghost member note: {e}")
-                return False
+            response = await self._ghost_request(session, ghost_url, "PUT", url, headers=headers, json=payload)
+        if response is None:
+            return False
+        if response[0] != 200:
+            log.error(f"Ghost API error updating member: HTTP {response[0]}")
+            return False
+        return True
 
     async def _get_ghost_labels(self, ghost_url: str) -> list | None:
         """Fetch all Ghost labels."""
@@ -340,16 +513,14 @@ class GhostSync(commands.Cog):
         url = f"{ghost_url}/ghost/api/admin/labels/"
 
         async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        log.error(f"Ghost API error fetching labels: HTTP {response.status}")
-                        return None
-                    data = await response.json()
-                    return data.get("labels", [])
-            except Exception as e:
-                log.error(f"Error fetching Ghost labels: {e}")
-                return None
+            response = await self._ghost_request(session, ghost_url, "GET", url, headers=headers)
+        if response is None:
+            return None
+        status, data = response
+        if status != 200:
+            log.error(f"Ghost API error fetching labels: HTTP {status}")
+            return None
+        return data.get("labels", [])
 
     async def _update_ghost_member_labels(self, ghost_url: str, member_id: str, labels: list) -> bool:
         """Update a Ghost member's labels."""
@@ -370,159 +541,235 @@ class GhostSync(commands.Cog):
         }
 
         async with aiohttp.ClientSession() as session:
-            try:
-                async with session.put(url, headers=headers, json=payload) as response:
-                    if response.status != 200:
-                        body = await response.text()
-                        log.error(f"Ghost API error updating member labels: HTTP {response.status} - {body}")
-                        return False
-                    return True
-            except Exception as e:
-                log.error(f"Error updating Ghost member labels: {e}")
-                return False
+            response = await self._ghost_request(session, ghost_url, "PUT", url, headers=headers, json=payload)
+        if response is None:
+            return False
+        status, body = response
+        if status != 200:
+            log.error(f"Ghost API error updating member labels: HTTP {status} - {body}")
+            return False
+        return True
+
+    async def _bulk_update_member_labels(self, ghost_url: str, action: str, label_id: str, member_ids: list) -> bool:
+        """Add or remove one label on many Ghost members in a single request.
+
+        `action` is "addLabel" or "removeLabel". If the instance doesn't support bulk edits,
+        the URL is remembered in `_bulk_unsupported` so callers can fall back to per-member writes.
+        """
+        token = await self._generate_jwt()
+        if not token:
+            return False
+
+        headers = {
+            "Authorization": f"Ghost {token}",
+            "Content-Type": "application/json"
+        }
+        member_filter = f"id:[{','.join(member_ids)}]"
+        url = f"{ghost_url}/ghost/api/admin/members/bulk/?filter={member_filter}"
+        payload = {
+            "bulk": {
+                "action": action,
+                "meta": {"label": {"id": label_id}}
+            }
+        }
+
+        async with aiohttp.ClientSession() as session:
+            response = await self._ghost_request(session, ghost_url, "PUT", url, headers=headers, json=payload)
+        if response is None:
+            return False
+        status, body = response
+        if status in GHOST_BULK_UNSUPPORTED:
+            log.warning(f"Ghost bulk member edit unsupported (HTTP {status}), using per-member updates.")
+            self._bulk_unsupported.add(ghost_url)
+            return False
+        if status != 200:
+            log.error(f"Ghost API error bulk updating member labels: HTTP {status} - {body}")
+            return False
+        return True
 
     def _extract_discord_id(self, note: str | None) -> int | None:
         """Extract a Discord ID from a Ghost member's note field."""
-        if not note:
-            return None
-        # Look for a 17-20 digit number (Discord snowflake ID)
-        match = re.search(r"\b(\d{17,20})\b", note)
-        if match:
-            return int(match.group(1))
-        return None
+        return extract_discord_id(note)
 
-    ### MAIN SYNC LOOP
+    ### MEMBER INDEX
 
-    async def sync_guild_roles(self, guild: discord.Guild):
-        """Background task to sync Ghost subscriber status with Discord roles."""
-        while True:
-            try:
-                # Retrieve guild-specific configurations
-                ghost_url = await self.config.guild(guild).ghost_url()
-                sync_interval = await self.config.guild(guild).sync_interval()
-                subscriber_role_id = await self.config.guild(guild).subscriber_role()
-                log_channel_id = await self.config.guild(guild).log_channel()
-                sync_role_id = await self.config.guild(guild).sync_role()
-                label_mappings = await self.config.guild(guild).label_mappings()
-
-                # Skip if not configured (need ghost_url and at least one sync target)
-                if not ghost_url or (not subscriber_role_id and not label_mappings):
-                    log.debug(f"Guild '{guild.name}' not fully configured, skipping sync.")
-                    await asyncio.sleep(sync_interval)
-                    continue
-
-                subscriber_role = guild.get_role(subscriber_role_id) if subscriber_role_id else None
-                sync_role = guild.get_role(sync_role_id) if sync_role_id else None
+    def _get_index(self, guild: discord.Guild) -> MemberIndex:
+        """Get (or create) the member index for a guild."""
+        index = self.member_indexes.get(guild.id)
+        if index is None:
+            index = self.member_indexes[guild.id] = MemberIndex()
+        return index
 
-                # Fetch Ghost members
-                members = await self._get_ghost_members(ghost_url)
-                if members is None:
-                    # API error - keep existing roles, optionally notify
-                    if log_channel_id:
-                        channel = guild.get_channel(log_channel_id)
-                        if channel:
-                            try:
-                                await channel.send(error("`GhostSync: Failed to fetch Ghost members. Roles unchanged.`"))
-                            except discord.Forbidden:
-                                pass
-                    await asyncio.sleep(sync_interval)
-                    continue
+    async def _refresh_index(self, guild: discord.Guild, ghost_url: str) -> MemberIndex | None:
+        """Fetch all Ghost members, rebuild the guild's index and snapshot it. Returns None on API error."""
+        members = await self._get_ghost_members(ghost_url)
+        if members is None:
+            return None
+        index = self._get_index(guild)
+        index.rebuild(members, ghost_url=ghost_url)
+        await self._save_snapshot(guild)
+        return index
+
+    async def _ensure_index(self, guild: discord.Guild, ghost_url: str) -> MemberIndex | None:
+        """Return the guild's index, fetching Ghost members only if it has never been built.
+
+        A warm but stale index (older than the sync interval) is returned as-is
+        while a refresh runs in the background.
+        """
+        index = self._get_index(guild)
+        if not index.ready or index.ghost_url != ghost_url:
+            return await self._refresh_index(guild, ghost_url)
+        sync_interval = await self.config.guild(guild).sync_interval()
+        if index.age() > sync_interval and not self.engine.is_running(guild.id):
+            task = self._refresh_tasks.get(guild.id)
+            if task is None or task.done():
+                self._refresh_tasks[guild.id] = asyncio.create_task(self._refresh_index(guild, ghost_url))
+        return index
+
+    async def _stream_members(self, guild: discord.Guild, ghost_url: str):
+        """Yield the guild's Ghost members in pages for the list commands.
+
+        A warm index is yielded as a single page. Otherwise members are yielded
+        as each API page arrives and the index is rebuilt once the fetch completes.
+        Yields None and stops if the fetch fails.
+        """
+        index = self._get_index(guild)
+        if index.ready and index.ghost_url == ghost_url:
+            index = await self._ensure_index(guild, ghost_url)
+            yield list(index.members())
+            return
 
-                # Process role sync (if subscriber role is configured)
-                if subscriber_role:
-                    # Build set of Discord IDs with Ghost subscriptions
-                    ghost_subscriber_ids = set()
-                    for ghost_member in members:
-                        discord_id = self._extract_discord_id(ghost_member.get("note"))
-                        if not discord_id:
-                            continue
-                        if self._has_paid_access(ghost_member):
-                            ghost_subscriber_ids.add(discord_id)
+        members = []
+        async for page in self._iter_ghost_member_pages(ghost_url):
+            if page is None:
+                yield None
+                return
+            members.extend(page)
+            yield page
+        index.rebuild(members, ghost_url=ghost_url)
+        await self._save_snapshot(guild)
+
+    async def _index_upsert(self, guild: discord.Guild, ghost_member: GhostMember) -> None:
+        """Update one member in the guild's index and snapshot (after link/unlink)."""
+        self._get_index(guild).upsert(ghost_member)
+        try:
+            await asyncio.to_thread(self.snapshots.upsert, guild.id, ghost_member)
+        except Exception as e:
+            log.error(f"Failed to update GhostSync snapshot for guild '{guild.name}': {e}")
 
-                    roles_added = 0
-                    roles_removed = 0
+    async def _save_snapshot(self, guild: discord.Guild) -> None:
+        """Persist the guild's index so it can be warmed after a restart."""
+        index = self._get_index(guild)
+        if not index.ready:
+            return
+        try:
+            await asyncio.to_thread(self.snapshots.save, guild.id, index.ghost_url, index.updated_at, list(index.members()))
+        except Exception as e:
+            log.error(f"Failed to save GhostSync snapshot for guild '{guild.name}': {e}")
 
-                    for discord_member in guild.members:
-                        if discord_member.bot:
-                            continue
+    ### LIST OUTPUT
 
-                        has_role = subscriber_role in discord_member.roles
+    async def _send_list(self, ctx: commands.Context, title: str, pages) -> int | None:
+        """Send a paginated list, showing the first page as soon as the first items arrive.
 
-                        # Check if member should have subscriber role
-                        has_ghost_subscription = discord_member.id in ghost_subscriber_ids
-                        has_sync_role = sync_role and sync_role in discord_member.roles
-                        should_have_role = has_ghost_subscription or has_sync_role
+        `pages` is an async iterable of item lists (None if the fetch failed).
+        Returns the number of items sent, or None on failure.
+        """
+        view = None
+        async for items in pages:
+            if items is None:
+                if view:
+                    await view.finish()
+                await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
+                return None
+            if not items:
+                continue
+            if view is None:
+                view = PaginatedListView(ctx, list(items), title, loading=True)
+                view.message = await ctx.send(embed=view.get_embed(), view=view)
+            else:
+                await view.extend(items)
+        if view is None:
+            return 0
+        await view.finish()
+        return len(view.items)
+
+    async def _send_csv(self, ctx: commands.Context, filename: str, header: list[str], pages) -> int | None:
+        """Send rows as a CSV attachment, writing each page of rows as it arrives.
+
+        `pages` is an async iterable of row lists (None if the fetch failed).
+        Returns the number of rows sent, or None on failure.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        count = 0
+        async for rows in pages:
+            if rows is None:
+                await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
+                return None
+            writer.writerows(rows)
+            count += len(rows)
+        if count:
+            file = discord.File(io.BytesIO(buffer.getvalue().encode("utf-8")), filename=filename)
+            await ctx.send(f"`{count} rows`", file=file)
+        return count
+
+    ### SYNC INTERVAL
+
+    async def _base_interval(self, guild: discord.Guild) -> int:
+        """Configured sync interval, clamped to the adaptive range if one is set."""
+        guild_config = await self.config.guild(guild).all()
+        interval = guild_config["sync_interval"]
+        if guild_config["interval_min"] is not None:
+            interval = min(max(interval, guild_config["interval_min"]), guild_config["interval_max"])
+        return interval
+
+    async def _adapt_interval(self, guild: discord.Guild, result: SyncResult) -> None:
+        """Drop to the adaptive floor after a sync that changed something, otherwise back off toward the ceiling."""
+        guild_config = await self.config.guild(guild).all()
+        interval_min, interval_max = guild_config["interval_min"], guild_config["interval_max"]
+        status = self.scheduler.status(guild.id)
+        if interval_min is None or status is None or not result.ok or result.skipped:
+            return
+        if result.changes:
+            interval = interval_min
+        else:
+            interval = min(status.interval * ADAPTIVE_BACKOFF, interval_max)
+        if interval != status.interval:
+            log.debug(f"Adaptive sync interval for '{guild.name}': {status.interval}s -> {interval}s")
+            self.scheduler.set_interval(guild.id, interval)
 
-                        if should_have_role and not has_role:
-                            try:
-                                reason = "GhostSync: Active subscription" if has_ghost_subscription else f"GhostSync: Has {sync_role.name} role"
-                                await discord_member.add_roles(subscriber_role, reason=reason)
-                                roles_added += 1
-                                log.debug(f"Added subscriber role to {discord_member} in {guild.name}")
-                            except discord.Forbidden:
-                                log.error(f"Missing permissions to add role to {discord_member}")
-                        elif not should_have_role and has_role:
-                            try:
-                                await discord_member.remove_roles(subscriber_role, reason="GhostSync: No active subscription or sync role")
-                                roles_removed += 1
-                                log.debug(f"Removed subscriber role from {discord_member} in {guild.name}")
-                            except discord.Forbidden:
-                                log.error(f"Missing permissions to remove role from {discord_member}")
-
-                    log.info(f"Role sync complete for '{guild.name}': +{roles_added} -{roles_removed} roles")
-
-                # Process label mappings (Discord role -> Ghost label)
-                if label_mappings:
-                    # Build mapping of Discord ID -> Ghost member
-                    discord_to_ghost = {}
-                    for ghost_member in members:
-                        discord_id = self._extract_discord_id(ghost_member.get("note"))
-                        if discord_id:
-                            discord_to_ghost[discord_id] = ghost_member
-
-                    labels_added = 0
-                    labels_removed = 0
-
-                    for role_id_str, label_slug in label_mappings.items():
-                        role_id = int(role_id_str)
-                        role = guild.get_role(role_id)
-                        if not role:
-                            log.warning(f"Label mapping role {role_id} not found in guild '{guild.name}'.")
-                            continue
-
-                        discord_members_with_role = {m.id for m in role.members if not m.bot}
-
-                        for discord_id, ghost_member in discord_to_ghost.items():
-                            has_role = discord_id in discord_members_with_role
-                            current_labels = ghost_member.get("labels", [])
-                            current_label_slugs = {l.get("slug") for l in current_labels}
-                            has_label = label_slug in current_label_slugs
-
-                            if has_role and not has_label:
-                                # Ghost API expects 'name' field for labels
-                                new_labels = current_labels + [{"name": label_slug}]
-                                if await self._update_ghost_member_labels(ghost_url, ghost_member["id"], new_labels):
-                                    labels_added += 1
-                                    ghost_member["labels"] = new_labels
-                                    log.debug(f"Added label '{label_slug}' to Ghost member {ghost_member.get('email')}")
-                            elif not has_role and has_label:
-                                new_labels = [l for l in current_labels if l.get("slug") != label_slug]
-                                if await self._update_ghost_member_labels(ghost_url, ghost_member["id"], new_labels):
-                                    labels_removed += 1
-                                    ghost_member["labels"] = new_labels
-                                    log.debug(f"Removed label '{label_slug}' from Ghost member {ghost_member.get('email')}")
-
-                    log.info(f"Label sync complete for '{guild.name}': +{labels_added} -{labels_removed} labels")
-
-                # Wait for the next interval
-                await asyncio.sleep(sync_interval)
+    ### MAIN SYNC LOOP
 
-            except asyncio.CancelledError:
-                log.info(f"Sync task for guild '{guild.name}' has been cancelled.")
-                break
-            except Exception as e:
-                log.error(f"Unexpected error in sync task for guild '{guild.name}': {e}")
-                await asyncio.sleep(60)  # Wait before retrying after unexpected errors
+    async def sync_guild_roles(self, guild: discord.Guild):
+        """Scheduled job: sync Ghost subscriber status with Discord roles once."""
+        result = await self.engine.run(guild)
+        if result.skipped:
+            log.debug(f"Guild '{guild.name}' not fully configured, skipping sync.")
+        elif not result.ok:
+            # API error - roles were left unchanged, notify once per outage
+            log.warning(f"Sync failed for '{guild.name}': {result.error}")
+            if guild.id not in self._outage_notified:
+                self._outage_notified.add(guild.id)
+                await self._send_log(guild, error(f"`GhostSync: {result.error} Roles unchanged.`"))
+        else:
+            log.info(f"Sync complete for '{guild.name}': {result.summary()}")
+            if guild.id in self._outage_notified:
+                self._outage_notified.discard(guild.id)
+                await self._send_log(guild, success("`GhostSync: Ghost API recovered, syncing again.`"))
+        await self._adapt_interval(guild, result)
+
+    async def _send_log(self, guild: discord.Guild, message: str) -> None:
+        """Post to the guild's log channel, if one is set."""
+        log_channel_id = await self.config.guild(guild).log_channel()
+        if log_channel_id:
+            channel = guild.get_channel(log_channel_id)
+            if channel:
+                try:
+                    await channel.send(message)
+                except discord.Forbidden:
+                    pass
 
     ### LISTENERS
 
@@ -535,6 +782,8 @@ class GhostSync(commands.Cog):
     async def on_guild_remove(self, guild: discord.Guild):
         """Stop the sync task when the bot is removed from a guild."""
         await self.stop_guild_task(guild)
+        self.member_indexes.pop(guild.id, None)
+        await asyncio.to_thread(self.snapshots.delete, guild.id)
 
     ### COMMANDS
 
@@ -549,14 +798,23 @@ class GhostSync(commands.Cog):
         """Display the current GhostSync settings."""
         tokens = await self.bot.get_shared_api_tokens("ghost")
         has_keys = bool(tokens.get("key_id") and tokens.get("key_secret"))
+        status = self.scheduler.status(ctx.guild.id)
+        interval_min = await self.config.guild(ctx.guild).interval_min()
+        interval_max = await self.config.guild(ctx.guild).interval_max()
+        ghost_url = await self.config.guild(ctx.guild).ghost_url()
+        breaker = self.breakers.get(ghost_url)
 
         setting_list = {
-            "Ghost URL": await self.config.guild(ctx.guild).ghost_url() or "Not Set",
+            "Ghost URL": ghost_url or "Not Set",
             "Sync Interval (seconds)": await self.config.guild(ctx.guild).sync_interval(),
+            "Adaptive Interval (seconds)": f"{interval_min} - {interval_max}" if interval_min is not None else "Off",
+            "Effective Interval (seconds)": int(status.interval) if status else await self._base_interval(ctx.guild),
+            "Next Sync": status.describe() if status else "Not scheduled",
             "Subscriber Role": ctx.guild.get_role(await self.config.guild(ctx.guild).subscriber_role()) or "Not Set",
             "Role Sync (→ Subscriber)": ctx.guild.get_role(await self.config.guild(ctx.guild).sync_role()) or "Not Set",
             "Log Channel": ctx.guild.get_channel(await self.config.guild(ctx.guild).log_channel()) or "Not Set",
             "Ghost API Keys": "Set" if has_keys else "Not Set",
+            "Ghost API Status": f"Paused, retrying in {int(breaker.retry_in)}s" if breaker and not breaker.available else "OK",
         }
 
         embed = discord.Embed(
@@ -574,6 +832,9 @@ class GhostSync(commands.Cog):
             # Strip trailing slash
             url = url.rstrip("/")
             await self.config.guild(ctx.guild).ghost_url.set(url)
+            # Members from the old instance no longer apply
+            self._get_index(ctx.guild).clear()
+            await asyncio.to_thread(self.snapshots.delete, ctx.guild.id)
             await ctx.send(success(f"`Ghost URL set to {url}`"))
         else:
             await ctx.send(question("`Please provide the Ghost instance URL (e.g., https://blog.example.com)`"))
@@ -583,10 +844,38 @@ class GhostSync(commands.Cog):
         """Set the sync interval in seconds."""
         if seconds is not None and seconds >= 60:
             await self.config.guild(ctx.guild).sync_interval.set(seconds)
+            self.scheduler.set_interval(ctx.guild.id, await self._base_interval(ctx.guild))
             await ctx.send(success(f"`Sync interval set to {seconds} seconds.`"))
         else:
             await ctx.send(question("`Please provide an interval of at least 60 seconds.`"))
 
+    @ghostsync.command()
+    async def adaptive(self, ctx: commands.Context, minimum: int = None, maximum: int = None) -> None:
+        """Set or clear the adaptive sync interval range in seconds.
+
+        Syncs that change something drop the interval to the minimum; quiet syncs double it up to the maximum.
+        Run without arguments to go back to the fixed interval.
+        """
+        if minimum is None and maximum is None:
+            current = await self.config.guild(ctx.guild).interval_min()
+            if current is not None:
+                await self.config.guild(ctx.guild).interval_min.set(None)
+                await self.config.guild(ctx.guild).interval_max.set(None)
+                self.scheduler.set_interval(ctx.guild.id, await self._base_interval(ctx.guild))
+                await ctx.send(success("`Adaptive interval cleared. Using the fixed sync interval.`"))
+            else:
+                await ctx.send(question("`Please provide a minimum and maximum interval in seconds, or run without arguments to clear.`"))
+            return
+
+        if minimum is None or maximum is None or minimum < 60 or maximum < minimum:
+            await ctx.send(question("`Please provide a minimum of at least 60 seconds and a maximum no lower than the minimum.`"))
+            return
+
+        await self.config.guild(ctx.guild).interval_min.set(minimum)
+        await self.config.guild(ctx.guild).interval_max.set(maximum)
+        self.scheduler.set_interval(ctx.guild.id, await self._base_interval(ctx.guild))
+        await ctx.send(success(f"`Adaptive interval set: {minimum} - {maximum} seconds.`"))
+
     @ghostsync.command()
     async def role(self, ctx: commands.Context, role: discord.Role = None) -> None:
         """Set the Discord role to assign to subscribers."""
@@ -641,7 +930,7 @@ class GhostSync(commands.Cog):
             return
 
         # Check if already linked to someone in this server
-        existing_discord_id = self._extract_discord_id(ghost_member.get("note"))
+        existing_discord_id = ghost_member.discord_id
         if existing_discord_id:
             existing_member = ctx.guild.get_member(existing_discord_id)
             if existing_member:
@@ -656,12 +945,14 @@ class GhostSync(commands.Cog):
                 return
 
         # No existing link (or linked user not in server) - proceed directly
-        current_note = ghost_member.get("note") or ""
+        current_note = ghost_member.note or ""
         current_note = re.sub(r"\b\d{17,20}\b", "", current_note).strip()
         new_note = f"{member.id} {current_note}".strip() if current_note else str(member.id)
 
-        if await self._update_ghost_member_note(ghost_url, ghost_member["id"], new_note):
-            view = GhostMemberLinkView(ghost_url, ghost_member["id"])
+        if await self._update_ghost_member_note(ghost_url, ghost_member.id, new_note):
+            ghost_member.set_note(new_note)
+            await self._index_upsert(ctx.guild, ghost_member)
+            view = GhostMemberLinkView(ghost_url, ghost_member.id)
             await ctx.send(success(f"`Linked {email} to {member.display_name} (ID: {member.id})`"), view=view)
         else:
             await ctx.send(error("`Failed to update Ghost member. Check API keys and permissions.`"))
@@ -681,19 +972,14 @@ class GhostSync(commands.Cog):
         # Check if target is a Discord mention or ID
         discord_id_match = re.match(r"<@!?(\d{17,20})>|(\d{17,20})", target)
         if discord_id_match:
-            # It's a Discord mention or ID - search Ghost members for this ID
+            # It's a Discord mention or ID - look it up in the member index
             discord_id = int(discord_id_match.group(1) or discord_id_match.group(2))
-            members = await self._get_ghost_members(ghost_url)
-            if members is None:
+            index = await self._ensure_index(ctx.guild, ghost_url)
+            if index is None:
                 await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
                 return
 
-            for member in members:
-                member_discord_id = self._extract_discord_id(member.get("note"))
-                if member_discord_id == discord_id:
-                    ghost_member = member
-                    break
-
+            ghost_member = index.by_discord(discord_id)
             if not ghost_member:
                 await ctx.send(error(f"`No Ghost member found linked to <@{discord_id}>`"))
                 return
@@ -705,8 +991,8 @@ class GhostSync(commands.Cog):
                 return
 
         # Check if there's a Discord ID to remove
-        current_note = ghost_member.get("note") or ""
-        existing_discord_id = self._extract_discord_id(current_note)
+        current_note = ghost_member.note or ""
+        existing_discord_id = ghost_member.discord_id
         if not existing_discord_id:
             await ctx.send("`No Discord ID to unlink - nothing changed.`")
             return
@@ -714,15 +1000,20 @@ class GhostSync(commands.Cog):
         # Remove Discord ID from note
         new_note = re.sub(r"\b\d{17,20}\b", "", current_note).strip()
 
-        if await self._update_ghost_member_note(ghost_url, ghost_member["id"], new_note):
-            view = GhostMemberLinkView(ghost_url, ghost_member["id"])
-            await ctx.send(success(f"`Unlinked Discord ID from {ghost_member.get('email')}`"), view=view)
+        if await self._update_ghost_member_note(ghost_url, ghost_member.id, new_note):
+            ghost_member.set_note(new_note)
+            await self._index_upsert(ctx.guild, ghost_member)
+            view = GhostMemberLinkView(ghost_url, ghost_member.id)
+            await ctx.send(success(f"`Unlinked Discord ID from {ghost_member.email}`"), view=view)
         else:
             await ctx.send(error("`Failed to update Ghost member. Check API keys and permissions.`"))
 
     @ghostsync.command(name="members")
-    async def list_members(self, ctx: commands.Context) -> None:
-        """List all Ghost members with Discord IDs in their notes."""
+    async def list_members(self, ctx: commands.Context, export: Literal["csv"] = None) -> None:
+        """List all Ghost members with Discord IDs in their notes.
+
+        Add `csv` to get the full list as a CSV attachment.
+        """
         ghost_url = await self.config.guild(ctx.guild).ghost_url()
         if not ghost_url:
             await ctx.send(error("`Ghost URL not configured. Use [p]ghostsync url first.`"))
@@ -730,34 +1021,36 @@ class GhostSync(commands.Cog):
 
         await ctx.defer()
 
-        members = await self._get_ghost_members(ghost_url)
-        if members is None:
-            await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
-            return
-
-        linked = []
-        for ghost_member in members:
-            discord_id = self._extract_discord_id(ghost_member.get("note"))
-            if discord_id:
-                discord_member = ctx.guild.get_member(discord_id)
-                status = "Subscribed" if self._has_paid_access(ghost_member) else "Free"
-                discord_name = discord_member.mention if discord_member else "⚠️ Not in Server"
-                linked.append(f"**{ghost_member.get('email')}** -> {discord_name} ({status})")
-
-        if not linked:
+        async def pages():
+            async for members in self._stream_members(ctx.guild, ghost_url):
+                if members is None:
+                    yield None
+                    return
+                items = []
+                for ghost_member in members:
+                    if not ghost_member.discord_id:
+                        continue
+                    discord_member = ctx.guild.get_member(ghost_member.discord_id)
+                    status = "Subscribed" if self._has_paid_access(ghost_member) else "Free"
+                    if export:
+                        items.append((ghost_member.email, ghost_member.discord_id, str(discord_member or ""), status, ghost_member.tier or ""))
+                    else:
+                        discord_name = discord_member.mention if discord_member else "⚠️ Not in Server"
+                        items.append(f"**{ghost_member.email}** -> {discord_name} ({status})")
+                yield items
+
+        if export:
+            count = await self._send_csv(ctx, "ghost_members.csv", ["email", "discord_id", "discord_name", "status", "tier"], pages())
+        else:
+            count = await self._send_list(ctx, "Linked Ghost Members", pages())
+        if count == 0:
             await ctx.send("`No Ghost members have Discord IDs linked.`")
-            return
-
-        view = PaginatedListView(ctx, linked, "Linked Ghost Members")
-        msg = await ctx.send(embed=view.get_embed(), view=view)
-        view.message = msg
 
     @ghostsync.command()
     async def sync(self, ctx: commands.Context) -> None:
         """Force an immediate sync of subscriber roles and label mappings."""
         ghost_url = await self.config.guild(ctx.guild).ghost_url()
         subscriber_role_id = await self.config.guild(ctx.guild).subscriber_role()
-        sync_role_id = await self.config.guild(ctx.guild).sync_role()
         label_mappings = await self.config.guild(ctx.guild).label_mappings()
 
         if not ghost_url:
@@ -768,92 +1061,75 @@ class GhostSync(commands.Cog):
             await ctx.send(error("`Nothing to sync. Configure a subscriber role or label mappings first.`"))
             return
 
-        subscriber_role = ctx.guild.get_role(subscriber_role_id) if subscriber_role_id else None
-        sync_role = ctx.guild.get_role(sync_role_id) if sync_role_id else None
-
         await ctx.defer()
 
-        members = await self._get_ghost_members(ghost_url)
-        if members is None:
-            await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
+        # Joins a sync already in progress, or pulls the background sync forward
+        result = await self.engine.trigger(ctx.guild)
+        if not result.ok:
+            hint = " Check API keys." if self._breaker(ghost_url).available else ""
+            await ctx.send(error(f"`{result.error}{hint}`"))
             return
 
-        roles_added = 0
-        roles_removed = 0
+        await ctx.send(success(f"`Sync complete: {result.summary()}`"))
 
-        # Process role sync (if subscriber role is configured)
-        if subscriber_role:
-            ghost_subscriber_ids = set()
-            for ghost_member in members:
-                discord_id = self._extract_discord_id(ghost_member.get("note"))
-                if not discord_id:
-                    continue
-                if self._has_paid_access(ghost_member):
-                    ghost_subscriber_ids.add(discord_id)
+    @ghostsync.command()
+    async def plan(self, ctx: commands.Context, refresh: bool = False) -> None:
+        """Preview the changes a sync would make, without making them.
 
-            for discord_member in ctx.guild.members:
-                if discord_member.bot:
-                    continue
+        Uses cached Ghost members unless `refresh` is true. Run `[p]ghostsync apply` to apply the plan.
+        """
+        ghost_url = await self.config.guild(ctx.guild).ghost_url()
+        if not ghost_url:
+            await ctx.send(error("`Ghost URL not configured. Use [p]ghostsync url first.`"))
+            return
 
-                has_role = subscriber_role in discord_member.roles
-                has_ghost_subscription = discord_member.id in ghost_subscriber_ids
-                has_sync_role = sync_role and sync_role in discord_member.roles
-                should_have_role = has_ghost_subscription or has_sync_role
-
-                if should_have_role and not has_role:
-                    try:
-                        await discord_member.add_roles(subscriber_role, reason="GhostSync: Manual sync")
-                        roles_added += 1
-                    except discord.Forbidden:
-                        pass
-                elif not should_have_role and has_role:
-                    try:
-                        await discord_member.remove_roles(subscriber_role, reason="GhostSync: Manual sync")
-                        roles_removed += 1
-                    except discord.Forbidden:
-                        pass
-
-        # Process label mappings
-        labels_added = 0
-        labels_removed = 0
-
-        if label_mappings:
-            discord_to_ghost = {}
-            for ghost_member in members:
-                discord_id = self._extract_discord_id(ghost_member.get("note"))
-                if discord_id:
-                    discord_to_ghost[discord_id] = ghost_member
-
-            for role_id_str, label_slug in label_mappings.items():
-                role = ctx.guild.get_role(int(role_id_str))
-                if not role:
-                    continue
+        await ctx.defer()
 
-                discord_members_with_role = {m.id for m in role.members if not m.bot}
+        index = await (self._refresh_index if refresh else self._ensure_index)(ctx.guild, ghost_url)
+        if index is None:
+            await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
+            return
 
-                for discord_id, ghost_member in discord_to_ghost.items():
-                    has_role = discord_id in discord_members_with_role
-                    current_labels = ghost_member.get("labels", [])
-                    current_label_slugs = {l.get("slug") for l in current_labels}
-                    has_label = label_slug in current_label_slugs
+        plan = self.engine.build_plan(ctx.guild, index, await self.config.guild(ctx.guild).all())
+        if plan.is_empty:
+            self.pending_plans.pop(ctx.guild.id, None)
+            await ctx.send("`Nothing to sync - roles and labels are up to date.`")
+            return
 
-                    if has_role and not has_label:
-                        # Ghost API expects 'name' field for labels
-                        new_labels = current_labels + [{"name": label_slug}]
-                        if await self._update_ghost_member_labels(ghost_url, ghost_member["id"], new_labels):
-                            labels_added += 1
-                            ghost_member["labels"] = new_labels
-                    elif not has_role and has_label:
-                        new_labels = [l for l in current_labels if l.get("slug") != label_slug]
-                        if await self._update_ghost_member_labels(ghost_url, ghost_member["id"], new_labels):
-                            labels_removed += 1
-                            ghost_member["labels"] = new_labels
+        self.pending_plans[ctx.guild.id] = plan
+        view = PaginatedListView(ctx, plan.lines(ctx.guild), "Sync Plan")
+        msg = await ctx.send(
+            f"`Plan: {plan.summary()}`\n`Run [p]ghostsync apply within {PLAN_TTL // 60} minutes to apply it.`",
+            embed=view.get_embed(),
+            view=view
+        )
+        view.message = msg
 
-        await ctx.send(success(f"`Sync complete: +{roles_added} roles, -{roles_removed} roles, +{labels_added} labels, -{labels_removed} labels.`"))
+    @ghostsync.command()
+    async def apply(self, ctx: commands.Context) -> None:
+        """Apply the sync plan from the last `[p]ghostsync plan`."""
+        plan = self.pending_plans.pop(ctx.guild.id, None)
+        if plan is None:
+            await ctx.send(error("`No pending plan. Use [p]ghostsync plan first.`"))
+            return
+        if time.time() - plan.created_at > PLAN_TTL:
+            await ctx.send(error("`That plan has expired. Use [p]ghostsync plan to build a fresh one.`"))
+            return
+        if plan.ghost_url != await self.config.guild(ctx.guild).ghost_url():
+            await ctx.send(error("`The Ghost URL changed since that plan was built. Use [p]ghostsync plan again.`"))
+            return
+
+        await ctx.defer()
+
+        result = await self.engine.apply(ctx.guild, plan)
+        await ctx.send(success(f"`Plan applied: {result.summary()}`"))
 
     @ghostsync.command()
-    async def orphans(self, ctx: commands.Context) -> None:
-        """List Discord members who aren't linked to any Ghost account."""
+    async def orphans(self, ctx: commands.Context, export: Literal["csv"] = None) -> None:
+        """List Discord members who aren't linked to any Ghost account.
+
+        Add `csv` to get the full list as a CSV attachment.
+        """
         ghost_url = await self.config.guild(ctx.guild).ghost_url()
 
         if not ghost_url:
@@ -862,37 +1138,35 @@ class GhostSync(commands.Cog):
 
         await ctx.defer()
 
-        # Fetch all Ghost members and extract linked Discord IDs
-        members = await self._get_ghost_members(ghost_url)
-        if members is None:
-            await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
-            return
-
-        linked_discord_ids = set()
-        for ghost_member in members:
-            discord_id = self._extract_discord_id(ghost_member.get("note"))
-            if discord_id:
-                linked_discord_ids.add(discord_id)
-
-        # Find Discord members who aren't linked
-        orphans = []
-        for discord_member in ctx.guild.members:
-            if discord_member.bot:
-                continue
-            if discord_member.id not in linked_discord_ids:
-                orphans.append(f"{discord_member.mention}")
+        async def pages():
+            # A member is only an orphan once every Ghost page has been checked for their ID
+            linked_discord_ids = set()
+            async for members in self._stream_members(ctx.guild, ghost_url):
+                if members is None:
+                    yield None
+                    return
+                linked_discord_ids.update(m.discord_id for m in members if m.discord_id)
+
+            # Find Discord members who aren't linked
+            orphans = [m for m in ctx.guild.members if not m.bot and m.id not in linked_discord_ids]
+            if export:
+                yield [(m.id, str(m), m.display_name) for m in orphans]
+            else:
+                yield [m.mention for m in orphans]
 
-        if not orphans:
+        if export:
+            count = await self._send_csv(ctx, "ghost_orphans.csv", ["discord_id", "discord_name", "display_name"], pages())
+        else:
+            count = await self._send_list(ctx, "Orphaned Discord Members", pages())
+        if count == 0:
             await ctx.send("`No orphans found. All Discord members are linked in Ghost.`")
-            return
-
-        view = PaginatedListView(ctx, orphans, "Orphaned Discord Members")
-        msg = await ctx.send(embed=view.get_embed(), view=view)
-        view.message = msg
 
     @ghostsync.command()
-    async def subscribers(self, ctx: commands.Context) -> None:
-        """List all linked members who have an active subscription."""
+    async def subscribers(self, ctx: commands.Context, export: Literal["csv"] = None) -> None:
+        """List all linked members who have an active subscription.
+
+        Add `csv` to get the Ghost subscribers as a CSV attachment.
+        """
         ghost_url = await self.config.guild(ctx.guild).ghost_url()
         if not ghost_url:
             await ctx.send(error("`Ghost URL not configured. Use [p]ghostsync url first.`"))
@@ -900,63 +1174,55 @@ class GhostSync(commands.Cog):
 
         await ctx.defer()
 
-        members = await self._get_ghost_members(ghost_url)
-        if members is None:
-            await ctx.send(error("`Failed to fetch Ghost members. Check API keys.`"))
-            return
-
         # Get sync role if configured
         sync_role_id = await self.config.guild(ctx.guild).sync_role()
         sync_role = ctx.guild.get_role(sync_role_id) if sync_role_id else None
 
-        # Build set of Ghost subscriber Discord IDs for exclusion from sync role list
-        ghost_subscriber_ids = set()
-
-        subscribers = []
-        for ghost_member in members:
-            discord_id = self._extract_discord_id(ghost_member.get("note"))
-            if not discord_id:
-                continue
-
-            if not self._has_paid_access(ghost_member):
-                continue
-
-            ghost_subscriber_ids.add(discord_id)
-
-            discord_member = ctx.guild.get_member(discord_id)
-            discord_name = discord_member.mention if discord_member else "⚠️ Not in Server"
-
-            # Get tier name from subscription (comped members will show "Comped")
-            tier_name = "Unknown Tier"
-            subscriptions = ghost_member.get("subscriptions", [])
-            if subscriptions:
-                sub = subscriptions[0]  # Get first/active subscription
-                tier = sub.get("tier") or sub.get("price", {}).get("tier") or {}
-                tier_name = tier.get("name", "Unknown Tier")
-            elif ghost_member.get("status") == "comped":
-                tier_name = "Comped"
-
-            subscribers.append(f"**{ghost_member.get('email')}** -> {discord_name} ({tier_name})")
+        async def pages():
+            async for members in self._stream_members(ctx.guild, ghost_url):
+                if members is None:
+                    yield None
+                    return
+                items = []
+                for ghost_member in members:
+                    if not ghost_member.discord_id or not self._has_paid_access(ghost_member):
+                        continue
+
+                    discord_member = ctx.guild.get_member(ghost_member.discord_id)
+
+                    # Tier name from subscription (comped members will show "Comped")
+                    tier_name = ghost_member.tier
+                    if tier_name is None:
+                        tier_name = "Comped" if ghost_member.status == "comped" else "Unknown Tier"
+
+                    if export:
+                        items.append((ghost_member.email, ghost_member.discord_id, str(discord_member or ""), tier_name))
+                    else:
+                        discord_name = discord_member.mention if discord_member else "⚠️ Not in Server"
+                        items.append(f"**{ghost_member.email}** -> {discord_name} ({tier_name})")
+                yield items
+
+        # Send Ghost subscribers as they load
+        if export:
+            count = await self._send_csv(ctx, "ghost_subscribers.csv", ["email", "discord_id", "discord_name", "tier"], pages())
+        else:
+            count = await self._send_list(ctx, "Ghost Subscribers", pages())
+        if count is None:
+            return
 
         # Build list of sync role members (include all, even Ghost subscribers)
         sync_role_members = []
-        if sync_role:
+        if sync_role and not export:
             for discord_member in ctx.guild.members:
                 if discord_member.bot:
                     continue
                 if sync_role in discord_member.roles:
                     sync_role_members.append(discord_member.mention)
 
-        if not subscribers and not sync_role_members:
+        if not count and not sync_role_members:
             await ctx.send("`No subscribers found.`")
             return
 
-        # Send Ghost subscribers embed
-        if subscribers:
-            view = PaginatedListView(ctx, subscribers, "Ghost Subscribers")
-            msg = await ctx.send(embed=view.get_embed(), view=view)
-            view.message = msg
-
         # Send sync role members embed (separate)
         if sync_role_members:
             sync_view = PaginatedListView(ctx, sync_role_members, f"{sync_role.name} (Synced)")
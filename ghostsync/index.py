@@ -0,0 +1,114 @@
+"""
+GhostSync - Member Index
+
+Bidirectional lookup table between Discord IDs and Ghost members.
+"""
+import time
+
+from .member import GhostMember
+
+
+class MemberIndex:
+    """Ghost members for one guild, indexed by Ghost ID, email and linked Discord ID.
+
+    Built from a full member fetch, then kept current by the sync loop and by
+    link/unlink so commands can answer without re-fetching and re-scanning notes.
+    """
+
+    def __init__(self):
+        self._members: dict[str, GhostMember] = {}  # ghost_id -> member
+        self._by_discord: dict[int, str] = {}       # discord_id -> ghost_id
+        self._discord_of: dict[str, int] = {}       # ghost_id -> discord_id
+        self._by_email: dict[str, str] = {}         # lowercased email -> ghost_id
+        self.ghost_url: str | None = None
+        self.updated_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    @property
+    def ready(self) -> bool:
+        """Whether the index has been built from a full member fetch."""
+        return self.updated_at is not None
+
+    def clear(self) -> None:
+        """Forget all members (e.g. when the Ghost URL changes)."""
+        self._members.clear()
+        self._by_discord.clear()
+        self._discord_of.clear()
+        self._by_email.clear()
+        self.ghost_url = None
+        self.updated_at = None
+
+    def rebuild(self, members: list[GhostMember], ghost_url: str | None = None, updated_at: float | None = None) -> None:
+        """Replace the index contents with a full member list fetched from `ghost_url` at `updated_at`."""
+        self.clear()
+        for member in members:
+            self._add(member)
+        self.ghost_url = ghost_url
+        self.updated_at = updated_at if updated_at is not None else time.time()
+
+    def age(self) -> float:
+        """Seconds since the index was last built from a full fetch."""
+        return time.time() - self.updated_at if self.updated_at is not None else float("inf")
+
+    def upsert(self, member: GhostMember) -> None:
+        """Add or replace a single member."""
+        self.discard(member.id)
+        self._add(member)
+
+    def discard(self, ghost_id: str) -> None:
+        """Remove a member from the index, if present."""
+        member = self._members.pop(ghost_id, None)
+        if member is None:
+            return
+        email = (member.email or "").lower()
+        if self._by_email.get(email) == ghost_id:
+            del self._by_email[email]
+        discord_id = self._discord_of.pop(ghost_id, None)
+        if discord_id is not None and self._by_discord.get(discord_id) == ghost_id:
+            del self._by_discord[discord_id]
+
+    def _add(self, member: GhostMember) -> None:
+        ghost_id = member.id
+        self._members[ghost_id] = member
+        if member.email:
+            self._by_email[member.email.lower()] = ghost_id
+        discord_id = member.discord_id
+        if discord_id:
+            # Last member wins if several notes carry the same Discord ID
+            self._by_discord[discord_id] = ghost_id
+            self._discord_of[ghost_id] = discord_id
+
+    ### LOOKUPS
+
+    def get(self, ghost_id: str) -> GhostMember | None:
+        """Look up a member by Ghost ID."""
+        return self._members.get(ghost_id)
+
+    def by_discord(self, discord_id: int) -> GhostMember | None:
+        """Look up the Ghost member linked to a Discord ID."""
+        ghost_id = self._by_discord.get(discord_id)
+        return self._members.get(ghost_id) if ghost_id else None
+
+    def by_email(self, email: str) -> GhostMember | None:
+        """Look up a member by email (case-insensitive)."""
+        ghost_id = self._by_email.get(email.lower())
+        return self._members.get(ghost_id) if ghost_id else None
+
+    def discord_id_of(self, ghost_id: str) -> int | None:
+        """Discord ID linked to a Ghost member, if any."""
+        return self._discord_of.get(ghost_id)
+
+    def members(self):
+        """Iterate over every indexed member."""
+        return iter(self._members.values())
+
+    def linked(self):
+        """Iterate over (discord_id, member) for every linked member."""
+        for discord_id, ghost_id in self._by_discord.items():
+            yield discord_id, self._members[ghost_id]
+
+    def linked_ids(self):
+        """Set-like view of all linked Discord IDs."""
+        return self._by_discord.keys()
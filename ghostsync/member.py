@@ -0,0 +1,85 @@
+"""
+GhostSync - Member Records
+
+Compact record of the Ghost member fields GhostSync reads, built straight from
+Admin API pages so the full JSON payload can be dropped as soon as it's parsed.
+"""
+import re
+from dataclasses import dataclass
+
+# A 17-20 digit number (Discord snowflake ID)
+DISCORD_ID_RE = re.compile(r"\b(\d{17,20})\b")
+
+# Member attributes requested from the Admin API (labels & subscriptions come via include=)
+GHOST_MEMBER_FIELDS = "id,email,note,status"
+
+
+def extract_discord_id(note: str | None) -> int | None:
+    """Extract a Discord ID from a Ghost member's note field."""
+    if not note:
+        return None
+    match = DISCORD_ID_RE.search(note)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def tier_name(member: dict) -> str | None:
+    """Name of a member's first subscription tier, or None if they have no subscriptions."""
+    subscriptions = member.get("subscriptions") or []
+    if not subscriptions:
+        return None
+    sub = subscriptions[0]  # Get first/active subscription
+    tier = sub.get("tier") or sub.get("price", {}).get("tier") or {}
+    return tier.get("name", "Unknown Tier")
+
+
+class LabelCache(dict):
+    """Shares one {id, name, slug} dict per label across every member that carries it."""
+
+    def intern(self, label: dict) -> dict:
+        slug = label.get("slug")
+        shared = self.get(slug)
+        if shared is None or shared.get("id") != label.get("id"):
+            shared = self[slug] = {k: label[k] for k in ("id", "name", "slug") if k in label}
+        return shared
+
+
+@dataclass(slots=True)
+class GhostMember:
+    """The parts of a Ghost member sync and the list commands use."""
+    id: str
+    email: str | None
+    note: str | None
+    status: str | None
+    labels: tuple[dict, ...] = ()
+    tier: str | None = None
+    discord_id: int | None = None
+
+    @classmethod
+    def from_api(cls, member: dict, labels: LabelCache | None = None) -> "GhostMember":
+        """Build a record from an Admin API member, sharing label dicts through `labels`."""
+        labels = labels if labels is not None else LabelCache()
+        note = member.get("note")
+        return cls(
+            id=member["id"],
+            email=member.get("email"),
+            note=note,
+            status=member.get("status"),
+            labels=tuple(labels.intern(l) for l in member.get("labels") or ()),
+            tier=tier_name(member),
+            discord_id=extract_discord_id(note),
+        )
+
+    def set_note(self, note: str | None) -> None:
+        """Replace the note and re-read the linked Discord ID from it."""
+        self.note = note
+        self.discord_id = extract_discord_id(note)
+
+    def label_slugs(self) -> set[str]:
+        return {l.get("slug") for l in self.labels}
+
+    @property
+    def has_paid_access(self) -> bool:
+        """Paid or comped, or (for older Ghost versions) any subscription."""
+        return self.status in ("paid", "comped") or self.tier is not None
@@ -0,0 +1,177 @@
+"""
+GhostSync - Sync Planner
+
+Computes the role and label changes a sync would make, purely from cached
+state, so they can be previewed before anything touches Discord or Ghost.
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+
+import discord
+
+from .index import MemberIndex
+
+log = logging.getLogger("red.ghostsync")
+
+# Max member IDs per bulk label edit (keeps the filter query string short)
+GHOST_BULK_CHUNK = 100
+
+
+@dataclass
+class RoleChange:
+    """Subscriber role to add to or remove from one Discord member."""
+    member_id: int
+    add: bool
+    reason: str
+
+
+@dataclass
+class LabelChange:
+    """Merged label slugs to add to and remove from one Ghost member."""
+    ghost_id: str
+    discord_id: int
+    email: str | None
+    adds: set[str] = field(default_factory=set)
+    removes: set[str] = field(default_factory=set)
+
+
+@dataclass
+class SyncPlan:
+    """Every change one sync would make for a guild."""
+    guild_id: int
+    ghost_url: str
+    subscriber_role_id: int | None
+    role_changes: list[RoleChange] = field(default_factory=list)
+    label_changes: dict[str, LabelChange] = field(default_factory=dict)
+    bulk_labels: bool = True
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def roles_to_add(self) -> int:
+        return sum(1 for c in self.role_changes if c.add)
+
+    @property
+    def roles_to_remove(self) -> int:
+        return sum(1 for c in self.role_changes if not c.add)
+
+    @property
+    def labels_to_add(self) -> int:
+        return sum(len(c.adds) for c in self.label_changes.values())
+
+    @property
+    def labels_to_remove(self) -> int:
+        return sum(len(c.removes) for c in self.label_changes.values())
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.role_changes and not self.label_changes
+
+    def estimated_api_calls(self) -> dict[str, int]:
+        """Estimate requests per API: one Discord call per role change, Ghost calls per label strategy."""
+        ghost_calls = 0
+        if self.label_changes:
+            ghost_calls = 1  # label lookup
+            if self.bulk_labels:
+                groups: dict[tuple[str, str], int] = {}
+                for change in self.label_changes.values():
+                    for slug in change.adds:
+                        groups[("add", slug)] = groups.get(("add", slug), 0) + 1
+                    for slug in change.removes:
+                        groups[("remove", slug)] = groups.get(("remove", slug), 0) + 1
+                ghost_calls += sum(math.ceil(n / GHOST_BULK_CHUNK) for n in groups.values())
+            else:
+                ghost_calls += len(self.label_changes)
+        return {"discord": len(self.role_changes), "ghost": ghost_calls}
+
+    def summary(self) -> str:
+        """One-line summary of the plan's size."""
+        calls = self.estimated_api_calls()
+        return (
+            f"+{self.roles_to_add} -{self.roles_to_remove} roles, "
+            f"+{self.labels_to_add} -{self.labels_to_remove} labels "
+            f"(~{calls['discord']} Discord / ~{calls['ghost']} Ghost API calls)"
+        )
+
+    def lines(self, guild: discord.Guild) -> list[str]:
+        """Human-readable per-member changes for a paginated embed."""
+        lines = []
+        role = guild.get_role(self.subscriber_role_id) if self.subscriber_role_id else None
+        role_name = role.name if role else "subscriber role"
+        for change in self.role_changes:
+            sign = "➕" if change.add else "➖"
+            lines.append(f"{sign} <@{change.member_id}> **{role_name}** ({change.reason})")
+        for change in self.label_changes.values():
+            diff = " ".join([f"`+{s}`" for s in sorted(change.adds)] + [f"`-{s}`" for s in sorted(change.removes)])
+            lines.append(f"🏷️ **{change.email}** (<@{change.discord_id}>) {diff}")
+        return lines
+
+
+def plan_role_changes(guild: discord.Guild, index: MemberIndex, subscriber_role: discord.Role, sync_role: discord.Role | None) -> list[RoleChange]:
+    """Subscriber role changes needed so that role == paid Ghost access or sync role."""
+    ghost_subscriber_ids = {
+        discord_id for discord_id, ghost_member in index.linked()
+        if ghost_member.has_paid_access
+    }
+
+    changes = []
+    for discord_member in guild.members:
+        if discord_member.bot:
+            continue
+
+        has_role = subscriber_role in discord_member.roles
+        has_ghost_subscription = discord_member.id in ghost_subscriber_ids
+        has_sync_role = sync_role and sync_role in discord_member.roles
+        should_have_role = has_ghost_subscription or has_sync_role
+
+        if should_have_role and not has_role:
+            reason = "GhostSync: Active subscription" if has_ghost_subscription else f"GhostSync: Has {sync_role.name} role"
+            changes.append(RoleChange(discord_member.id, True, reason))
+        elif not should_have_role and has_role:
+            changes.append(RoleChange(discord_member.id, False, "GhostSync: No active subscription or sync role"))
+    return changes
+
+
+def plan_label_changes(guild: discord.Guild, index: MemberIndex, label_mappings: dict) -> dict[str, LabelChange]:
+    """Merge all label mappings into one set of label adds/removes per Ghost member."""
+    role_holders = {}
+    for role_id_str, label_slug in label_mappings.items():
+        role = guild.get_role(int(role_id_str))
+        if not role:
+            log.warning(f"Label mapping role {role_id_str} not found in guild '{guild.name}'.")
+            continue
+        # Several roles can map to one label - holding any of them earns it
+        role_holders.setdefault(label_slug, set()).update(m.id for m in role.members if not m.bot)
+
+    changes = {}
+    for discord_id, ghost_member in index.linked():
+        current_slugs = ghost_member.label_slugs()
+        adds = {slug for slug, holders in role_holders.items() if discord_id in holders and slug not in current_slugs}
+        removes = {slug for slug, holders in role_holders.items() if discord_id not in holders and slug in current_slugs}
+        if adds or removes:
+            changes[ghost_member.id] = LabelChange(ghost_member.id, discord_id, ghost_member.email, adds, removes)
+    return changes
+
+
+def build_plan(
+    guild: discord.Guild,
+    ghost_url: str,
+    index: MemberIndex,
+    subscriber_role: discord.Role | None,
+    sync_role: discord.Role | None,
+    label_mappings: dict,
+    bulk_labels: bool = True,
+) -> SyncPlan:
+    """Build the full sync plan for a guild from its member index and current Discord state."""
+    plan = SyncPlan(
+        guild_id=guild.id,
+        ghost_url=ghost_url,
+        subscriber_role_id=subscriber_role.id if subscriber_role else None,
+        bulk_labels=bulk_labels,
+    )
+    if subscriber_role:
+        plan.role_changes = plan_role_changes(guild, index, subscriber_role, sync_role)
+    if label_mappings:
+        plan.label_changes = plan_label_changes(guild, index, label_mappings)
+    return plan
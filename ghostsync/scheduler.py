@@ -0,0 +1,182 @@
+"""
+Guild Scheduler
+
+Staggered per-guild background jobs with a global concurrency cap.
+Shared by GhostSync and Q3stat - keep both copies identical.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+# Seconds to wait before retrying a job that raised
+RETRY_AFTER_ERROR = 60
+
+
+@dataclass
+class JobStatus:
+    """Timing for one guild's job."""
+    interval: float
+    next_run_in: float
+    running: bool
+    last_run: float | None        # Unix timestamp of the last completed run
+    last_duration: float | None   # Seconds the last run took
+
+    def describe(self) -> str:
+        """Short human-readable status, for settings embeds."""
+        if self.running:
+            status = "running now"
+        else:
+            status = f"next in {_format_seconds(self.next_run_in)}"
+        if self.last_duration is not None:
+            status += f", last took {self.last_duration:.1f}s"
+        return status
+
+
+@dataclass
+class _Job:
+    guild_id: int
+    func: Callable[[], Awaitable[None]]
+    interval: float
+    next_run: float                       # time.monotonic() of the next run
+    wake: asyncio.Event = field(default_factory=asyncio.Event)
+    task: asyncio.Task | None = None
+    running: bool = False
+    rerun: bool = False                   # Triggered while running - go again right after
+    last_start: float | None = None       # time.monotonic() the last run started
+    last_run: float | None = None
+    last_duration: float | None = None
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+class GuildScheduler:
+    """Runs one repeating job per guild.
+
+    First runs are spread randomly across `spread` seconds (default: the job's
+    interval) so a restart doesn't fire every guild at once, and at most
+    `max_concurrent` jobs run at the same time. Intervals can be changed and
+    runs triggered early without restarting the guild's task.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 2, spread: float | None = None):
+        self.log = logging.getLogger(f"red.{name}")
+        self.spread = spread
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._jobs: dict[int, _Job] = {}
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._jobs
+
+    def add(self, guild_id: int, func: Callable[[], Awaitable[None]], interval: float) -> None:
+        """Schedule `func` to run every `interval` seconds for a guild."""
+        if guild_id in self._jobs:
+            return
+        spread = min(interval, self.spread) if self.spread is not None else interval
+        job = _Job(guild_id, func, interval, time.monotonic() + random.uniform(0, spread))
+        job.task = asyncio.create_task(self._loop(job))
+        self._jobs[guild_id] = job
+
+    async def remove(self, guild_id: int) -> None:
+        """Stop a guild's job, waiting for it to finish cancelling."""
+        job = self._jobs.pop(guild_id, None)
+        if job and job.task:
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+
+    def stop(self) -> None:
+        """Cancel every job (on cog unload)."""
+        for job in self._jobs.values():
+            if job.task:
+                job.task.cancel()
+        self._jobs.clear()
+
+    def set_interval(self, guild_id: int, interval: float) -> None:
+        """Change a guild's interval; the next run is rescheduled from the last one."""
+        job = self._jobs.get(guild_id)
+        if not job or interval == job.interval:
+            return
+        job.interval = interval
+        if job.running:
+            return  # The loop reschedules with the new interval when the run ends
+        if job.last_start is None:
+            # Not run yet - keep the staggered start unless the new interval is shorter
+            job.next_run = min(job.next_run, time.monotonic() + interval)
+        else:
+            job.next_run = job.last_start + interval
+        job.wake.set()
+
+    def trigger(self, guild_id: int) -> bool:
+        """Run a guild's job as soon as possible. Returns False if it isn't scheduled."""
+        job = self._jobs.get(guild_id)
+        if not job:
+            return False
+        if job.running:
+            job.rerun = True
+        else:
+            job.next_run = time.monotonic()
+            job.wake.set()
+        return True
+
+    def status(self, guild_id: int) -> JobStatus | None:
+        """Interval, next run and last run timing for a guild's job."""
+        job = self._jobs.get(guild_id)
+        if not job:
+            return None
+        return JobStatus(
+            interval=job.interval,
+            next_run_in=max(0.0, job.next_run - time.monotonic()),
+            running=job.running,
+            last_run=job.last_run,
+            last_duration=job.last_duration,
+        )
+
+    async def _loop(self, job: _Job) -> None:
+        while True:
+            delay = job.next_run - time.monotonic()
+            if delay > 0:
+                # Sleep until due, waking early if the interval changes or a run is triggered
+                job.wake.clear()
+                try:
+                    await asyncio.wait_for(job.wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            async with self._semaphore:
+                job.running = True
+                job.last_start = time.monotonic()
+                failed = False
+                try:
+                    await job.func()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failed = True
+                    self.log.error(f"Unexpected error in scheduled job for guild {job.guild_id}: {e}")
+                finally:
+                    job.running = False
+                    job.last_duration = time.monotonic() - job.last_start
+                    job.last_run = time.time()
+
+            if job.rerun:
+                job.rerun = False
+                job.next_run = time.monotonic()
+            elif failed:
+                job.next_run = time.monotonic() + min(job.interval, RETRY_AFTER_ERROR)
+            else:
+                job.next_run = job.last_start + job.interval
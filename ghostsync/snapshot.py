@@ -0,0 +1,136 @@
+"""
+GhostSync - Member Snapshots
+
+Persists each guild's last Ghost member fetch to sqlite under the cog's data
+folder, so the member index can be warmed instantly after a restart.
+"""
+import json
+import sqlite3
+from pathlib import Path
+
+from .member import GhostMember, LabelCache, extract_discord_id
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    guild_id INTEGER PRIMARY KEY,
+    ghost_url TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    guild_id INTEGER NOT NULL,
+    ghost_id TEXT NOT NULL,
+    email TEXT,
+    note TEXT,
+    status TEXT,
+    labels TEXT,
+    tier TEXT,
+    PRIMARY KEY (guild_id, ghost_id)
+) WITHOUT ROWID;
+"""
+
+
+def _to_row(guild_id: int, member: GhostMember) -> tuple:
+    """Flatten a member record into a `members` row."""
+    labels = [
+        {k: label[k] for k in ("id", "name", "slug") if k in label}
+        for label in member.labels
+    ]
+    return (
+        guild_id,
+        member.id,
+        member.email,
+        member.note,
+        member.status,
+        json.dumps(labels, separators=(",", ":")) if labels else None,
+        member.tier,
+    )
+
+
+def _from_row(labels_cache: LabelCache, ghost_id: str, email: str | None, note: str | None, status: str | None, labels: str | None, tier: str | None) -> GhostMember:
+    """Rebuild a member record from a `members` row."""
+    return GhostMember(
+        id=ghost_id,
+        email=email,
+        note=note,
+        status=status,
+        labels=tuple(labels_cache.intern(l) for l in json.loads(labels)) if labels else (),
+        tier=tier,
+        discord_id=extract_discord_id(note),
+    )
+
+
+class SnapshotStore:
+    """sqlite store of the last Ghost member snapshot per guild.
+
+    Methods are blocking; call them through `asyncio.to_thread`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def save(self, guild_id: int, ghost_url: str, fetched_at: float, members) -> None:
+        """Replace a guild's snapshot with the given members."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM members WHERE guild_id = ?", (guild_id,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (_to_row(guild_id, member) for member in members),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                    (guild_id, ghost_url, fetched_at),
+                )
+        finally:
+            conn.close()
+
+    def upsert(self, guild_id: int, member: GhostMember) -> None:
+        """Write a single member into an existing guild snapshot."""
+        conn = self._connect()
+        try:
+            with conn:
+                if conn.execute("SELECT 1 FROM snapshots WHERE guild_id = ?", (guild_id,)).fetchone():
+                    conn.execute("INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?, ?, ?, ?)", _to_row(guild_id, member))
+        finally:
+            conn.close()
+
+    def load(self, guild_id: int) -> tuple[str, float, list[GhostMember]] | None:
+        """Return (ghost_url, fetched_at, members) for a guild, or None if there's no snapshot."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT ghost_url, fetched_at FROM snapshots WHERE guild_id = ?", (guild_id,)).fetchone()
+            if row is None:
+                return None
+            labels = LabelCache()
+            members = [
+                _from_row(labels, *r) for r in conn.execute(
+                    "SELECT ghost_id, email, note, status, labels, tier FROM members WHERE guild_id = ?", (guild_id,)
+                )
+            ]
+            return row[0], row[1], members
+        finally:
+            conn.close()
+
+    def guild_ids(self) -> list[int]:
+        """Guilds that have a snapshot."""
+        conn = self._connect()
+        try:
+            return [r[0] for r in conn.execute("SELECT guild_id FROM snapshots")]
+        finally:
+            conn.close()
+
+    def delete(self, guild_id: int) -> None:
+        """Drop a guild's snapshot."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM members WHERE guild_id = ?", (guild_id,))
+                conn.execute("DELETE FROM snapshots WHERE guild_id = ?", (guild_id,))
+        finally:
+            conn.close()
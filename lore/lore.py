@@ -1,6 +1,7 @@
 import io
 import re
 import logging
+from contextlib import nullcontext
 from datetime import datetime
 import aiohttp
 import discord
@@ -283,6 +284,11 @@ class Lore(commands.Cog):
 
     # --- API Helper Methods ---
 
+    def _perf_timer(self, service: str):
+        """Time a request with the Perf cog, if it's loaded."""
+        perf = self.bot.get_cog("Perf")
+        return perf.timer(service) if perf else nullcontext()
+
     async def _outline_request(
         self, guild_id: int, endpoint: str, payload: dict
     ) -> dict | None:
@@ -300,13 +306,14 @@ class Lore(commands.Cog):
 
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    if resp.status != 200:
-                        log.error(f"Outline API error {resp.status}: {await resp.text()}")
-                        return None
-                    return await resp.json()
+                with self._perf_timer("outline"):
+                    async with session.post(
+                        url, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=10)
+                    ) as resp:
+                        if resp.status != 200:
+                            log.error(f"Outline API error {resp.status}: {await resp.text()}")
+                            return None
+                        return await resp.json()
         except aiohttp.ClientError as e:
             log.error(f"Outline request failed: {e}")
             return None
@@ -455,26 +462,28 @@ class Lore(commands.Cog):
                 "Content-Type": "application/json",
             }
             try:
+                data = None
                 async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        url,
-                        headers=headers,
-                        json={"id": img_id},
-                        timeout=aiohttp.ClientTimeout(total=15),
-                        allow_redirects=True,
-                    ) as resp:
-                        if resp.status == 200:
-                            # Read binary data
-                            data = await resp.read()
-
-                            # Resize if needed to fit Discord limits
-                            resized_data, ext = self._resize_image_for_discord(data)
-
-                            filename = f"image{i}.{ext}"
-                            files.append(discord.File(io.BytesIO(resized_data), filename=filename))
-                            log.debug(f"Fetched image {img_id} as {filename} ({len(resized_data)} bytes)")
-                        else:
-                            log.warning(f"Failed to get image {img_id}: status {resp.status}")
+                    with self._perf_timer("outline"):
+                        async with session.post(
+                            url,
+                            headers=headers,
+                            json={"id": img_id},
+                            timeout=aiohttp.ClientTimeout(total=15),
+                            allow_redirects=True,
+                        ) as resp:
+                            if resp.status == 200:
+                                # Read binary data
+                                data = await resp.read()
+                            else:
+                                log.warning(f"Failed to get image {img_id}: status {resp.status}")
+                if data is not None:
+                    # Resize if needed to fit Discord limits - outside the timer, it's CPU time not Outline latency
+                    resized_data, ext = self._resize_image_for_discord(data)
+
+                    filename = f"image{i}.{ext}"
+                    files.append(discord.File(io.BytesIO(resized_data), filename=filename))
+                    log.debug(f"Fetched image {img_id} as {filename} ({len(resized_data)} bytes)")
             except Exception as e:
                 log.error(f"Failed to fetch image {img_id}: {e}")
 
@@ -730,12 +739,13 @@ class Lore(commands.Cog):
 
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as resp:
-                    if resp.status != 200:
-                        log.error(f"OpenAI API error {resp.status}: {await resp.text()}")
-                        return None
-                    data = await resp.json()
-                    return data["choices"][0]["message"]["content"]
+                with self._perf_timer("openai"):
+                    async with session.post(url, headers=headers, json=payload) as resp:
+                        if resp.status != 200:
+                            log.error(f"OpenAI API error {resp.status}: {await resp.text()}")
+                            return None
+                        data = await resp.json()
+                        return data["choices"][0]["message"]["content"]
         except Exception as e:
             log.error(f"OpenAI request failed: {e}")
             return None
@@ -782,12 +792,13 @@ Summary:"""
 
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as resp:
-                    if resp.status != 200:
-                        log.error(f"OpenAI API error {resp.status}: {await resp.text()}")
-                        return None
-                    data = await resp.json()
-                    return data["choices"][0]["message"]["content"]
+                with self._perf_timer("openai"):
+                    async with session.post(url, headers=headers, json=payload) as resp:
+                        if resp.status != 200:
+                            log.error(f"OpenAI API error {resp.status}: {await resp.text()}")
+                            return None
+                        data = await resp.json()
+                        return data["choices"][0]["message"]["content"]
         except Exception as e:
             log.error(f"OpenAI request failed: {e}")
             return None
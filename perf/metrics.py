@@ -0,0 +1,185 @@
+"""
+Perf - Metrics Registry
+
+Prometheus-style counters, gauges and histograms for the Dungeon Church cogs,
+with text exposition for `/metrics`.
+"""
+import bisect
+import logging
+import math
+import time
+
+log = logging.getLogger("red.perf")
+
+PREFIX = "dungeonchurch_"
+
+# Latency buckets in seconds, from a fast cache hit to a slow LLM completion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """Monotonically increasing value per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _key(self, labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _labels(self.labels, key), value
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[_key(self, labels)] = value
+
+
+class Histogram:
+    """Bucketed observations per label set."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label key -> [bucket counts..., +Inf count, sum, max]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(self, labels)
+        data = self.values.get(key)
+        if data is None:
+            data = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0.0]
+        data[bisect.bisect_left(self.buckets, value)] += 1
+        data[-2] += value
+        if value > data[-1]:
+            data[-1] = value
+
+    def samples(self):
+        for key, data in self.values.items():
+            base = _labels(self.labels, key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), data):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                yield f"{self.name}_bucket", {**base, "le": le}, cumulative
+            yield f"{self.name}_sum", base, data[-2]
+            yield f"{self.name}_count", base, cumulative
+
+    def stats(self, **labels) -> dict | None:
+        """Count, mean, estimated p50/p95 and max, across all label sets unless labels are given."""
+        if labels:
+            rows = [self.values[_key(self, labels)]] if _key(self, labels) in self.values else []
+        else:
+            rows = list(self.values.values())
+        if not rows:
+            return None
+        counts = [sum(row[i] for row in rows) for i in range(len(self.buckets) + 1)]
+        total = sum(counts)
+        if not total:
+            return None
+        peak = max(row[-1] for row in rows)
+        # Bucket interpolation can overshoot the largest value actually seen
+        return {
+            "count": total,
+            "mean": sum(row[-2] for row in rows) / total,
+            "p50": min(self._quantile(counts, total, 0.5), peak),
+            "p95": min(self._quantile(counts, total, 0.95), peak),
+            "max": peak,
+        }
+
+    def _quantile(self, counts: list[int], total: int, q: float) -> float:
+        """Linear interpolation within the bucket holding the q-th observation (as PromQL does)."""
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+# Every metric the cogs report: name -> (type, help, label names)
+CATALOG = {
+    "request_seconds": (Histogram, "External API request latency (ghost, outline, openai, sheets, qstat).", ("service",)),
+    "request_errors_total": (Counter, "External API requests that raised an exception.", ("service",)),
+    "ghostsync_sync_seconds": (Histogram, "GhostSync sync run duration.", ("trigger",)),
+    "ghostsync_role_changes_total": (Counter, "Subscriber roles added or removed by GhostSync.", ("action",)),
+    "ghostsync_label_changes_total": (Counter, "Ghost labels added or removed by GhostSync.", ("action",)),
+    "dragonchess_active_games": (Gauge, "Dragonchess games in progress.", ()),
+    "dice_rolls_total": (Counter, "Dice rolls made, by command.", ("command",)),
+    "event_loop_lag_seconds": (Histogram, "How late the event loop ran a scheduled wakeup.", (), (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)),
+    "event_loop_stall_seconds": (Histogram, "Event loop stalls caught by the stall watchdog.", (), (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)),
+}
+
+
+class Registry:
+    """All metrics collected since Perf was enabled."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.metrics: dict = {}
+        self._unknown: set[str] = set()
+
+    def get(self, name: str):
+        """Get (or create from CATALOG) a metric by name. Returns None for unknown names."""
+        metric = self.metrics.get(name)
+        if metric is None:
+            spec = CATALOG.get(name)
+            if spec is None:
+                if name not in self._unknown:
+                    self._unknown.add(name)
+                    log.warning(f"Ignoring unknown metric '{name}'.")
+                return None
+            kind, help, labels, *buckets = spec
+            metric = self.metrics[name] = kind(PREFIX + name, help, labels, *buckets)
+        return metric
+
+    def render(self, gauges: dict[str, float] | None = None) -> str:
+        """Prometheus text exposition of every metric, plus point-in-time `gauges`."""
+        for name, value in (gauges or {}).items():
+            metric = self.get(name)
+            if metric is not None:
+                metric.set(value)
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, labels, value in metric.samples():
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{sample}{{{label_text}}} {_number(value)}" if label_text else f"{sample} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _key(metric, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in metric.labels)
+
+
+def _labels(names: tuple[str, ...], key: tuple) -> dict:
+    return dict(zip(names, key))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
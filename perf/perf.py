@@ -0,0 +1,355 @@
+"""
+Perf - Bot Instrumentation
+
+Collects request latencies, sync durations and other metrics reported by the
+Dungeon Church cogs, serves them on an optional local `/metrics` endpoint, and
+summarises them for the owner. Can also watch for callbacks that block the
+event loop. Does nothing until enabled.
+"""
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+import discord
+from aiohttp import web
+from redbot.core import commands, Config, checks
+from redbot.core.bot import Red
+from redbot.core.utils.chat_formatting import box, error, question, success
+
+from .metrics import Registry
+from .stalls import Stall, StallWatchdog
+
+log = logging.getLogger("red.perf")
+
+# Seconds between event loop lag samples
+LAG_SAMPLE_INTERVAL = 0.5
+
+
+class _Timer:
+    """Times a block into the request_seconds histogram, counting exceptions as errors."""
+
+    __slots__ = ("registry", "service", "start")
+
+    def __init__(self, registry: Registry, service: str):
+        self.registry = registry
+        self.service = service
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.get("request_seconds").observe(time.perf_counter() - self.start, service=self.service)
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            self.registry.get("request_errors_total").inc(service=self.service)
+        return False
+
+
+class Perf(commands.Cog):
+    """Metrics for the Dungeon Church cogs.
+
+    Other cogs report through `bot.get_cog("Perf")`; every method is a no-op while
+    collection is disabled. Cogs can also define `perf_gauges()` returning
+    {metric_name: value}, which is read whenever metrics are rendered.
+    """
+
+    __author__ = "DM Brad"
+    __version__ = "0.1"
+
+    def __init__(self, bot: Red):
+        self.bot = bot
+        self.config = Config.get_conf(self, identifier=4206661500, force_registration=True)
+        default_global = {
+            "enabled": False,       # Collect metrics at all
+            "port": None,           # Local port for the /metrics endpoint (None = off)
+            "stall_watch": False,   # Run the event loop stall watchdog
+            "stall_threshold": 250, # Milliseconds of blocking that count as a stall
+        }
+        self.config.register_global(**default_global)
+
+        # None while disabled, so reporting cogs pay for a single attribute check
+        self.registry: Registry | None = None
+        self._lag_task: asyncio.Task | None = None
+        self._runner: web.AppRunner | None = None
+        self.port: int | None = None
+        self.watchdog = StallWatchdog()
+        self.watchdog.on_stall = self._on_stall
+
+    async def cog_load(self):
+        if await self.config.stall_watch():
+            self.watchdog.threshold = await self.config.stall_threshold() / 1000
+            self.watchdog.start()
+        if await self.config.enabled():
+            self._enable()
+            port = await self.config.port()
+            if port:
+                await self._start_server(port)
+
+    def cog_unload(self):
+        self.watchdog.stop()
+        self._disable()
+        if self._runner:
+            asyncio.create_task(self._runner.cleanup())
+            self._runner = None
+
+    ### REPORTING
+
+    @property
+    def enabled(self) -> bool:
+        return self.registry is not None
+
+    def timer(self, service: str):
+        """Context manager timing one external request to `service`."""
+        if self.registry is None:
+            return nullcontext()
+        return _Timer(self.registry, service)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record a histogram observation."""
+        if self.registry is not None and (metric := self.registry.get(name)):
+            metric.observe(value, **labels)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Increment a counter."""
+        if self.registry is not None and (metric := self.registry.get(name)):
+            metric.inc(amount, **labels)
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """Set a gauge."""
+        if self.registry is not None and (metric := self.registry.get(name)):
+            metric.set(value, **labels)
+
+    ### COLLECTION
+
+    def _enable(self) -> None:
+        if self.registry is None:
+            self.registry = Registry()
+            self._lag_task = asyncio.create_task(self._sample_loop_lag())
+
+    def _disable(self) -> None:
+        self.registry = None
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    async def _sample_loop_lag(self) -> None:
+        """Measure how late the loop wakes from a fixed sleep."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            self.observe("event_loop_lag_seconds", max(0.0, time.perf_counter() - start - LAG_SAMPLE_INTERVAL))
+
+    def _on_stall(self, stall: Stall) -> None:
+        self.observe("event_loop_stall_seconds", stall.duration)
+
+    def _gauges(self) -> dict[str, float]:
+        """Point-in-time values from every cog defining `perf_gauges()`."""
+        gauges = {}
+        for cog in self.bot.cogs.values():
+            collect = getattr(cog, "perf_gauges", None)
+            if collect is None or cog is self:
+                continue
+            try:
+                gauges.update(collect())
+            except Exception as e:
+                log.error(f"perf_gauges() failed for {cog.qualified_name}: {e}")
+        return gauges
+
+    def render(self) -> str:
+        """Prometheus text exposition of everything collected so far."""
+        if self.registry is None:
+            return ""
+        return self.registry.render(self._gauges())
+
+    ### HTTP ENDPOINT
+
+    async def _start_server(self, port: int) -> None:
+        await self._stop_server()
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        # Local only - put a reverse proxy in front to scrape from elsewhere
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = port
+        log.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+
+    async def _stop_server(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            self.port = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        if self.registry is None:
+            return web.Response(status=503, text="metrics collection is disabled\n")
+        return web.Response(text=self.render(), content_type="text/plain", charset="utf-8", headers={"X-Content-Type-Options": "nosniff"})
+
+    ### COMMANDS
+
+    @commands.group()
+    @checks.is_owner()
+    async def perf(self, ctx: commands.Context):
+        """Bot performance metrics."""
+        pass
+
+    @perf.command()
+    async def toggle(self, ctx: commands.Context) -> None:
+        """Turn metrics collection on or off."""
+        if self.enabled:
+            self._disable()
+            await self.config.enabled.set(False)
+            await ctx.send(success("`Metrics collection disabled. Collected metrics were discarded.`"))
+        else:
+            self._enable()
+            await self.config.enabled.set(True)
+            await ctx.send(success("`Metrics collection enabled.`"))
+
+    @perf.command()
+    async def server(self, ctx: commands.Context, port: int = None) -> None:
+        """Serve /metrics on a local port, or run without a port to stop serving."""
+        if port is None:
+            if self._runner:
+                await self._stop_server()
+                await self.config.port.set(None)
+                await ctx.send(success("`Metrics endpoint stopped.`"))
+            else:
+                await ctx.send(question("`Please provide a port to serve /metrics on.`"))
+            return
+        if not 1024 <= port <= 65535:
+            await ctx.send(error("`Please use a port between 1024 and 65535.`"))
+            return
+        try:
+            await self._start_server(port)
+        except OSError as e:
+            await ctx.send(error(f"`Could not listen on port {port}: {e.strerror}`"))
+            return
+        await self.config.port.set(port)
+        note = "" if self.enabled else " Collection is off - use [p]perf toggle."
+        await ctx.send(success(f"`Serving metrics on http://127.0.0.1:{port}/metrics.{note}`"))
+
+    @perf.command()
+    async def summary(self, ctx: commands.Context) -> None:
+        """Summarise the metrics collected so far."""
+        if self.registry is None:
+            await ctx.send(error("`Metrics collection is off. Use [p]perf toggle to start collecting.`"))
+            return
+
+        registry = self.registry
+        uptime = max(1.0, time.time() - registry.started_at)
+        embed = discord.Embed(
+            title="📈 Perf Summary",
+            description=f"`Collecting for {int(uptime // 60)}m" + (f", serving :{self.port}/metrics`" if self.port else "`"),
+            color=0xff2600
+        )
+
+        requests = registry.metrics.get("request_seconds")
+        if requests:
+            errors = registry.metrics.get("request_errors_total")
+            lines = []
+            for (service,) in sorted(requests.values):
+                s = requests.stats(service=service)
+                failed = int(errors.values.get((service,), 0)) if errors else 0
+                lines.append(f"{service:<8} {s['count']:>6}  p50 {s['p50'] * 1000:>6.0f}ms  p95 {s['p95'] * 1000:>6.0f}ms  err {failed}")
+            embed.add_field(name="External Requests", value="```" + "\n".join(lines) + "```", inline=False)
+
+        syncs = registry.metrics.get("ghostsync_sync_seconds")
+        if syncs and (s := syncs.stats()):
+            roles = registry.metrics.get("ghostsync_role_changes_total")
+            labels = registry.metrics.get("ghostsync_label_changes_total")
+            embed.add_field(
+                name="GhostSync",
+                value=(
+                    f"```{s['count']} syncs, mean {s['mean']:.1f}s, max {s['max']:.1f}s\n"
+                    f"roles +{int(roles.values.get(('add',), 0)) if roles else 0} -{int(roles.values.get(('remove',), 0)) if roles else 0}, "
+                    f"labels +{int(labels.values.get(('add',), 0)) if labels else 0} -{int(labels.values.get(('remove',), 0)) if labels else 0}```"
+                ),
+                inline=False
+            )
+
+        rolls = registry.metrics.get("dice_rolls_total")
+        if rolls:
+            embed.add_field(name="Dice Rolls", value=f"```{int(rolls.total())} ({rolls.total() / uptime:.3f}/s)```", inline=True)
+
+        gauges = self._gauges()
+        if "dragonchess_active_games" in gauges:
+            embed.add_field(name="Dragonchess Games", value=f"```{int(gauges['dragonchess_active_games'])} active```", inline=True)
+
+        lag = registry.metrics.get("event_loop_lag_seconds")
+        if lag and (s := lag.stats()):
+            embed.add_field(
+                name="Event Loop Lag",
+                value=f"```p50 {s['p50'] * 1000:.1f}ms  p95 {s['p95'] * 1000:.1f}ms  max {s['max'] * 1000:.0f}ms```",
+                inline=False
+            )
+
+        await ctx.send(embed=embed)
+
+    @perf.group(invoke_without_command=True)
+    async def stalls(self, ctx: commands.Context) -> None:
+        """Show the callbacks that blocked the event loop the longest."""
+        if ctx.invoked_subcommand is not None:
+            return
+        watchdog = self.watchdog
+        status = f"on, threshold {watchdog.threshold * 1000:.0f}ms" if watchdog.running else "off"
+        offenders = watchdog.top_offenders()
+        if not offenders:
+            await ctx.send(success(f"`No event loop stalls recorded (watchdog {status}).`"))
+            return
+
+        embed = discord.Embed(
+            title="🐌 Event Loop Stalls",
+            description=f"`{len(watchdog.stalls)} recent stalls, watchdog {status}`",
+            color=0xff2600
+        )
+        for rank, group in enumerate(offenders, 1):
+            worst = group["worst"]
+            when = datetime.fromtimestamp(worst.started_at).strftime("%Y-%m-%d %H:%M:%S")
+            stack = "".join(worst.stack[-3:])
+            if len(stack) > 700:
+                stack = "..." + stack[-700:]
+            embed.add_field(
+                name=f"{rank}. {group['culprit']}"[:256],
+                value=(
+                    f"`{group['count']}x, {group['total'] * 1000:.0f}ms total, "
+                    f"worst {worst.duration * 1000:.0f}ms at {when}`\n" + box(stack, lang="py")
+                ),
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+    @stalls.command(name="toggle")
+    async def stalls_toggle(self, ctx: commands.Context) -> None:
+        """Turn the event loop stall watchdog on or off."""
+        if self.watchdog.running:
+            self.watchdog.stop()
+            await self.config.stall_watch.set(False)
+            await ctx.send(success("`Stall watchdog disabled.`"))
+        else:
+            self.watchdog.threshold = await self.config.stall_threshold() / 1000
+            self.watchdog.start()
+            await self.config.stall_watch.set(True)
+            await ctx.send(success(f"`Stall watchdog enabled, reporting blocks over {self.watchdog.threshold * 1000:.0f}ms.`"))
+
+    @stalls.command(name="threshold")
+    async def stalls_threshold(self, ctx: commands.Context, milliseconds: int = None) -> None:
+        """Set how long the event loop must be blocked to count as a stall."""
+        if milliseconds is None:
+            current = await self.config.stall_threshold()
+            await ctx.send(question(f"`Stalls are blocks over {current}ms. Provide a new threshold in milliseconds.`"))
+            return
+        if not 50 <= milliseconds <= 60000:
+            await ctx.send(error("`Please use a threshold between 50 and 60000 milliseconds.`"))
+            return
+        await self.config.stall_threshold.set(milliseconds)
+        self.watchdog.threshold = milliseconds / 1000
+        await ctx.send(success(f"`Stall threshold set to {milliseconds}ms.`"))
+
+    @stalls.command(name="clear")
+    async def stalls_clear(self, ctx: commands.Context) -> None:
+        """Forget recorded stalls."""
+        self.watchdog.stalls.clear()
+        await ctx.send(success("`Recorded stalls cleared.`"))
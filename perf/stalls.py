@@ -0,0 +1,128 @@
+"""
+Perf - Event Loop Stall Watchdog
+
+A heartbeat task ticks on the event loop while a watchdog thread watches it.
+When the heartbeat falls more than `threshold` seconds behind, the thread grabs
+the loop thread's stack - the code blocking the loop right now - and records
+the stall once the loop gets going again.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+log = logging.getLogger("red.perf")
+
+# Seconds between heartbeats on the event loop
+HEARTBEAT_INTERVAL = 0.05
+# Stalls kept for [p]perf stalls
+STALL_HISTORY = 50
+# Frames kept per captured stack
+STACK_DEPTH = 12
+
+# Every cog lives next to this one, so frames under here are "ours"
+COGS_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+@dataclass(slots=True)
+class Stall:
+    """One period where the event loop stopped running callbacks."""
+    started_at: float           # time.time() the loop stopped responding
+    duration: float             # seconds the loop was blocked
+    culprit: str                # "file:line in function" most likely to blame
+    stack: list[str]            # formatted frames, innermost last
+
+
+class StallWatchdog:
+    """Detects and records event loop stalls longer than `threshold` seconds."""
+
+    def __init__(self, threshold: float = 0.25, history: int = STALL_HISTORY):
+        self.threshold = threshold
+        self.stalls: deque[Stall] = deque(maxlen=history)
+        self.on_stall = None            # Optional callback(Stall), run on the event loop
+        self._beat = time.monotonic()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        # Fresh event per thread, so a quick stop/start can't revive the old thread
+        self._stop = threading.Event()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, args=(self._stop,), name="perf-stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._stop.set()
+        self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def _watch(self, stop: threading.Event) -> None:
+        """Watchdog thread: capture the loop's stack while it's blocked."""
+        while not stop.wait(poll := max(0.01, self.threshold / 4)):
+            beat = self._beat
+            behind = time.monotonic() - beat - HEARTBEAT_INTERVAL
+            if behind < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            frames = traceback.extract_stack(frame)[-STACK_DEPTH:]
+            del frame
+            started_at = time.time() - behind
+            # Wait for the loop to come back to find out how long it was gone
+            while self._beat == beat and not stop.wait(poll):
+                pass
+            if stop.is_set():
+                return
+            stall = Stall(started_at, max(self._beat - beat - HEARTBEAT_INTERVAL, behind), _culprit(frames), traceback.format_list(frames))
+            self.stalls.append(stall)
+            log.warning(f"Event loop blocked for {stall.duration * 1000:.0f}ms in {stall.culprit}")
+            if self.on_stall is not None:
+                self._loop.call_soon_threadsafe(self.on_stall, stall)
+
+    def top_offenders(self, limit: int = 5) -> list[dict]:
+        """Recorded stalls grouped by culprit, worst total blocking time first."""
+        groups: dict[str, dict] = {}
+        for stall in list(self.stalls):
+            group = groups.get(stall.culprit)
+            if group is None:
+                group = groups[stall.culprit] = {"culprit": stall.culprit, "count": 0, "total": 0.0, "worst": stall}
+            group["count"] += 1
+            group["total"] += stall.duration
+            if stall.duration > group["worst"].duration:
+                group["worst"] = stall
+        return sorted(groups.values(), key=lambda g: g["total"], reverse=True)[:limit]
+
+
+def _culprit(frames: traceback.StackSummary) -> str:
+    """Innermost frame in cog code, or the innermost frame at all."""
+    for frame in reversed(frames):
+        if frame.filename.startswith(COGS_ROOT) and "/perf/" not in frame.filename:
+            break
+    else:
+        frame = frames[-1]
+    return f"{Path(frame.filename).parent.name}/{Path(frame.filename).name}:{frame.lineno} in {frame.name}"
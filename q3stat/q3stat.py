@@ -8,11 +8,17 @@ import logging
 import json
 from datetime import datetime
 import io
+from contextlib import nullcontext
+from functools import partial
+from .scheduler import GuildScheduler
 
 # Set up logging
 log = logging.getLogger("red.q3stat")
 log.setLevel(logging.DEBUG)
 
+# Max guilds polling qstat at the same time
+FETCH_CONCURRENCY = 4
+
 class Q3stat(commands.Cog):
     """Quake III Arena server info & matchmaking via qstat"""
 
@@ -42,16 +48,19 @@ class Q3stat(commands.Cog):
         }
         self.config.register_guild(**default_guild)
 
-        # Dict of tasks for each guild the bot is in
-        self.guild_tasks = {}
+        # Background fetch job for each guild the bot is in, staggered across the interval
+        self.scheduler = GuildScheduler("q3stat", max_concurrent=FETCH_CONCURRENCY)
         # Start tasks for existing guilds
         self.bot.loop.create_task(self.initialize_tasks())
 
     def cog_unload(self):
         """Cancel all background tasks when the cog is unloaded."""
-        for task in self.guild_tasks.values():
-            task.cancel()
-        self.guild_tasks.clear()
+        self.scheduler.stop()
+
+    def _perf_timer(self, service: str):
+        """Time a request with the Perf cog, if it's loaded."""
+        perf = self.bot.get_cog("Perf")
+        return perf.timer(service) if perf else nullcontext()
 
     async def initialize_tasks(self):
         """Initialize background tasks for all guilds the bot is part of."""
@@ -62,103 +71,79 @@ class Q3stat(commands.Cog):
     ### TASK MANAGEMENT METHODS
 
     async def start_guild_task(self, guild: discord.Guild):
-        """Start the background task for a specific guild."""
-        if guild.id in self.guild_tasks:
+        """Schedule the background fetch for a specific guild."""
+        if guild.id in self.scheduler:
             log.info(f"Task already running for guild '{guild.name}'.")
             return
-        task = asyncio.create_task(self.fetch_guild_data(guild))
-        self.guild_tasks[guild.id] = task
+        json_interval = await self.config.guild(guild).json_interval()
+        self.scheduler.add(guild.id, partial(self.fetch_guild_data, guild), json_interval)
         log.info(f"Started fetch task for guild '{guild.name}'.")
 
     async def stop_guild_task(self, guild: discord.Guild):
-        """Stop the background task for a specific guild."""
-        task = self.guild_tasks.get(guild.id)
-        if task:
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
-            del self.guild_tasks[guild.id]
+        """Stop the background fetch for a specific guild."""
+        if guild.id in self.scheduler:
+            await self.scheduler.remove(guild.id)
             log.info(f"Stopped fetch task for guild '{guild.name}'.")
 
     #### FETCH JSON & VALIDATE JSON
 
     async def fetch_guild_data(self, guild: discord.Guild):
-        """Background task to fetch server stats and post matchmaking messages for a guild."""
-        while True:
+        """Scheduled job: fetch server stats and post matchmaking messages for a guild once."""
+        # Retrieve guild-specific configurations
+        json_url = await self.config.guild(guild).json_url()
+        match_channel = await self.config.guild(guild).match_channel()
+        match_thread = await self.config.guild(guild).match_thread()
+        # REFACTOR THIS INTO send_player_update
+        previous_players = await self.config.guild(guild).previous_players()
+        log.debug(f"Fetched previous_players for guild '{guild.name}': {previous_players}")
+
+        if not json_url:
+            log.warning(f"Guild '{guild.name}' is missing q3stat JSON URL.")
+            return
+
+        if match_thread:
+            target_channel = match_thread
+        elif match_channel:
+            target_channel = match_channel
+        else:
+            log.debug(f"Neither thread nor channel is set for guild '{guild.name}', skipping fetch.")
+            return
+
+        async with aiohttp.ClientSession() as session:
             try:
-                # Retrieve guild-specific configurations
-                json_url = await self.config.guild(guild).json_url()
-                match_channel = await self.config.guild(guild).match_channel()
-                match_thread = await self.config.guild(guild).match_thread()
-                match_embed_id = await self.config.guild(guild).match_embed_id()
-                json_interval = await self.config.guild(guild).json_interval()
-                # REFACTOR THIS INTO send_player_update
-                previous_players = await self.config.guild(guild).previous_players()
-                log.debug(f"Fetched previous_players for guild '{guild.name}': {previous_players}")
-
-                if not json_url:
-                    log.warning(f"Guild '{guild.name}' is missing q3stat JSON URL.")
-                    await asyncio.sleep(json_interval)
-                    continue
-
-                if match_thread:
-                    target_channel = match_thread
-                elif match_channel:
-                    target_channel = match_channel
-                else:
-                    log.error(f"Neither thread nor channel is set.")
-                    break
-
-                async with aiohttp.ClientSession() as session:
-                    try:
-                        async with session.get(json_url) as response:
-                            if response.status != 200:
-                                log.error(f"Failed to fetch stats for guild '{guild.name}': HTTP {response.status}")
-                                await asyncio.sleep(json_interval)
-                                continue
-                            text_data = await response.text()
-                            data = json.loads(text_data)
-                    except json.JSONDecodeError as json_err:
-                        log.error(f"JSON decoding failed for guild '{guild.name}': {json_err}")
-                        await asyncio.sleep(json_interval)
-                        continue
-                    except Exception as e:
-                        log.error(f"Error fetching stats for guild '{guild.name}': {e}")
-                        await asyncio.sleep(json_interval)
-                        continue
-
-                # Validate JSON structure
-                if not isinstance(data, list) or len(data) == 0:
-                    log.error(f"Invalid JSON structure for guild '{guild.name}'. Expected a non-empty list.")
-                    await asyncio.sleep(json_interval)
-                    break
-
-                # Save State
-                current_state = data[0] # assumes first server in qstat.json
-                previous_state = await self.config.guild(guild).current_state()
-                # Set previous state
-                await self.config.guild(guild).previous_state.set(previous_state)
-                # Set current state
-                await self.config.guild(guild).current_state.set(current_state)
-
-                # CALL OTHER FUNCTIONS
-                # Send or remove player messages
-                await self.send_player_update(guild, current_state, previous_players, target_channel)
-
-                # Call update embed function
-                await self.update_server_embed(guild, current_state)
-
-                # Wait for the next interval
-                await asyncio.sleep(json_interval)
-
-            except asyncio.CancelledError:
-                log.info(f"Fetch task for guild '{guild.name}' has been cancelled.")
-                break
+                with self._perf_timer("qstat"):
+                    async with session.get(json_url) as response:
+                        if response.status != 200:
+                            log.error(f"Failed to fetch stats for guild '{guild.name}': HTTP {response.status}")
+                            return
+                        text_data = await response.text()
+                        data = json.loads(text_data)
+            except json.JSONDecodeError as json_err:
+                log.error(f"JSON decoding failed for guild '{guild.name}': {json_err}")
+                return
             except Exception as e:
-                log.error(f"Unexpected error in fetch task for guild '{guild.name}': {e}")
-                await asyncio.sleep(60)  # Wait before retrying after unexpected errors
+                log.error(f"Error fetching stats for guild '{guild.name}': {e}")
+                return
+
+        # Validate JSON structure
+        if not isinstance(data, list) or len(data) == 0:
+            log.error(f"Invalid JSON structure for guild '{guild.name}'. Expected a non-empty list.")
+            return
+
+        # Save State
+        current_state = data[0] # assumes first server in qstat.json
+        previous_state = await self.config.guild(guild).current_state()
+        # Set previous state
+        await self.config.guild(guild).previous_state.set(previous_state)
+        # Set current state
+        await self.config.guild(guild).current_state.set(current_state)
+
+        # CALL OTHER FUNCTIONS
+        # Send or remove player messages
+        await self.send_player_update(guild, current_state, previous_players, target_channel)
+
+        # Call update embed function
+        await self.update_server_embed(guild, current_state)
 
     ### SEND/REMOVE MESSAGES
 
@@ -361,9 +346,11 @@ class Q3stat(commands.Cog):
     @q3stat.command()
     async def settings(self, ctx: commands.Context) -> None:
         """Display the current settings."""
+        status = self.scheduler.status(ctx.guild.id)
         setting_list = {
             "qstat JSON URL": await self.config.guild(ctx.guild).json_url(),
             "Refresh Interval (in seconds)": await self.config.guild(ctx.guild).json_interval(),
+            "Next Refresh": status.describe() if status else "Not scheduled",
             "Channel": ctx.guild.get_channel(await self.config.guild(ctx.guild).match_channel()),
             "Thread (Overrides Channel)": ctx.guild.get_thread(await self.config.guild(ctx.guild).match_thread()),
             "Minimum Players": await self.config.guild(ctx.guild).min_players(),
@@ -394,7 +381,7 @@ class Q3stat(commands.Cog):
         """Set the refresh interval for the JSON."""
         if interval is not None and interval > 0:
             await self.config.guild(ctx.guild).json_interval.set(interval)
-
+            self.scheduler.set_interval(ctx.guild.id, interval)
             await ctx.send(success(f"`Refresh interval set to {interval}.`"))
         else:
             await ctx.send(question("`Please enter the number of seconds to refresh the JSON URL.`"))
@@ -1,4 +1,5 @@
 import random
+from contextlib import nullcontext
 
 import discord
 from discord.ui import Button, View
@@ -30,7 +31,8 @@ class RerollButton(Button):
             return
 
         entries = values[1:]
-        idx, (name, link) = random.choice(list(enumerate(entries, start=1)))
+        with self.cog._dice_rng(interaction.user.id, interaction.channel_id, f"1d{len(entries)}") as rng:
+            idx, (name, link) = rng.choice(list(enumerate(entries, start=1)))
 
         content = await self.cog._build_message(name, idx, self.openai_key, self.prompt)
 
@@ -82,6 +84,19 @@ class RollFood(commands.Cog):
         }
         self.config.register_guild(**default_guild)
 
+    def _perf_timer(self, service: str):
+        """Time a request with the Perf cog, if it's loaded."""
+        perf = self.bot.get_cog("Perf")
+        return perf.timer(service) if perf else nullcontext()
+
+    def _dice_rng(self, user_id: int, channel_id: int, formula: str):
+        """Draw from the Dice cog's random stream, if it's loaded - audited rolls land in its history.
+
+        `formula` is the dice notation that replays the draws.
+        """
+        dice = self.bot.get_cog("Dice")
+        return dice.shared_roll(self.qualified_name.lower(), user_id, channel_id, formula) if dice else nullcontext(random)
+
     async def _get_oracle_text(self, restaurant_name: str, openai_key: str, prompt: str) -> str | None:
         """Get flavor text from OpenAI. Returns None on failure."""
         import logging
@@ -101,13 +116,14 @@ class RollFood(commands.Cog):
         }
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as resp:
-                    if resp.status != 200:
-                        body = await resp.text()
-                        log.error(f"OpenAI API error {resp.status}: {body}")
-                        return None
-                    data = await resp.json()
-                    return data["choices"][0]["message"]["content"]
+                with self._perf_timer("openai"):
+                    async with session.post(url, headers=headers, json=payload) as resp:
+                        if resp.status != 200:
+                            body = await resp.text()
+                            log.error(f"OpenAI API error {resp.status}: {body}")
+                            return None
+                        data = await resp.json()
+                        return data["choices"][0]["message"]["content"]
         except Exception as e:
             log.error(f"OpenAI request failed: {e}")
             return None
@@ -117,11 +133,12 @@ class RollFood(commands.Cog):
         """The first column should be restaurant name, the second column should be the order link."""
         url = f"https://sheets.googleapis.com/v4/spreadsheets/{sheet_id}/values/Sheet1?key={api_key}"
         async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    raise Exception(f"API returned status {resp.status}")
-                data = await resp.json()
-                return data.get("values", [])
+            with self._perf_timer("sheets"):
+                async with session.get(url) as resp:
+                    if resp.status != 200:
+                        raise Exception(f"API returned status {resp.status}")
+                    data = await resp.json()
+                    return data.get("values", [])
 
     #
     # Command methods
@@ -214,7 +231,8 @@ class RollFood(commands.Cog):
             return
 
         entries = values[1:]
-        idx, (name, link) = random.choice(list(enumerate(entries, start=1)))
+        with self._dice_rng(ctx.author.id, ctx.channel.id, f"1d{len(entries)}") as rng:
+            idx, (name, link) = rng.choice(list(enumerate(entries, start=1)))
 
         content = await self._build_message(name, idx, openai_key, prompt)
 
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Cogs import as top-level packages, as they do from Red's cog path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,14 @@
+import pyhedrals
+import pytest
+
+from dice import engine
+from dice.rng import RollRNG
+
+
+@pytest.mark.parametrize("formula", ["4d6ro1", "10d6ro<3", "4d6r1", "4d6!", "4d6dl"])
+def test_engine_matches_pyhedrals_under_one_seed(formula):
+    for seed in range(200):
+        rolled = engine.roll(formula, pyhedrals.DiceRoller(), 1000, 1000, RollRNG(seed))
+        with RollRNG(seed).roll():
+            fallback = pyhedrals.DiceRoller().parse(formula)
+        assert rolled.result == fallback.result, f"{formula} with seed {seed}"
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import aiohttp
+
+from ghostsync import breaker as breaker_module
+from ghostsync import ghostsync as ghostsync_module
+from ghostsync.breaker import CLOSED, OPEN
+from ghostsync.ghostsync import GhostSync
+
+GHOST_URL = "https://ghost.example"
+# GhostSync's default sync_interval
+SYNC_INTERVAL = 1800
+
+
+class DownSession:
+    """A session whose every request fails to connect."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        raise aiohttp.ClientConnectionError("connection refused")
+
+
+def make_cog() -> GhostSync:
+    cog = GhostSync.__new__(GhostSync)
+    cog.bot = SimpleNamespace(get_cog=lambda name: None)
+    cog.breakers = {}
+    return cog
+
+
+def test_outage_opens_circuit_at_default_interval(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(breaker_module, "time", SimpleNamespace(monotonic=lambda: now[0], time=time.time))
+    monkeypatch.setattr(ghostsync_module, "GHOST_RETRY_BASE", 0)
+    cog, session = make_cog(), DownSession()
+
+    async def sync_cycle():
+        return await cog._ghost_request(session, GHOST_URL, "GET", f"{GHOST_URL}/members/")
+
+    # One request per cycle, as the member fetch that starts each sync makes
+    assert asyncio.run(sync_cycle()) is None
+    assert cog.breakers[GHOST_URL].state == CLOSED
+    now[0] += SYNC_INTERVAL
+    assert asyncio.run(sync_cycle()) is None
+    assert cog.breakers[GHOST_URL].state == OPEN
+
+    # Further cycles inside the cooldown cost nothing
+    requests = session.requests
+    now[0] += 1
+    assert asyncio.run(sync_cycle()) is None
+    assert session.requests == requests
+
+
+class Response:
+    status = 200
+    headers = {}
+
+    async def json(self):
+        raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class BadJsonSession:
+    def request(self, method, url, **kwargs):
+        return Response()
+
+
+def test_body_that_isnt_json_fails_like_an_outage():
+    cog = make_cog()
+    assert asyncio.run(cog._ghost_request(BadJsonSession(), GHOST_URL, "GET", f"{GHOST_URL}/members/")) is None
+    assert cog.breakers[GHOST_URL]._failures == 1